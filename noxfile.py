@@ -47,6 +47,17 @@ def test(session: nox.Session):
     session.notify("test_lint_run_template")
 
 
+@nox.session
+def render_batch(session: nox.Session):
+    """Render the template for several instruments at once.
+
+    Takes the arguments of ``render_batch.py``, for example:
+    ``nox -s render_batch -- instruments.json -o packages/``.
+    """
+    session.install("cookiecutter", "nox")
+    session.run("python", "render_batch.py", *session.posargs)
+
+
 @nox.session(python=["3.10", "3.11", "3.12"])
 def test_filled_template(session: nox.Session):
     """Test a freshly generated template."""
@@ -0,0 +1,272 @@
+"""Render the template for several instruments at once.
+
+Takes a JSON file with a list of cookiecutter contexts, for example::
+
+    [
+        {"instrument_name": "ONE", "dragons_branch": "master"},
+        {"instrument_name": "TWO", "instrument_fits_name": "TWO-SPEC"}
+    ]
+
+and, in the output directory:
+
++ renders every context, in parallel processes;
++ clones DRAGONS once per DRAGONS branch, into the first project using that
+  branch, and links the other projects' DRAGONS location to that clone;
++ creates one development environment per DRAGONS branch, with
+  ``nox -s devenv`` in that first project, sharing one wheelhouse between
+  all of them (see ``DRAGONS_WHEELHOUSE`` in the generated noxfile);
++ imports every package in that environment, in a single interpreter, as
+  ``nox -s test_filled_template`` does for one package;
+
+then reports how long each step took for each instrument. Run with
+``--no-env`` to only render the projects and share the DRAGONS clones.
+
+Usage::
+
+    python render_batch.py instruments.json -o packages/
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from cookiecutter.main import cookiecutter
+
+TEMPLATE_DIR = Path(__file__).resolve().parent
+
+# Defaults from cookiecutter.json used to group the projects.
+DEFAULT_DRAGONS_BRANCH = "master"
+DEFAULT_DRAGONS_LOCATION = "DRAGONS/"
+
+# Modules every package needs, imported once before the packages themselves.
+COMMON_IMPORTS = (
+    "astrodata",
+    "gemini_instruments",
+    "geminidr",
+    "gempy",
+    "gemini_obs_db",
+    "gemini_calmgr",
+)
+
+_SMOKE_TEST = """\
+import importlib
+import json
+import sys
+import time
+
+common, packages = json.loads(sys.argv[1])
+
+for module in common:
+    importlib.import_module(module)
+
+timings = {}
+
+for name, modules, astrodata_class in packages:
+    start = time.perf_counter()
+
+    for module in modules:
+        importlib.import_module(module)
+
+    getattr(sys.modules[modules[1]], astrodata_class)
+    timings[name] = time.perf_counter() - start
+
+print(json.dumps(timings))
+"""
+
+
+def render(context, output_dir):
+    """Render one context; return the project path and the time taken."""
+    start = time.perf_counter()
+    project_path = cookiecutter(
+        str(TEMPLATE_DIR),
+        no_input=True,
+        extra_context=context,
+        output_dir=str(output_dir),
+        default_config=True,
+    )
+
+    return Path(project_path), time.perf_counter() - start
+
+
+def package_modules(context):
+    """Return the modules of a project and the name of its AstroData class."""
+    lower = context["instrument_name"].lower()
+    title = lower.title()
+
+    modules = [
+        f"{lower}_instruments",
+        f"{lower}_instruments.{lower}",
+        f"{lower}dr",
+    ]
+
+    return modules, f"AstroData{title}"
+
+
+def _run(command, cwd, env=None):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=cwd, env=env, check=True)
+
+    return time.perf_counter() - start
+
+
+def share_dragons(projects, env=None):
+    """Clone DRAGONS in the first project, and link the others to it.
+
+    ``projects`` is a list of ``(context, project_path)`` using the same
+    DRAGONS branch. Returns the time taken.
+    """
+    (lead_context, lead_path), *others = projects
+    elapsed = _run(["nox", "-s", "dragons"], lead_path, env)
+
+    clone = lead_path / lead_context.get("dragons_location", DEFAULT_DRAGONS_LOCATION)
+
+    for context, project_path in others:
+        link = project_path / context.get("dragons_location", DEFAULT_DRAGONS_LOCATION)
+        link.parent.mkdir(parents=True, exist_ok=True)
+        link.symlink_to(clone.resolve(), target_is_directory=True)
+
+    return elapsed
+
+
+def create_environment(projects, env=None):
+    """Create the development environment of the first project.
+
+    Returns the time taken.
+    """
+    _, lead_path = projects[0]
+
+    return _run(["nox", "-s", "devenv"], lead_path, env)
+
+
+def smoke_test(projects):
+    """Import every project's packages with the first project's environment.
+
+    Returns the time taken to import each instrument's packages.
+    """
+    _, lead_path = projects[0]
+    python = lead_path / "venv" / "bin" / "python"
+
+    packages = [
+        (context["instrument_name"], *package_modules(context))
+        for context, _ in projects
+    ]
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(str(path) for _, path in projects)
+
+    result = subprocess.run(
+        [str(python), "-c", _SMOKE_TEST, json.dumps([COMMON_IMPORTS, packages])],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def render_batch(contexts, output_dir, jobs=None, environments=True):
+    """Render ``contexts`` into ``output_dir``; see the module docstring.
+
+    Returns a dict of timings per instrument, and a list of timings per
+    DRAGONS branch.
+    """
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    env = dict(os.environ)
+    env.setdefault("DRAGONS_WHEELHOUSE", str(output_dir / ".wheelhouse"))
+
+    timings = {context["instrument_name"]: {} for context in contexts}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        rendered = list(pool.map(render, contexts, [output_dir] * len(contexts)))
+
+    groups = {}
+
+    for context, (project_path, elapsed) in zip(contexts, rendered):
+        timings[context["instrument_name"]]["render"] = elapsed
+        branch = context.get("dragons_branch", DEFAULT_DRAGONS_BRANCH)
+        groups.setdefault(branch, []).append((context, project_path))
+
+    branches = []
+
+    for branch, projects in groups.items():
+        branch_timings = {
+            "branch": branch,
+            "instruments": [context["instrument_name"] for context, _ in projects],
+            "dragons": share_dragons(projects, env),
+        }
+
+        if environments:
+            branch_timings["environment"] = create_environment(projects, env)
+
+            for name, elapsed in smoke_test(projects).items():
+                timings[name]["imports"] = elapsed
+
+        branches.append(branch_timings)
+
+    return timings, branches
+
+
+def report(timings, branches):
+    """Return the timings as a table."""
+    lines = [f"{'instrument':<24} {'render':>8} {'imports':>8}"]
+
+    for name, steps in timings.items():
+        columns = [
+            f"{steps[step]:7.1f}s" if step in steps else f"{'-':>8}"
+            for step in ("render", "imports")
+        ]
+        lines.append(f"{name:<24} {' '.join(columns)}")
+
+    for branch in branches:
+        steps = [f"DRAGONS clone {branch['dragons']:.1f}s"]
+
+        if "environment" in branch:
+            steps.append(f"environment {branch['environment']:.1f}s")
+
+        lines.append(
+            f"DRAGONS {branch['branch']}: {', '.join(steps)} "
+            f"({', '.join(branch['instruments'])})"
+        )
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python render_batch.py",
+        description="Render the template for several instruments at once.",
+    )
+    parser.add_argument("contexts", type=Path, help="JSON list of contexts")
+    parser.add_argument(
+        "-o", "--output-dir", type=Path, default=Path("."), help="where to render"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="projects rendered at once"
+    )
+    parser.add_argument(
+        "--no-env",
+        dest="environments",
+        action="store_false",
+        help="do not create environments or run the import test",
+    )
+    args = parser.parse_args(argv)
+
+    contexts = json.loads(args.contexts.read_text())
+
+    timings, branches = render_batch(
+        contexts, args.output_dir, jobs=args.jobs, environments=args.environments
+    )
+
+    print(report(timings, branches))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
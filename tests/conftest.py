@@ -0,0 +1,129 @@
+"""Fixtures shared by the template tests.
+
+Baking the template and reading every file of the result is the slow part of
+these tests, so projects are baked once per ``extra_context`` for the whole
+session, and the default project is read once. Tests that change a project,
+for example by running nox in it, work on a copy (``project_copy``).
+
+The DRAGONS tests clone a local bare repository (``dragons_remote``) instead
+of GitHub, so the suite runs offline. With ``pytest-xdist`` each worker bakes
+its own projects.
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+# Branches of the DRAGONS stand-in.
+DRAGONS_BRANCHES = ("master", "release/3.2.x")
+
+
+@pytest.fixture(scope="session")
+def bake(cookies_session):
+    """Return a function baking the template, once per ``extra_context``."""
+    results = {}
+
+    def _bake(extra_context=None):
+        key = tuple(sorted((extra_context or {}).items()))
+
+        if key not in results:
+            results[key] = cookies_session.bake(extra_context=extra_context)
+
+        return results[key]
+
+    return _bake
+
+
+@pytest.fixture(scope="session")
+def default_project(bake):
+    """The project baked with the default context."""
+    return bake()
+
+
+@pytest.fixture(scope="session")
+def project_files(default_project):
+    """Every path of the default project, with the lines of its text files.
+
+    Maps paths, relative to the project, to their lines, or to None for
+    directories and files that are not text.
+    """
+    files = {}
+
+    for root, directories, names in os.walk(default_project.project_path):
+        relative_root = Path(root).relative_to(default_project.project_path)
+
+        for name in directories:
+            files[relative_root / name] = None
+
+        for name in names:
+            try:
+                lines = (Path(root) / name).read_text().splitlines()
+
+            except UnicodeDecodeError:
+                lines = None
+
+            files[relative_root / name] = lines
+
+    return files
+
+
+@pytest.fixture
+def project_copy(bake, tmp_path):
+    """Return a function giving a private copy of a baked project."""
+
+    def _copy(extra_context=None):
+        result = bake(extra_context)
+
+        assert result.exit_code == 0
+
+        return Path(
+            shutil.copytree(
+                result.project_path,
+                tmp_path / result.project_path.name,
+                symlinks=True,
+            )
+        )
+
+    return _copy
+
+
+def _git(*args, cwd):
+    subprocess.run(
+        [
+            "git",
+            "-c",
+            "user.name=Template Tests",
+            "-c",
+            "user.email=template-tests@example.com",
+            *args,
+        ],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture(scope="session")
+def dragons_remote(tmp_path_factory):
+    """A local bare repository standing in for DRAGONS on GitHub.
+
+    It has the ``DRAGONS_BRANCHES`` branches. Point ``DRAGONS_URL`` at it to
+    have the generated noxfile clone it.
+    """
+    work = tmp_path_factory.mktemp("dragons_work")
+    remote = tmp_path_factory.mktemp("dragons_remote") / "DRAGONS.git"
+
+    _git("init", "-b", DRAGONS_BRANCHES[0], cwd=work)
+
+    for branch in DRAGONS_BRANCHES:
+        (work / "README.md").write_text(f"DRAGONS stand-in, {branch}\n")
+        _git("checkout", "-B", branch, cwd=work)
+        _git("add", "README.md", cwd=work)
+        _git("commit", "-m", f"Stand-in for {branch}", cwd=work)
+
+    _git("clone", "--bare", str(work), str(remote), cwd=work)
+
+    return remote
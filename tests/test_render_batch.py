@@ -0,0 +1,44 @@
+"""Tests rendering the template for several instruments at once."""
+
+import json
+
+import render_batch
+
+
+def test_render_batch_shares_dragons(dragons_remote, tmp_path, monkeypatch, capsys):
+    """Every context is rendered, with one DRAGONS clone per branch."""
+    monkeypatch.setenv("DRAGONS_URL", str(dragons_remote))
+    monkeypatch.delenv("DRAGONS_BRANCH", raising=False)
+
+    contexts = [
+        {"instrument_name": "ONE"},
+        {"instrument_name": "TWO", "dragons_location": "bing/"},
+        {"instrument_name": "THREE", "dragons_branch": "release/3.2.x"},
+    ]
+
+    contexts_file = tmp_path / "instruments.json"
+    contexts_file.write_text(json.dumps(contexts))
+    output_dir = tmp_path / "packages"
+
+    render_batch.main(
+        [str(contexts_file), "-o", str(output_dir), "-j", "2", "--no-env"]
+    )
+
+    one, two, three = (
+        output_dir / f"{name}_dr_package" for name in ("one", "two", "three")
+    )
+
+    assert (one / "onedr").is_dir()
+    assert (two / "twodr").is_dir()
+    assert (three / "threedr").is_dir()
+
+    assert (one / "DRAGONS").is_dir() and not (one / "DRAGONS").is_symlink()
+    assert (two / "bing").resolve() == (one / "DRAGONS").resolve()
+    assert (three / "DRAGONS").is_dir() and not (three / "DRAGONS").is_symlink()
+
+    report = capsys.readouterr().out.splitlines()
+
+    assert [line.split()[0] for line in report[1:4]] == ["ONE", "TWO", "THREE"]
+    assert report[4].startswith("DRAGONS master:")
+    assert report[4].endswith("(ONE, TWO)")
+    assert report[5].startswith("DRAGONS release/3.2.x:")
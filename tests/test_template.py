@@ -44,88 +44,65 @@ def test_no_igrins_references(cookies):
 
 
 @pytest.mark.parametrize("instrument_name", ["IGRINS", "GIRMOS", "FOX"])
-def test_no_instrument_refs(instrument_name, cookies, monkeypatch):
+def test_no_instrument_refs(instrument_name, default_project, project_files):
     """Tests for references to several different instrument names."""
-    result = cookies.bake()
-
-    assert result.exit_code == 0
-
-    monkeypatch.chdir(result.project_path)
+    assert default_project.exit_code == 0
 
     comp_instrument_name = instrument_name.casefold()
 
-    for root, directories, files in os.walk("."):
-        assert comp_instrument_name not in root.casefold(), root
+    for path, file_lines in project_files.items():
+        assert comp_instrument_name not in str(path).casefold(), path
 
-        for path in (Path(root) / Path(p) for p in chain(directories, files)):
-            assert comp_instrument_name not in str(path).casefold(), path
+        if file_lines is None:
+            continue
 
-            if path.is_file():
-                try:
-                    file_lines = path.read_text().splitlines()
+        for i, line in enumerate(file_lines):
+            msg = f"{path}::{i} -> {line.strip()}"
+            assert comp_instrument_name not in line.casefold(), msg
 
-                except UnicodeDecodeError:
-                    LOGGER.info(f"Skipping file: {path}")
-                    continue
 
-                for i, line in enumerate(file_lines):
-                    msg = f"{path}::{i} -> {line.strip()}"
-                    assert comp_instrument_name not in line.casefold(), msg
-
-
-def test_default_template(cookies, monkeypatch):
+def test_default_template(default_project, project_files):
     """Test that the default template fills in correctly."""
-    result = cookies.bake()
+    assert default_project.exit_code == 0
 
-    assert result.exit_code == 0
+    for path, lines in project_files.items():
+        # Ignore all git repo files.
+        if ".git" in str(path):
+            continue
 
-    monkeypatch.chdir(str(result.project_path))
-    for root, directories, files in os.walk(Path(".")):
-        for path in (Path(root) / base for base in chain(directories, files)):
-            # Ignore all git repo files.
-            if ".git" in str(path):
-                continue
-
-            assert "cookie" not in str(path).lower(), path
-            assert not any(c in str(path) for c in R"{}"), path
+        assert "cookie" not in str(path).lower(), path
+        assert not any(c in str(path) for c in R"{}"), path
 
-            if not path.is_file():
-                continue
+        # This is kind of lazy, it'd be better to specify files to ignore in case an unexpected item slips in that would be caught here.
+        if lines is None:
+            continue
 
-            try:
-                contents = path.read_text()
+        for i, line in enumerate(lines, start=1):
+            errstr = f"{path}::{i} - {line}"
 
-            # This is kind of lazy, it'd be better to specify files to ignore in case an unexpected item slips in that would be caught here.
-            except UnicodeDecodeError as err:
-                LOGGER.info(f"Skipping {path}: got UnicodeDecodeError {err}")
+            # Ignore markdown links
+            if "cookie" in line and re.match(r"^\[[^\]]*\]:.*", line):
                 continue
 
-            for i, line in enumerate(contents.splitlines(), start=1):
-                errstr = f"{path}::{i} - {line}"
-
-                # Ignore markdown links
-                if "cookie" in line and re.match(r"^\[[^\]]*\]:.*", line):
-                    continue
-
-                assert "cookie" not in line, errstr
+            assert "cookie" not in line, errstr
 
-                if path.suffix in [".yml", ".yaml"] and "github" in str(path):
-                    continue
+            if path.suffix in [".yml", ".yaml"] and "github" in str(path):
+                continue
 
-                assert "{{" not in line, errstr
-                assert "}}" not in line, errstr
+            assert "{{" not in line, errstr
+            assert "}}" not in line, errstr
 
 
 @pytest.mark.parametrize(
     "extra_context",
     [{}, {"instrument_name": "OTHERNAME"}, {"instrument_name": "othername"}],
 )
-def test_lowercase_package_names(extra_context, cookies, monkeypatch):
+def test_lowercase_package_names(extra_context, bake, monkeypatch):
     """Test that certain dirs follow PEP8 package name guidelines.
 
     See: https://peps.python.org/pep-0008/#package-and-module-names
     """
-    result = cookies.bake(extra_context=extra_context)
+    result = bake(extra_context)
 
     monkeypatch.chdir(result.project_path)
 
@@ -143,53 +120,49 @@ def test_lowercase_package_names(extra_context, cookies, monkeypatch):
         assert path.is_dir()
 
 
-def test_git_repo(cookies, monkeypatch):
+def test_git_repo(default_project, monkeypatch):
     """Test that the git repo initializes properly."""
-    result = cookies.bake()
-
-    monkeypatch.chdir(result.project_path)
+    monkeypatch.chdir(default_project.project_path)
 
     assert Path(".git").exists(), "No git dir created"
 
 
-@pytest.mark.parametrize("dragons_branch", ["release/3.2.x"])
-def test_download_correct_dragons_version_from_env(
-    dragons_branch, cookies, monkeypatch
-):
-    """Test that proper branches are downloaded when specified by a user."""
-    instrument_name = "BLAH"
-    result = cookies.bake(extra_context={"instrument_name": instrument_name})
+def _clone_dragons():
+    """Run the nox session cloning DRAGONS in the current directory."""
+    subprocess.run(["nox", "-s", "dragons"], check=True)
 
-    assert result.exit_code == 0
 
-    monkeypatch.chdir(result.project_path)
-
-    command_env = {
-        "DRAGONS_BRANCH": dragons_branch,
-    }
+def _checked_out_branch(path):
+    result = subprocess.run(
+        ["git", "rev-parse", "--abbrev-ref", "HEAD"],
+        cwd=path,
+        capture_output=True,
+        check=True,
+    )
 
-    command_env |= os.environ
+    return result.stdout.decode("utf-8").strip()
 
-    command = ["nox", "-s", "devenv"]
 
-    subprocess.run(command, env=command_env)
-
-    monkeypatch.chdir(result.project_path / "DRAGONS/")
+@pytest.mark.parametrize("dragons_branch", ["release/3.2.x"])
+def test_download_correct_dragons_version_from_env(
+    dragons_branch, project_copy, dragons_remote, monkeypatch
+):
+    """Test that proper branches are downloaded when specified by a user."""
+    instrument_name = "BLAH"
+    project_path = project_copy({"instrument_name": instrument_name})
 
-    branch_command = ["git", "branch"]
-    result = subprocess.run(branch_command, capture_output=True)
+    monkeypatch.chdir(project_path)
+    monkeypatch.setenv("DRAGONS_URL", str(dragons_remote))
+    monkeypatch.setenv("DRAGONS_BRANCH", dragons_branch)
 
-    output = result.stdout.decode("utf-8")
+    _clone_dragons()
 
-    for line in output.splitlines():
-        if match := re.match(r"^\s+\*\s+([A-Za-z0-9\-/_]+)\s*$", line):
-            assert match.group(1) == dragons_branch
-            break
+    assert _checked_out_branch(project_path / "DRAGONS/") == dragons_branch
 
 
 @pytest.mark.parametrize("dragons_branch", ["release/3.2.x"])
 def test_download_correct_dragons_version_in_template(
-    dragons_branch, cookies, monkeypatch
+    dragons_branch, project_copy, dragons_remote, monkeypatch
 ):
     """Test specifying the dragons branch in the cookiecutter prompt."""
     instrument_name = "BLAH"
@@ -198,31 +171,21 @@ def test_download_correct_dragons_version_in_template(
         "instrument_name": instrument_name,
     }
 
-    result = cookies.bake(extra_context=extra_context)
+    project_path = project_copy(extra_context)
 
-    assert result.exit_code == 0
-
-    monkeypatch.chdir(result.project_path)
+    monkeypatch.chdir(project_path)
+    monkeypatch.setenv("DRAGONS_URL", str(dragons_remote))
+    monkeypatch.delenv("DRAGONS_BRANCH", raising=False)
 
-    command = ["nox", "-s", "devenv"]
+    _clone_dragons()
 
-    subprocess.run(command)
-
-    monkeypatch.chdir(result.project_path / "DRAGONS/")
-
-    branch_command = ["git", "branch"]
-    result = subprocess.run(branch_command, capture_output=True)
-
-    output = result.stdout.decode("utf-8")
-
-    for line in output.splitlines():
-        if match := re.match(r"^\s+\*\s+([A-Za-z0-9\-/_]+)\s*$", line):
-            assert match.group(1) == dragons_branch
-            break
+    assert _checked_out_branch(project_path / "DRAGONS/") == dragons_branch
 
 
 @pytest.mark.parametrize("dragons_location", ["bing/", "bong"])
-def test_download_dragons_to_location_template(dragons_location, cookies, monkeypatch):
+def test_download_dragons_to_location_template(
+    dragons_location, project_copy, dragons_remote, monkeypatch
+):
     """Test setting default dragons path in template."""
     instrument_name = "BLAH"
     extra_context = {
@@ -230,30 +193,26 @@ def test_download_dragons_to_location_template(dragons_location, cookies, monkey
         "dragons_location": dragons_location,
     }
 
-    result = cookies.bake(extra_context=extra_context)
+    project_path = project_copy(extra_context)
 
-    assert result.exit_code == 0
+    monkeypatch.chdir(project_path)
+    monkeypatch.setenv("DRAGONS_URL", str(dragons_remote))
+    monkeypatch.delenv("DRAGONS_BRANCH", raising=False)
 
-    monkeypatch.chdir(result.project_path)
-
-    command = ["nox", "-s", "devenv"]
-
-    subprocess.run(command)
+    _clone_dragons()
 
     assert Path(dragons_location).exists()
     assert Path(dragons_location).is_dir()
     assert list(Path(dragons_location).iterdir())
 
 
-def test_conda_dev_environment(cookies, monkeypatch):
+def test_conda_dev_environment(project_copy, monkeypatch):
     """Test conda development environemtn"""
     instrument_name = "BLAH"
     env_name = f"{instrument_name.lower()}_dev"
-    result = cookies.bake(extra_context={"instrument_name": instrument_name})
+    project_path = project_copy({"instrument_name": instrument_name})
 
-    assert result.exit_code == 0
-
-    monkeypatch.chdir(result.project_path)
+    monkeypatch.chdir(project_path)
 
     try:
         subprocess.run(["nox", "-s", "devconda"])
@@ -0,0 +1,73 @@
+"""Time cosmic-ray detection on a synthetic echelle frame with 1 to 16 threads.
+
+A frame of curved orders with cosmic rays is generated in memory and traced,
+then ``cosmic_rays.find_cosmic_rays`` is timed with each number of threads.
+The speedup over one thread, and the parallel efficiency (speedup divided by
+the number of threads), should stay close to linear up to the number of
+cores of the machine.
+"""
+
+import argparse
+import os
+import time
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import cosmic_rays, orders  # fmt: skip
+
+from synthetic import add_cosmic_rays, make_echelle_frame
+
+THREADS = (1, 2, 4, 8, 16)
+
+
+def run(shape=(4096, 4096), n_orders=60, tile_size=512, threads=THREADS, repeat=3):
+    """Run the benchmark, returning the best time in seconds per thread count."""
+    frame, variance = make_echelle_frame(shape, n_orders)
+    hits = add_cosmic_rays(frame, shape[0] * shape[1] // 2000)
+    coefficients = orders.trace_orders(frame, half_width=5)
+
+    results = {}
+
+    for n_threads in threads:
+        times = []
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            flags = cosmic_rays.find_cosmic_rays(
+                frame,
+                variance,
+                coefficients=coefficients,
+                tile_size=tile_size,
+                n_threads=n_threads,
+            )
+            times.append(time.perf_counter() - start)
+
+        results[n_threads] = min(times)
+
+    return results, flags[hits].mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=4096, help="Frame side")
+    parser.add_argument("--tile-size", type=int, default=512)
+    parser.add_argument("--threads", type=int, nargs="+", default=THREADS)
+    args = parser.parse_args()
+
+    results, found = run(
+        (args.size, args.size), tile_size=args.tile_size, threads=args.threads
+    )
+    serial = results[min(results)] * min(results)
+
+    print(f"{args.size}x{args.size} frame, {os.cpu_count()} CPUs")
+    print(f"{found:.1%} of the cosmic rays found")
+    print(f"{'threads':<10}{'time (s)':>12}{'speedup':>10}{'efficiency':>12}")
+
+    for n_threads, seconds in results.items():
+        speedup = serial / seconds
+        print(
+            f"{n_threads:<10}{seconds:>12.3f}{speedup:>10.2f}"
+            f"{speedup / n_threads:>12.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
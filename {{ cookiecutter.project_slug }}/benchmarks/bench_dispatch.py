@@ -0,0 +1,138 @@
+"""Compare identification by ``_matches_data`` with the ``INSTRUME`` table.
+
+Twenty synthetic instrument classes, matching on ``INSTRUME`` like
+AstroData{{ cookiecutter.instrument_name_title }} does, are added to a factory along with AstroData{{ cookiecutter.instrument_name_title }}, as
+at a site with many instrument packages installed. In-memory frames from all of
+them are then identified:
+
++ by trying every class's ``_matches_data``, as the factory does,
++ by a lookup in the table of ``dispatch``,
+
+and opened with ``get_astrodata`` by a factory without and with the table.
+"""
+
+import argparse
+import time
+
+import astrodata
+import numpy as np
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import AstroData{{ cookiecutter.instrument_name_title }}  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import dispatch  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.headers import INSTRUMENT_FITS_NAME  # fmt: skip
+
+
+def make_instrument_class(instrument):
+    """An AstroData class identified by its ``INSTRUME`` value."""
+
+    def _matches_data(source):
+        value = source[0].header.get("INSTRUME", "")
+        return str(value).strip().upper() == instrument
+
+    return type(
+        f"AstroData{instrument.title()}",
+        (astrodata.AstroData,),
+        {"_matches_data": staticmethod(_matches_data)},
+    )
+
+
+def make_factory(n_classes, table):
+    """Return a factory with the instrument classes, and their instruments."""
+    factory = type(astrodata.factory)()
+    factory.addClass(astrodata.AstroData)
+
+    classes = {INSTRUMENT_FITS_NAME: AstroData{{ cookiecutter.instrument_name_title }}}
+    classes.update(
+        (f"SYNTH{i:02d}", make_instrument_class(f"SYNTH{i:02d}"))
+        for i in range(n_classes)
+    )
+
+    for instrument, cls in classes.items():
+        factory.addClass(cls)
+
+        if table:
+            dispatch.register(factory, instrument, cls)
+
+    return factory, list(classes)
+
+
+def make_frames(instruments, n_frames):
+    """In-memory frames, cycling through ``instruments``."""
+    frames = []
+
+    for i in range(n_frames):
+        phu = fits.PrimaryHDU()
+        phu.header["INSTRUME"] = instruments[i % len(instruments)]
+        sci = fits.ImageHDU(np.zeros((16, 16), dtype=np.float32), name="SCI")
+        frames.append(fits.HDUList([phu, sci]))
+
+    return frames
+
+
+def time_matches_data(factory, frames):
+    """Identify frames by trying every class."""
+    registry = factory._registry
+    start = time.perf_counter()
+
+    for frame in frames:
+        [cls for cls in registry if cls._matches_data(frame)]
+
+    return time.perf_counter() - start
+
+
+def time_table(factory, frames):
+    """Identify frames with the table."""
+    start = time.perf_counter()
+
+    for frame in frames:
+        dispatch.lookup(factory, frame)
+
+    return time.perf_counter() - start
+
+
+def time_open(factory, frames):
+    """Open frames with the factory."""
+    start = time.perf_counter()
+
+    for frame in frames:
+        factory.get_astrodata(frame)
+
+    return time.perf_counter() - start
+
+
+def run(n_classes=20, n_frames=2000):
+    """Run the benchmark, returning timings in seconds."""
+    scanning, instruments = make_factory(n_classes, table=False)
+    dispatching, _ = make_factory(n_classes, table=True)
+    frames = make_frames(instruments, n_frames)
+
+    return {
+        "matches_data": time_matches_data(scanning, frames),
+        "table": time_table(dispatching, frames),
+        "open_matches_data": time_open(scanning, frames),
+        "open_table": time_open(dispatching, frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n-classes", type=int, default=20)
+    parser.add_argument("--n-frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = run(args.n_classes, args.n_frames)
+
+    print(f"{'method':<20}{'total (s)':>12}{'per frame (us)':>16}{'speedup':>10}")
+
+    for name, seconds in results.items():
+        baseline = results["open_matches_data" if "open" in name else "matches_data"]
+        per_frame = 1e6 * seconds / args.n_frames
+        print(
+            f"{name:<20}{seconds:>12.3f}{per_frame:>16.1f}"
+            f"{baseline / seconds:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Time echelle order tracing and extraction on a synthetic frame.
+
+A full-size frame of curved orders is generated in memory and:
+
++ traced from scratch,
++ traced again through the trace cache, as for later frames taken with the
+  same configuration,
++ extracted with the optimal and box methods.
+"""
+
+import argparse
+import time
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import orders  # fmt: skip
+
+from synthetic import make_echelle_frame
+
+
+def _time(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+
+    return time.perf_counter() - start
+
+
+def run(shape=(4096, 4096), n_orders=60, half_width=5):
+    """Run the benchmark, returning timings in seconds."""
+    frame, variance = make_echelle_frame(shape, n_orders)
+    orders.clear_trace_cache()
+
+    results = {
+        "trace_cold": _time(orders.cached_trace, "bench", frame, half_width=half_width),
+        "trace_cached": _time(
+            orders.cached_trace, "bench", frame, half_width=half_width
+        ),
+    }
+
+    coefficients = orders.cached_trace("bench", frame, half_width=half_width)
+
+    for method in ("optimal", "box"):
+        results[f"extract_{method}"] = _time(
+            orders.extract_orders,
+            frame,
+            coefficients,
+            half_width,
+            variance=variance,
+            method=method,
+        )
+
+    return results, len(coefficients)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=4096, help="Frame side")
+    parser.add_argument("--n-orders", type=int, default=60)
+    args = parser.parse_args()
+
+    results, n_found = run((args.size, args.size), args.n_orders)
+
+    print(f"{n_found} orders found on a {args.size}x{args.size} frame")
+    print(f"{'step':<20}{'time (s)':>12}")
+
+    for name, seconds in results.items():
+        print(f"{name:<20}{seconds:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare full-HDU-list identification with the header-only fast path.
+
+A directory of synthetic {{ cookiecutter.instrument_name }} MEF files is written to a temporary
+location, then every file is identified three ways:
+
++ ``fits.open`` followed by ``AstroData{{ cookiecutter.instrument_name_title }}._matches_data`` (what the
+  ``astrodata`` factory does),
++ ``matches_file`` with an empty header cache,
++ ``matches_file`` again, with the header cache warm.
+"""
+
+import argparse
+import tempfile
+import time
+
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import AstroData{{ cookiecutter.instrument_name_title }}  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.headers import (
+    clear_header_cache,
+    matches_file,
+)
+
+from synthetic import make_raw_files
+
+
+def time_full_open(paths):
+    """Identify files the way the factory does."""
+    start = time.perf_counter()
+
+    for path in paths:
+        with fits.open(path) as hdulist:
+            AstroData{{ cookiecutter.instrument_name_title }}._matches_data(hdulist)
+
+    return time.perf_counter() - start
+
+
+def time_header_only(paths):
+    """Identify files through the header-only path."""
+    start = time.perf_counter()
+
+    for path in paths:
+        matches_file(path)
+
+    return time.perf_counter() - start
+
+
+def run(n_files=5000, n_ext=4, shape=(256, 256)):
+    """Run the benchmark, returning timings in seconds."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_raw_files(tmp_dir, n_files, n_ext, shape)
+
+        results = {"full_open": time_full_open(paths)}
+
+        clear_header_cache()
+        results["header_only_cold"] = time_header_only(paths)
+        results["header_only_warm"] = time_header_only(paths)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n-files", type=int, default=5000)
+    parser.add_argument("--n-ext", type=int, default=4)
+    parser.add_argument("--size", type=int, default=256, help="Extension side")
+    args = parser.parse_args()
+
+    results = run(args.n_files, args.n_ext, (args.size, args.size))
+
+    baseline = results["full_open"]
+    print(f"{'method':<20}{'total (s)':>12}{'per file (us)':>16}{'speedup':>10}")
+
+    for name, seconds in results.items():
+        per_file = 1e6 * seconds / args.n_files
+        print(
+            f"{name:<20}{seconds:>12.3f}{per_file:>16.1f}"
+            f"{baseline / seconds:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure the peak memory per frame of the echelle ``reduce`` recipe.
+
+Synthetic echelle frames are written to a temporary directory, then reduced
+once per ``plane_mode`` (see planes.py), each time in a fresh process so the
+peaks are independent. ``"copy"`` is how primitives that build a new output
+for every input behave; ``"inplace"`` and ``"view"`` avoid copying the planes
+that do not change. The peak resident set size reached during the recipe,
+above what the process used before reading any pixels, is divided by the
+number of frames.
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+
+from synthetic import make_echelle_frame, make_raw_files
+
+MODES = ("copy", "view", "inplace")
+
+
+def _peak_rss():
+    """Peak resident set size of this process so far, in MB (from kB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reduce_files(paths, mode):
+    """Reduce ``paths``, returning the peak memory added, in MB."""
+    import astrodata
+
+    import {{ cookiecutter.instrument_name_lower }}_instruments  # noqa: F401
+    from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.primitives_{{ cookiecutter.instrument_name }}_echelle import {{ cookiecutter.instrument_name_title }}Echelle  # fmt: skip
+    from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.recipes.sq import recipes_ECHELLE  # fmt: skip
+
+    adinputs = [astrodata.open(path) for path in paths]
+    baseline = _peak_rss()
+
+    recipes_ECHELLE.reduce(
+        {{ cookiecutter.instrument_name_title }}Echelle(adinputs, uparms={"plane_mode": mode})
+    )
+
+    return _peak_rss() - baseline
+
+
+def run(n_files=10, shape=(2048, 2048), modes=MODES):
+    """Run the benchmark, returning the peak MB per frame for each mode."""
+    frame, _ = make_echelle_frame(shape)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_raw_files(
+            tmp_dir,
+            n_files,
+            n_ext=1,
+            other_every=0,
+            keywords={"OBSTYPE": "OBJECT", "EXPTIME": 300.0},
+            data=frame,
+        )
+
+        for mode in modes:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, *map(str, paths)],
+                check=True,
+                capture_output=True,
+                text=True,
+                cwd=tmp_dir,
+            ).stdout
+            results[mode] = float(output.split()[-1]) / n_files
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2048, help="Frame side")
+    parser.add_argument("--n-files", type=int, default=10)
+    parser.add_argument("--child", metavar="MODE", help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(reduce_files(args.paths, args.child))
+        return
+
+    results = run(args.n_files, (args.size, args.size))
+    frame_mb = args.size * args.size * 4 / 1e6
+
+    print(f"{args.n_files} frames of {args.size}x{args.size} ({frame_mb:.0f} MB)")
+    print(f"{'plane_mode':<12}{'peak MB/frame':>15}")
+
+    for mode, peak in results.items():
+        print(f"{mode:<12}{peak:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
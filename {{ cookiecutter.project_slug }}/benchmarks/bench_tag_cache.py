@@ -0,0 +1,84 @@
+"""Compare tag resolution through ``astrodata.open`` with the on-disk cache.
+
+Synthetic {{ cookiecutter.instrument_name }} files are written to a temporary directory and their
+tags resolved:
+
++ by opening every file with ``astrodata.open`` and reading ``ad.tags``,
++ through ``tag_cache.get_tags`` with an empty cache (this fills it),
++ through ``tag_cache.get_tags`` again, with the cache warm.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import astrodata
+
+import {{ cookiecutter.instrument_name_lower }}_instruments  # noqa: F401
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import tag_cache
+
+from synthetic import make_raw_files
+
+
+def time_astrodata_open(paths):
+    """Resolve tags by opening every file."""
+    start = time.perf_counter()
+
+    for path in paths:
+        astrodata.open(path).tags
+
+    return time.perf_counter() - start
+
+
+def time_cached(paths):
+    """Resolve tags through the default cache."""
+    start = time.perf_counter()
+
+    for path in paths:
+        tag_cache.get_tags(path)
+
+    return time.perf_counter() - start
+
+
+def run(n_files=1000, n_ext=4, shape=(256, 256)):
+    """Run the benchmark, returning timings in seconds."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_raw_files(tmp_dir, n_files, n_ext, shape, other_every=0)
+
+        tag_cache._default_cache = tag_cache.TagCache(Path(tmp_dir) / "tags.sqlite")
+
+        results = {
+            "astrodata_open": time_astrodata_open(paths),
+            "cache_cold": time_cached(paths),
+            "cache_warm": time_cached(paths),
+        }
+
+        tag_cache.get_default_cache().close()
+        tag_cache._default_cache = None
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n-files", type=int, default=1000)
+    parser.add_argument("--n-ext", type=int, default=4)
+    parser.add_argument("--size", type=int, default=256, help="Extension side")
+    args = parser.parse_args()
+
+    results = run(args.n_files, args.n_ext, (args.size, args.size))
+
+    baseline = results["astrodata_open"]
+    print(f"{'method':<20}{'total (s)':>12}{'per file (us)':>16}{'speedup':>10}")
+
+    for name, seconds in results.items():
+        per_file = 1e6 * seconds / args.n_files
+        print(
+            f"{name:<20}{seconds:>12.3f}{per_file:>16.1f}"
+            f"{baseline / seconds:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Options and synthetic data for the benchmark suite (``nox -s benchmarks``)."""
+
+import pytest
+
+from synthetic import make_echelle_frame, make_raw_files
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("{{ cookiecutter.instrument_name_lower }} benchmarks")
+    group.addoption("--n-files", type=int, default=20, help="Frames per benchmark")
+    group.addoption("--n-ext", type=int, default=1, help="Extensions per frame")
+    group.addoption("--frame-size", type=int, default=2048, help="Frame side")
+
+
+@pytest.fixture(scope="session")
+def frame_options(request):
+    config = request.config
+    size = config.getoption("--frame-size")
+
+    return {
+        "n_files": config.getoption("--n-files"),
+        "n_ext": config.getoption("--n-ext"),
+        "shape": (size, size),
+    }
+
+
+@pytest.fixture(scope="session")
+def raw_files(tmp_path_factory, frame_options):
+    """Raw frames, every other one from another instrument."""
+    return make_raw_files(tmp_path_factory.mktemp("raw"), **frame_options)
+
+
+@pytest.fixture(scope="session")
+def dark_files(tmp_path_factory, frame_options):
+    keywords = {"OBSTYPE": "DARK", "EXPTIME": 10.0}
+
+    return make_raw_files(
+        tmp_path_factory.mktemp("darks"),
+        other_every=0,
+        keywords=keywords,
+        **frame_options,
+    )
+
+
+@pytest.fixture(scope="session")
+def echelle_files(tmp_path_factory, frame_options):
+    keywords = {"OBSTYPE": "OBJECT", "EXPTIME": 300.0}
+    frame, _ = make_echelle_frame(frame_options["shape"])
+
+    return make_raw_files(
+        tmp_path_factory.mktemp("echelle"),
+        other_every=0,
+        keywords=keywords,
+        data=frame,
+        **frame_options,
+    )
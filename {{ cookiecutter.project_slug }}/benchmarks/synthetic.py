@@ -0,0 +1,96 @@
+"""Synthetic raw {{ cookiecutter.instrument_name }} frames for the benchmarks."""
+
+from pathlib import Path
+
+import numpy as np
+from astropy.io import fits
+
+
+def make_raw_files(
+    directory,
+    n_files,
+    n_ext=4,
+    shape=(256, 256),
+    other_every=2,
+    keywords=None,
+    data=None,
+):
+    """Write ``n_files`` synthetic MEFs into ``directory``.
+
+    Every ``other_every``-th file claims to come from another instrument, so
+    identification has something to reject. Use ``other_every=0`` to make all
+    of them {{ cookiecutter.instrument_name }} files.
+
+    ``keywords`` are added to every PHU, and ``data``, if given, is used for
+    every extension instead of zeros of the given ``shape``.
+
+    Returns
+    -------
+    list of pathlib.Path
+    """
+    if data is None:
+        data = np.zeros(shape, dtype=np.float32)
+
+    paths = []
+
+    for i in range(n_files):
+        is_other = other_every and i % other_every == other_every - 1
+
+        phu = fits.PrimaryHDU()
+        phu.header["INSTRUME"] = "OTHER" if is_other else "{{ cookiecutter.instrument_fits_name }}"
+        phu.header["OBJECT"] = f"target_{i}"
+        phu.header.update(keywords or {})
+
+        hdus = [phu] + [fits.ImageHDU(data, name="SCI") for _ in range(n_ext)]
+
+        path = Path(directory) / f"N20240101S{i:04d}.fits"
+        fits.HDUList(hdus).writeto(path)
+        paths.append(path)
+
+    return paths
+
+
+def make_echelle_frame(shape=(4096, 4096), n_orders=60, sigma=1.5, seed=0):
+    """A noisy frame of curved gaussian echelle orders.
+
+    Returns
+    -------
+    frame, variance : ndarray
+    """
+    ny, nx = shape
+    rng = np.random.default_rng(seed)
+
+    x = np.arange(nx)
+    y = np.arange(ny)[:, np.newaxis]
+    spacing = ny / (n_orders + 1)
+    curvature = 8 * ((x - nx / 2) / nx) ** 2
+
+    frame = np.zeros(shape, dtype=np.float32)
+
+    for i in range(n_orders):
+        center = spacing * (i + 1) + curvature + 0.002 * x
+        frame += np.exp(-0.5 * ((y - center) / sigma) ** 2).astype(np.float32)
+
+    frame *= 1000
+    variance = frame + 25
+    frame += rng.normal(0, 5, shape).astype(np.float32)
+
+    return frame, variance
+
+
+def add_cosmic_rays(frame, n_hits, seed=0):
+    """Add ``n_hits`` single-pixel cosmic rays to ``frame``, in place.
+
+    Returns
+    -------
+    ndarray of bool
+        Where the cosmic rays are.
+    """
+    rng = np.random.default_rng(seed)
+    ny, nx = frame.shape
+
+    hits = np.zeros(frame.shape, dtype=bool)
+    hits[rng.integers(0, ny, n_hits), rng.integers(0, nx, n_hits)] = True
+    frame[hits] += rng.uniform(1000, 5000, hits.sum()).astype(frame.dtype)
+
+    return hits
@@ -0,0 +1,89 @@
+"""Benchmark suite for the {{ cookiecutter.instrument_name }} package.
+
+Run it with ``nox -s benchmarks``, which saves every run as JSON under
+``.benchmarks/`` and fails if anything got slower than the last saved run by
+more than the threshold set in noxfile.py.
+"""
+
+from functools import partial
+
+import astrodata
+import pytest
+from astropy.io import fits
+
+import {{ cookiecutter.instrument_name_lower }}_instruments  # noqa: F401
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.adclass import AstroData{{ cookiecutter.instrument_name_title }}  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.primitives_{{ cookiecutter.instrument_name }} import {{ cookiecutter.instrument_name_title }}  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.primitives_{{ cookiecutter.instrument_name }}_echelle import {{ cookiecutter.instrument_name_title }}Echelle  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.recipes.sq import recipes_DARK, recipes_ECHELLE  # fmt: skip
+
+# Repeats for the slow benchmarks, which get fresh inputs every round.
+ROUNDS = 3
+
+
+def _open_all(paths):
+    return [astrodata.open(path) for path in paths]
+
+
+def _fresh_inputs(paths):
+    """pedantic() setup giving newly opened inputs to every round."""
+    return (_open_all(paths),), {}
+
+
+def test_matches_data(benchmark, raw_files):
+    hdulists = [fits.open(path) for path in raw_files]
+
+    def identify():
+        return [AstroData{{ cookiecutter.instrument_name_title }}._matches_data(hdulist) for hdulist in hdulists]  # fmt: skip
+
+    try:
+        benchmark(identify)
+
+    finally:
+        for hdulist in hdulists:
+            hdulist.close()
+
+
+def test_tags(benchmark, raw_files):
+    benchmark(lambda: [astrodata.open(path).tags for path in raw_files])
+
+
+def test_gain(benchmark, dark_files):
+    def gain(adinputs):
+        return [ad.gain() for ad in adinputs]
+
+    benchmark.pedantic(
+        gain, setup=partial(_fresh_inputs, dark_files), rounds=10 * ROUNDS
+    )
+
+
+@pytest.mark.parametrize(
+    "primitives, name",
+    [
+        ({{ cookiecutter.instrument_name_title }}, "someStuff"),
+        ({{ cookiecutter.instrument_name_title }}Echelle, "myNewPrimitive"),
+    ],
+)
+def test_primitive(benchmark, dark_files, primitives, name):
+    def run(adinputs):
+        return getattr(primitives(adinputs), name)()
+
+    benchmark.pedantic(run, setup=partial(_fresh_inputs, dark_files), rounds=ROUNDS)
+
+
+@pytest.mark.parametrize(
+    "primitives, recipe, files",
+    [
+        ({{ cookiecutter.instrument_name_title }}, recipes_DARK.makeProcessedDark, "dark_files"),
+        ({{ cookiecutter.instrument_name_title }}Echelle, recipes_ECHELLE.reduce, "echelle_files"),
+    ],
+)
+def test_recipe(benchmark, request, tmp_path, monkeypatch, primitives, recipe, files):
+    # Recipes may write calibrations to the working directory.
+    monkeypatch.chdir(tmp_path)
+    paths = request.getfixturevalue(files)
+
+    def run(adinputs):
+        recipe(primitives(adinputs))
+
+    benchmark.pedantic(run, setup=partial(_fresh_inputs, paths), rounds=ROUNDS)
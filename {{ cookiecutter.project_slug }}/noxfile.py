@@ -12,20 +12,49 @@ sessions, so running ``nox`` in isolation will do nothing.
 from __future__ import annotations
 
 from pathlib import Path
+import hashlib
+import json
+import os
 import re
+import shutil
 
 import nox
 
 nox.options.sessions = []
 nox.options.error_on_external_run = True
 
-DRAGONS_URL = R"https://github.com/GeminiDRSoftware/DRAGONS"
-CALMGR_URL = R"https://github.com/GeminiDRSoftware/GeminiCalMgr.git@release/1.1.x"
-OBSDB_URL = R"https://github.com/GeminiDRSoftware/GeminiObsDB.git@release/1.0.x"
-
-DRAGONS_BRANCH = "{{ cookiecutter.dragons_branch }}"
+# Each of these can be overridden by an environment variable of the same name,
+# for example to use a local mirror of DRAGONS.
+DRAGONS_URL = os.environ.get(
+    "DRAGONS_URL", R"https://github.com/GeminiDRSoftware/DRAGONS"
+)
+CALMGR_URL = os.environ.get(
+    "CALMGR_URL",
+    R"https://github.com/GeminiDRSoftware/GeminiCalMgr.git@release/1.1.x",
+)
+OBSDB_URL = os.environ.get(
+    "OBSDB_URL",
+    R"https://github.com/GeminiDRSoftware/GeminiObsDB.git@release/1.0.x",
+)
+
+DRAGONS_BRANCH = os.environ.get("DRAGONS_BRANCH", "{{ cookiecutter.dragons_branch }}")
 DRAGONS_LOCATION = "{{ cookiecutter.dragons_location }}"
 
+# Wheels of DRAGONS, the calibration manager, the observation database and
+# their dependencies are built once into a directory of this wheelhouse named
+# after the DRAGONS commit, the commits the CALMGR_URL and OBSDB_URL refs point
+# to and the Python version, and installed from there by every session. Set
+# DRAGONS_WHEELHOUSE to share it between projects.
+WHEELHOUSE = Path(os.environ.get("DRAGONS_WHEELHOUSE", ".wheelhouse"))
+
+# With DRAGONS_OFFLINE=1, nothing is fetched: DRAGONS is not checked for
+# updates and is installed from wheels already in the wheelhouse.
+OFFLINE = os.environ.get("DRAGONS_OFFLINE", "").lower() in ("1", "true", "yes")
+
+# Slowdown, relative to the last saved benchmark run, that fails the
+# benchmarks session.
+BENCHMARK_THRESHOLD = "20%"
+
 
 def check_dragons_version(session: nox.Session):
     """Check if dragons is the expected version."""
@@ -45,6 +74,10 @@ def check_dragons_version(session: nox.Session):
         else:
             session.log(f"Found correct branch: {branch_name}")
 
+        if OFFLINE:
+            session.log("Offline, not checking for DRAGONS updates.")
+            return
+
         result = session.run("git", "fetch", "--dry-run", silent=True, external=True)
 
         if result:
@@ -62,15 +95,14 @@ def check_dragons_version(session: nox.Session):
             session.log("DRAGONS is up to date!")
 
 
-def install_dragons(session: nox.Session, python: Path | None = None):
-    """Install dragons into the given session.
-
-    If python is not None, it assumes it is a path to the
-    correct python binary to use.
-    """
+def clone_dragons(session: nox.Session) -> Path:
+    """Clone dragons if it is not there yet, and check its version."""
     dragons_path = Path(DRAGONS_LOCATION)
 
     if not dragons_path.exists():
+        if OFFLINE:
+            session.error(f"DRAGONS not found at {dragons_path}, cannot clone offline.")
+
         # Clone dragons locally
         session.run(
             "git",
@@ -84,32 +116,165 @@ def install_dragons(session: nox.Session, python: Path | None = None):
 
     check_dragons_version(session)
 
-    if python:
+    return dragons_path
+
+
+def resolve_ref(session: nox.Session, url: str) -> str:
+    """Return the commit a pip ``git+`` URL, without ``git+``, points to.
+
+    Offline, the commit found the last time it was resolved is returned, or
+    the URL itself if it never was. Commits are kept in ``refs.json`` in the
+    wheelhouse.
+    """
+    refs_file = WHEELHOUSE / "refs.json"
+    refs = json.loads(refs_file.read_text()) if refs_file.is_file() else {}
+
+    if OFFLINE:
+        return refs.get(url, url)
+
+    # The ref follows the last "@", unless that is the user of an SSH URL.
+    repository, _, ref = url.rpartition("@")
+
+    if not repository or ":" in ref:
+        repository, ref = url, "HEAD"
+
+    result = session.run(
+        "git",
+        "ls-remote",
+        repository,
+        ref,
+        ref + "^{}",
+        silent=True,
+        external=True,
+    )
+    lines = result.split("\n")
+
+    # Annotated tags are listed twice; "^{}" marks the commit they point to.
+    peeled = [line for line in lines if line.endswith("^{}")]
+    commits = [line.split()[0] for line in peeled or lines if line.strip()]
+
+    # Anything else, such as a commit hash, is taken as it is.
+    refs[url] = commits[0] if commits else ref
+
+    # Written aside and moved in place, so other sessions never read half of it.
+    WHEELHOUSE.mkdir(parents=True, exist_ok=True)
+    writing = refs_file.with_name(f"{refs_file.name}.{os.getpid()}")
+    writing.write_text(json.dumps(refs, indent=2))
+    writing.replace(refs_file)
+
+    return refs[url]
+
+
+def wheelhouse_key(session: nox.Session, python: Path) -> str:
+    """Return the name of the wheelhouse directory for ``python``.
+
+    It changes with the DRAGONS commit, with uncommitted changes to DRAGONS,
+    with the commits ``CALMGR_URL`` and ``OBSDB_URL`` point to (see
+    :func:`resolve_ref`), and with the Python version and platform.
+    """
+    with session.chdir(DRAGONS_LOCATION):
+        commit = session.run("git", "rev-parse", "HEAD", silent=True, external=True)
+        changes = session.run("git", "diff", "HEAD", silent=True, external=True)
+
+    interpreter = session.run(
+        str(python),
+        "-c",
+        "import sys, sysconfig; print(sys.implementation.cache_tag, sysconfig.get_platform())",
+        silent=True,
+        external=True,
+    )
+
+    calmgr, obsdb = (resolve_ref(session, url) for url in (CALMGR_URL, OBSDB_URL))
+    key = "\n".join([commit, changes, calmgr, obsdb, interpreter])
+
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def build_wheelhouse(session: nox.Session, python: Path, dragons_path: Path) -> Path:
+    """Build the DRAGONS wheels for ``python``, unless they are already there."""
+    wheelhouse = WHEELHOUSE / wheelhouse_key(session, python)
+
+    if wheelhouse.is_dir():
+        session.log(f"Using the DRAGONS wheels in {wheelhouse}")
+        return wheelhouse
+
+    if OFFLINE:
+        session.error(f"No DRAGONS wheels in {wheelhouse}, cannot build them offline.")
+
+    # Built aside and moved in place, so an interrupted build is not used.
+    building = wheelhouse.with_name(f"{wheelhouse.name}.{os.getpid()}")
+
+    session.run(
+        str(python),
+        "-m",
+        "pip",
+        "wheel",
+        "--wheel-dir",
+        str(building),
+        # Absolute, so that pip does not take it for a package name.
+        str(dragons_path.resolve()),
+        f"git+{CALMGR_URL}",
+        f"git+{OBSDB_URL}",
+        external=True,
+    )
+
+    try:
+        building.rename(wheelhouse)
+
+    except OSError:
+        # Another session built the same wheels meanwhile.
+        shutil.rmtree(building)
+
+    return wheelhouse
+
+
+def install_dragons(
+    session: nox.Session, python: Path | None = None, editable: bool = False
+):
+    """Install dragons into the given session.
+
+    If python is not None, it assumes it is a path to the
+    correct python binary to use.
+
+    Everything is installed from the wheelhouse (see ``WHEELHOUSE``). If
+    editable is True, DRAGONS itself is then installed in editable mode from
+    ``DRAGONS_LOCATION``, so that changes made there are picked up.
+    """
+    dragons_path = clone_dragons(session)
+
+    if python is None:
+        python = Path(session.bin) / "python"
+
+    wheelhouse = build_wheelhouse(session, python, dragons_path)
+
+    session.run(
+        str(python),
+        "-m",
+        "pip",
+        "install",
+        "--no-index",
+        "--find-links",
+        str(wheelhouse),
+        *sorted(str(wheel) for wheel in wheelhouse.glob("*.whl")),
+        external=True,
+    )
+
+    if editable:
+        # Offline, the build requirements of DRAGONS must already be installed.
+        build_isolation = ["--no-build-isolation"] if OFFLINE else []
+
         session.run(
             str(python),
             "-m",
             "pip",
             "install",
+            *build_isolation,
+            "--no-deps",
             "-e",
             str(dragons_path),
             external=True,
         )
 
-        session.run(
-            str(python),
-            "-m",
-            "pip",
-            "install",
-            f"git+{CALMGR_URL}",
-            f"git+{OBSDB_URL}",
-            external=True,
-        )
-
-        return
-
-    session.install("-e", str(dragons_path))
-    session.install(f"git+{CALMGR_URL}", f"git+{OBSDB_URL}")
-
 
 @nox.session(venv_backend=None)
 def devenv(session: nox.Session):
@@ -121,6 +286,8 @@ def devenv(session: nox.Session):
     + Install DRAGONS:
         + If DRAGONS does not exist locally, clone it.
         + Otherwise, perform a ``git fetch && git pull``
+        + Install it and its dependencies from the wheelhouse, building the
+          wheels first if DRAGONS changed.
     + Install any other dependencies needed.
     """
     session.run(
@@ -139,7 +306,7 @@ def devenv(session: nox.Session):
     venv_python = venv_loc / "bin" / "python"
 
     # Install DRAGONS
-    install_dragons(session, python=venv_python)
+    install_dragons(session, python=venv_python, editable=True)
 
     requirements_file = Path("requirements.txt")
 
@@ -164,6 +331,12 @@ def devenv(session: nox.Session):
     session.notify("install_pre_commit_hooks")
 
 
+@nox.session(venv_backend=None)
+def dragons(session: nox.Session):
+    """Clone DRAGONS, or check the existing clone, without installing it."""
+    clone_dragons(session)
+
+
 @nox.session(venv_backend=None)
 def devconda(session: nox.Session):
     """Create a conda development environment."""
@@ -202,7 +375,7 @@ def devconda(session: nox.Session):
 
     env_python = env_path / "bin" / "python"
 
-    install_dragons(session, python=env_python)
+    install_dragons(session, python=env_python, editable=True)
 
     session.log("Conda environemtn generated, to activate run:")
     session.log(f"   conda activate {env_name}")
@@ -234,6 +407,30 @@ def tests(session: nox.Session):
     session.run("pytest", "tests", *session.posargs)
 
 
+@nox.session()
+def benchmarks(session: nox.Session):
+    """Run the benchmark suite in ``benchmarks/``.
+
+    + Results are saved as JSON under ``.benchmarks/``, one file per run,
+      named after the current commit.
+    + Each run is compared with the previous one, and the session fails if any
+      benchmark's median got slower by more than ``BENCHMARK_THRESHOLD``.
+    + Extra arguments go to pytest, for example
+      ``nox -s benchmarks -- --frame-size 4096 --n-ext 4``.
+    """
+    install_dragons(session)
+    session.install("pytest", "pytest-benchmark")
+
+    session.run(
+        "pytest",
+        "benchmarks",
+        "--benchmark-autosave",
+        "--benchmark-compare",
+        f"--benchmark-compare-fail=median:{BENCHMARK_THRESHOLD}",
+        *session.posargs,
+    )
+
+
 @nox.session()
 def lint(session: nox.Session):
     """Lint using pre-commit hooks."""
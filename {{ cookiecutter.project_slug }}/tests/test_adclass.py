@@ -4,7 +4,30 @@ This should be defined in
 {{ cookiecutter.instrument_name }}_instruments/adclass.py.
 """
 
+import astrodata
+import numpy as np
+from astropy.io import fits
+
 from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import AstroData{{ cookiecutter.instrument_name_title }}  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import adclass  # fmt: skip
+
+
+def _make_ad(amps):
+    """Create a frame with one extension per amplifier name."""
+    phu = fits.PrimaryHDU()
+    phu.header["INSTRUME"] = "{{ cookiecutter.instrument_fits_name }}"
+
+    extensions = []
+
+    for amp in amps:
+        ext = fits.ImageHDU(np.zeros((4, 4), dtype=np.float32), name="SCI")
+
+        if amp is not None:
+            ext.header["AMPNAME"] = amp
+
+        extensions.append(ext)
+
+    return astrodata.create(phu, extensions)
 
 
 def test_adclass_exists():
@@ -14,3 +37,45 @@ def test_adclass_exists():
     causing a problem, though it really shouldn't be.
     """
     assert AstroData{{ cookiecutter.instrument_name_title }}
+
+
+def test_amp_descriptors_per_extension():
+    """Per-amplifier descriptors give one value per extension."""
+    ad = _make_ad([None, None, None])
+
+    assert ad.gain() == [3.0, 3.0, 3.0]
+    assert ad.read_noise() == [5.0, 5.0, 5.0]
+    assert ad[1].gain() == 3.0
+
+
+def test_amp_descriptors_unknown_amp():
+    """Amplifiers missing from the lookup table give None."""
+    ad = _make_ad([None, "NOT_AN_AMP"])
+
+    assert ad.gain() == [3.0, None]
+    assert ad.saturation_level() == [65535.0, None]
+
+
+def test_amp_properties_memoized():
+    """The headers are only read and looked up once per object."""
+    ad = _make_ad([None, None])
+
+    ad.gain()
+    ad[0].hdr["AMPNAME"] = "NOT_AN_AMP"
+
+    assert ad.read_noise() == [5.0, 5.0]
+    assert _make_ad([None, "NOT_AN_AMP"]).read_noise() == [5.0, None]
+
+
+def test_amp_properties_override_defaults():
+    """Rows of amp_properties fall back on array_properties."""
+    overrides = {"gain": 2.0}
+    table = adclass._amp_table(
+        {"gain": 3.0, "read_noise": 5.0}, {("fast", "AMP1"): overrides}
+    )
+    rows = {(row["read_mode"], row["amp"]): row for row in table}
+
+    assert rows["default", "default"]["gain"] == 3.0
+    assert rows["fast", "AMP1"]["gain"] == 2.0
+    assert rows["fast", "AMP1"]["read_noise"] == 5.0
+    assert np.isnan(rows["fast", "AMP1"]["saturation"])
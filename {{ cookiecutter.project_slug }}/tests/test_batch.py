@@ -0,0 +1,204 @@
+"""Tests for the batch reduction driver.
+
+This is defined in {{ cookiecutter.instrument_name_lower }}dr/batch.py.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from {{ cookiecutter.instrument_name_lower }}dr import batch
+
+# (tags, object, exposure time) of each raw file.
+FILES = {
+    "dark1.fits": ({"{{ cookiecutter.instrument_name }}", "CAL", "DARK"}, "Dark", 10.0),
+    "dark2.fits": ({"{{ cookiecutter.instrument_name }}", "CAL", "DARK"}, "Dark", 10.0),
+    "dark3.fits": ({"{{ cookiecutter.instrument_name }}", "CAL", "DARK"}, "Dark", 300.0),
+    "star1.fits": ({"{{ cookiecutter.instrument_name }}", "ECHELLE"}, "HD 1", 300.0),
+    "star2.fits": ({"{{ cookiecutter.instrument_name }}", "ECHELLE"}, "HD 1", 300.0),
+    "star3.fits": ({"{{ cookiecutter.instrument_name }}", "ECHELLE"}, "HD 2", 300.0),
+    "star4.fits": ({"{{ cookiecutter.instrument_name }}", "ECHELLE"}, "HD 3", 300.0),
+    "other.fits": ({"{{ cookiecutter.instrument_name }}", "IMAGE"}, "HD 4", 5.0),
+}
+
+
+def _runner(task):
+    """Record when the task ran; fail the first attempt if asked to."""
+    with open(task["log"], "a") as log:
+        log.write(f"{task['id']} start {time.time()}\n")
+
+    time.sleep(0.05)
+
+    if task.get("fail_once"):
+        try:
+            os.close(os.open(task["fail_once"], os.O_CREAT | os.O_EXCL))
+
+        except FileExistsError:
+            pass
+
+        else:
+            raise RuntimeError("first attempt fails")
+
+    with open(task["log"], "a") as log:
+        log.write(f"{task['id']} end {time.time()}\n")
+
+
+def _read_log(path):
+    events = {}
+
+    with open(path) as log:
+        for line in log:
+            task_id, event, when = line.split()
+            events.setdefault((task_id, event), []).append(float(when))
+
+    return events
+
+
+@pytest.fixture
+def tasks(monkeypatch, tmp_path):
+    paths = {str(tmp_path / name): values for name, values in FILES.items()}
+    monkeypatch.setattr(batch.tag_cache, "get_tags", lambda path: paths[path][0])
+    monkeypatch.setattr(
+        batch.tag_cache,
+        "get_descriptors",
+        lambda path: {"object": paths[path][1], "exposure_time": paths[path][2]},
+    )
+
+    tasks, unmatched = batch.plan(list(paths))
+
+    for task in tasks:
+        task["log"] = str(tmp_path / "log.txt")
+
+    tasks[-1]["fail_once"] = str(tmp_path / "failed_once")
+
+    return tasks, unmatched
+
+
+def _check_order(tasks, events):
+    """Every task ran to completion once, after all its dependencies."""
+    for task in tasks:
+        assert len(events[task["id"], "end"]) == 1
+
+        for dependency in task["depends"]:
+            assert events[dependency, "end"][0] <= min(events[task["id"], "start"])
+
+
+def test_plan(tasks):
+    """Files are grouped by recipe library and descriptors, darks first.
+
+    Science only waits for the darks with its exposure time.
+    """
+    tasks, unmatched = tasks
+
+    assert [os.path.basename(path) for path in unmatched] == ["other.fits"]
+    assert [len(task["files"]) for task in tasks] == [2, 1, 2, 1, 1]
+    assert all(task["library"].endswith("recipes_DARK") for task in tasks[:2])
+    assert tasks[0]["depends"] == [] and tasks[1]["depends"] == []
+
+    for task in tasks[2:]:
+        assert task["library"].endswith("recipes_ECHELLE")
+        assert task["depends"] == [tasks[1]["id"]]
+
+
+def test_local_executor(tasks, tmp_path):
+    """The process pool retries, respects the DAG and resumes from a journal."""
+    tasks, _ = tasks
+    journal = str(tmp_path / "journal.jsonl")
+
+    records = batch.LocalExecutor(3, journal).run(tasks, runner=_runner)
+    summary = batch.report(records)
+
+    assert (summary["done"], summary["failed"], summary["retries"]) == (5, 0, 1)
+    assert summary["files"] == 7
+    _check_order(tasks, _read_log(tmp_path / "log.txt"))
+
+    os.remove(tmp_path / "log.txt")
+    records = batch.LocalExecutor(3, journal).run(tasks, runner=_runner)
+
+    assert [record["status"] for record in records] == ["done"] * 5
+    assert not os.path.exists(tmp_path / "log.txt")
+
+
+def test_local_executor_dependency_failed(tasks, tmp_path):
+    """A calibration that keeps failing stops the tasks needing it."""
+    tasks, _ = tasks
+    tasks[1]["fail_once"] = str(tmp_path / "failed_once")
+    tasks[-1].pop("fail_once")
+
+    records = batch.LocalExecutor(2).run(tasks, runner=_runner, retries=0)
+
+    assert [record["status"] for record in records] == ["done"] + ["failed"] * 4
+    assert records[2]["error"] == "A task it depends on failed"
+
+
+def test_queue_workers(tasks, tmp_path):
+    """Several workers drain a shared queue, running each task once."""
+    tasks, _ = tasks
+    queue = batch.QueueExecutor(tmp_path / "queue")
+
+    assert queue.submit(tasks) == 5
+    assert queue.submit(tasks) == 0
+
+    workers = [
+        multiprocessing.Process(
+            target=queue.work, kwargs={"runner": _runner, "poll": 0.01}
+        )
+        for _ in range(3)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    summary = batch.report(queue.records())
+
+    assert (summary["done"], summary["failed"], summary["retries"]) == (5, 0, 1)
+    assert summary["files"] == 7
+    assert os.listdir(tmp_path / "queue" / "todo") == []
+    assert os.listdir(tmp_path / "queue" / "running") == []
+    _check_order(tasks, _read_log(tmp_path / "log.txt"))
+
+
+def test_expired_lease_requeued(tasks, tmp_path):
+    """A task left running by a dead worker is picked up by another."""
+    tasks, _ = tasks
+    queue = batch.QueueExecutor(tmp_path / "queue", lease=0.1)
+    queue.submit(tasks[:1])
+
+    # A worker claims the task, then dies.
+    assert queue._claim()[0]["id"] == tasks[0]["id"]
+    time.sleep(0.2)
+
+    records = queue.work(runner=_runner, poll=0.01)
+
+    assert [record["id"] for record in records] == [tasks[0]["id"]]
+
+
+def test_queue_dependency_never_submitted(tasks, tmp_path):
+    """A task depending on a task missing from the queue fails, not waits."""
+    tasks, _ = tasks
+    queue = batch.QueueExecutor(tmp_path / "queue")
+    queue.submit(tasks[2:3])
+
+    assert queue.work(runner=_runner, poll=0.01) == []
+    assert [record["status"] for record in queue.records()] == ["failed"]
+    assert tasks[1]["id"] in queue.records()[0]["error"]
+
+
+def test_command_line_as_a_script():
+    """The command line also works when the file is run directly."""
+    result = subprocess.run(
+        [sys.executable, batch.__file__, "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.startswith("usage: batch.py")
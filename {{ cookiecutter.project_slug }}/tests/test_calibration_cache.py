@@ -0,0 +1,220 @@
+"""Tests for the local calibration cache.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/calibration_cache.py.
+"""
+
+import datetime
+import os
+import time
+from pathlib import Path
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import calibration_cache
+
+NIGHT = datetime.datetime(2024, 1, 1)
+
+
+class _Frame:
+    """Just enough of an AstroData object to be matched."""
+
+    def __init__(
+        self, hours=None, path=None, exposure_time=10.0, read_mode="fast", procmode="sq"
+    ):
+        self.path = path
+        self.phu = {"PROCMODE": procmode}
+        self.when = None if hours is None else NIGHT + datetime.timedelta(hours=hours)
+        self.descriptors = {"exposure_time": exposure_time, "read_mode": read_mode}
+
+    def __getattr__(self, name):
+        if name in self.descriptors:
+            return lambda: self.descriptors[name]
+
+        raise AttributeError(name)
+
+    def ut_datetime(self):
+        return self.when
+
+
+class _CalDB:
+    """Calibration databases giving one calibration to every frame, counting
+    the frames asked about.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.asked = 0
+        self.stored = []
+
+    def get_calibrations(self, adinputs, caltype=None, procmode=None, howmany=1):
+        self.asked += len(adinputs)
+        files = [self.path] * len(adinputs)
+
+        return calibration_cache._cal_return(files, ["calmgr"] * len(files))
+
+    def store_calibration(self, calfile, caltype=None):
+        self.stored.append(calfile)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = calibration_cache.CalibrationCache(tmp_path / "calibrations.sqlite")
+    yield cache
+    cache.close()
+
+
+def _dark(directory, name, hours, **descriptors):
+    path = directory / name
+    path.write_text(name)
+
+    return _Frame(hours, str(path), **descriptors)
+
+
+def _add_dark(cache, directory, name, hours, **descriptors):
+    dark = _dark(directory, name, hours, **descriptors)
+    cache.add(dark, "processed_dark")
+
+    return dark.path
+
+
+def test_nearest_matching_calibration(cache, tmp_path):
+    """Calibrations match on descriptors, then on the closest time."""
+    early = _add_dark(cache, tmp_path, "early.fits", 0)
+    late = _add_dark(cache, tmp_path, "late.fits", 5)
+    _add_dark(cache, tmp_path, "long.fits", 3, exposure_time=20.0)
+
+    assert not cache.add(_Frame(None, tmp_path / "late.fits"), "processed_dark")
+    assert not cache.add(_Frame(1, tmp_path / "late.fits"), "processed_arc")
+    assert len(cache) == 3
+
+    assert cache.find_all([_Frame(1), _Frame(4), _Frame(None)], "processed_dark") == [
+        early,
+        late,
+        late,
+    ]
+    assert cache.find(_Frame(4, exposure_time=30.0), "processed_dark") is None
+    assert cache.find(_Frame(4, read_mode="slow"), "processed_dark") is None
+    assert cache.find(_Frame(4), "processed_flat") is None
+
+    # The index is kept in the database.
+    reopened = calibration_cache.CalibrationCache(cache.path)
+    assert reopened.find(_Frame(1), "processed_dark") == early
+    reopened.close()
+
+
+def test_procmode(cache, tmp_path):
+    """Science quality frames only match science quality calibrations."""
+    science = _add_dark(cache, tmp_path, "science.fits", 0)
+    quick = _add_dark(cache, tmp_path, "quick.fits", 2, procmode="ql")
+
+    assert cache.find(_Frame(3), "processed_dark", procmode="sq") == science
+    assert cache.find(_Frame(3), "processed_dark", procmode="ql") == quick
+    assert cache.find(_Frame(3), "processed_dark") == quick
+
+
+def test_changed_files_are_dropped(cache, tmp_path):
+    """A calibration that changed or went is forgotten for the next best one."""
+    early = _add_dark(cache, tmp_path, "early.fits", 0)
+    late = _add_dark(cache, tmp_path, "late.fits", 5)
+    later = _add_dark(cache, tmp_path, "later.fits", 8)
+
+    with open(late, "a") as f:
+        f.write("changed")
+
+    os.remove(later)
+
+    assert cache.find(_Frame(6), "processed_dark") == early
+    assert len(cache) == 1
+
+
+def test_calibration_manager_fills_the_index(cache, tmp_path, monkeypatch):
+    """Frames without a match are looked up, and the calibration found is used
+    for the following frames; stored calibrations are added too.
+    """
+    pytest.importorskip("recipe_system")
+    darks = {"found": _dark(tmp_path, "found.fits", 0)}
+    monkeypatch.setattr(
+        calibration_cache.astrodata, "open", lambda path: darks[Path(path).stem]
+    )
+    caldb = _CalDB(darks["found"].path)
+    cached = calibration_cache.CachedCalDB(caldb, cache)
+
+    first = cached.get_processed_dark([_Frame(1)])
+    second = cached.get_processed_dark([_Frame(2), _Frame(3)])
+
+    assert first.files == second.files[:1] == [darks["found"].path]
+    assert (first.origins, second.origins) == (
+        ["calmgr"],
+        [calibration_cache.CACHE_NAME] * 2,
+    )
+    assert caldb.asked == 1
+
+    # A closer calibration stored later is used for the frames near it only.
+    darks["stored"] = _dark(tmp_path, "stored.fits", 4)
+    cached.store_calibration(darks["stored"].path, "processed_dark")
+
+    assert cached.get_processed_dark([_Frame(1), _Frame(4)]).files == [
+        darks["found"].path,
+        darks["stored"].path,
+    ]
+    assert caldb.stored == [darks["stored"].path]
+    assert caldb.asked == 1
+
+    # Other calibration types are always looked up.
+    cached.get_calibrations([_Frame(1)], caltype="processed_arc")
+    assert caldb.asked == 2
+
+
+def test_matching_many_frames_is_fast(cache, tmp_path):
+    """A thousand frames are matched against hundreds of darks well under 1 s."""
+    for i in range(500):
+        _add_dark(cache, tmp_path, f"dark{i}.fits", i, exposure_time=float(i % 5))
+
+    frames = [_Frame(i * 0.5, exposure_time=float(i % 5)) for i in range(1000)]
+
+    start = time.perf_counter()
+    paths = cache.find_all(frames, "processed_dark")
+    elapsed = time.perf_counter() - start
+
+    assert all(paths)
+    assert elapsed < 0.5
+
+
+def test_cache_is_kept_with_the_calibrations(tmp_path, monkeypatch):
+    """Each calibration directory has its own database."""
+    monkeypatch.delenv(calibration_cache.CACHE_ENV_VAR, raising=False)
+
+    assert calibration_cache.default_cache_path(tmp_path / "calibrations") == (
+        tmp_path / "calibrations" / calibration_cache.CACHE_FILENAME
+    )
+
+    monkeypatch.setenv(calibration_cache.CACHE_ENV_VAR, str(tmp_path / "db.sqlite"))
+
+    assert calibration_cache.default_cache_path(tmp_path / "calibrations") == (
+        tmp_path / "db.sqlite"
+    )
+
+
+def test_loaded_calibrations_are_shared(tmp_path):
+    """load() reads a calibration once and gives out read-only views of it."""
+    path = str(tmp_path / "dark.fits")
+    ad = astrodata.create(fits.PrimaryHDU())
+    ad.append(np.ones((10, 10), dtype=np.float32))
+    ad.write(path)
+
+    calibration_cache.clear_loaded()
+    first = calibration_cache.load(path)
+    second = calibration_cache.load(path)
+
+    assert first is not second
+    assert np.shares_memory(first[0].data, second[0].data)
+    assert not first[0].data.flags.writeable
+
+    ad[0].data[:] = 2
+    ad.write(path, overwrite=True)
+
+    assert calibration_cache.load(path)[0].data[0, 0] == 2
@@ -0,0 +1,88 @@
+"""Tests for tile-compressed output.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/compression.py.
+"""
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import compression
+
+
+@pytest.fixture
+def ad():
+    rng = np.random.default_rng(42)
+    phu = fits.PrimaryHDU()
+    phu.header["OBJECT"] = "Dark"
+
+    ad = astrodata.create(phu)
+
+    for _ in range(2):
+        data = rng.normal(100, 5, (200, 300)).astype(np.float32)
+        ad.append(data)
+        ad[-1].variance = np.full_like(data, 25) + rng.random(data.shape)
+        ad[-1].mask = rng.integers(0, 2**16, data.shape, dtype=np.uint16)
+
+    ad.ORDERS = Table({"order": np.arange(5), "c0": np.linspace(0, 1, 5)})
+
+    return ad
+
+
+def _read_back(path):
+    with fits.open(path) as hdulist:
+        kinds = [type(hdu).__name__ for hdu in hdulist]
+
+    return astrodata.open(str(path)), kinds
+
+
+def test_lossless_round_trip(ad, tmp_path):
+    """Every plane comes back identical, with its type, and tables survive."""
+    path = tmp_path / "dark.fits"
+    stats = compression.write_compressed(ad, path, n_threads=3)
+
+    result, kinds = _read_back(path)
+
+    assert kinds.count("CompImageHDU") == 6
+    assert result.phu["OBJECT"] == "Dark"
+    assert len(result) == 2
+
+    for ext, original in zip(result, ad):
+        assert ext.mask.dtype == np.uint16
+        np.testing.assert_array_equal(ext.mask, original.mask)
+        np.testing.assert_array_equal(ext.data, original.data)
+        np.testing.assert_array_equal(ext.variance, original.variance)
+
+    np.testing.assert_array_equal(result.ORDERS["c0"], ad.ORDERS["c0"])
+    assert stats["compressed_bytes"] == path.stat().st_size
+    assert stats["ratio"] > 1
+    assert stats["throughput"] > 0
+
+
+def test_quantized(ad, tmp_path):
+    """Quantization keeps floats within a fraction of the noise; DQ is exact."""
+    lossless = compression.write_compressed(ad, tmp_path / "lossless.fits")
+    quantized = compression.write_compressed(
+        ad, tmp_path / "quantized.fits", mode="quantized", quantize_level=4
+    )
+
+    result, _ = _read_back(tmp_path / "quantized.fits")
+
+    assert quantized["ratio"] > lossless["ratio"]
+
+    for ext, original in zip(result, ad):
+        np.testing.assert_array_equal(ext.mask, original.mask)
+        assert np.abs(ext.data - original.data).max() < 5 / 4
+
+
+def test_uncompressed(ad, tmp_path):
+    """With mode "none" the file is a plain MEF."""
+    stats = compression.write_compressed(ad, tmp_path / "plain.fits", mode="none")
+
+    _, kinds = _read_back(tmp_path / "plain.fits")
+
+    assert "CompImageHDU" not in kinds
+    assert stats["ratio"] == pytest.approx(1)
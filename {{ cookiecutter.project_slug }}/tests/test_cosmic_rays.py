@@ -0,0 +1,80 @@
+"""Tests for cosmic-ray detection.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/cosmic_rays.py.
+"""
+
+import numpy as np
+import pytest
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import cosmic_rays, orders
+
+
+@pytest.fixture(scope="module")
+def frame():
+    """Orders crossed by slit-filling lines, with single-pixel cosmic rays."""
+    ny, nx = 300, 400
+    rng = np.random.default_rng(0)
+    x = np.arange(nx)
+    y = np.arange(ny)[:, np.newaxis]
+
+    clean = np.zeros((ny, nx))
+
+    for i in range(8):
+        center = 33 * (i + 1) + 4 * ((x - nx / 2) / nx) ** 2 + 0.002 * x
+        clean += 1000 * np.exp(-0.5 * ((y - center) / 1.5) ** 2)
+
+    coefficients = orders.trace_orders(clean, half_width=5, degree=2)
+    slit = cosmic_rays.order_footprint(clean.shape, coefficients, 5)
+    lines = slit * sum(
+        3000 * np.exp(-0.5 * ((x - column) / 0.7) ** 2) for column in (50, 170, 321)
+    )
+
+    variance = clean + lines + 25
+    data = clean + lines + rng.normal(0, np.sqrt(variance))
+
+    hits = np.zeros(data.shape, dtype=bool)
+    hits[rng.integers(0, ny, 60), rng.integers(0, nx, 60)] = True
+    data[hits] += rng.uniform(1000, 5000, hits.sum())
+
+    return data, variance, coefficients, hits, lines > 0
+
+
+def test_lines_are_protected_by_the_traces(frame):
+    """Every cosmic ray is found, and the traces keep lines from being flagged."""
+    data, variance, coefficients, hits, lines = frame
+
+    with_traces = cosmic_rays.find_cosmic_rays(
+        data, variance, coefficients=coefficients, half_width=5
+    )
+    without_traces = cosmic_rays.find_cosmic_rays(data, variance)
+
+    assert with_traces[hits].all()
+    assert (with_traces & ~hits).sum() < 0.02 * (without_traces & ~hits).sum()
+    assert (with_traces & lines & ~hits).sum() < 0.01 * lines.sum()
+
+
+@pytest.mark.parametrize("with_variance", [True, False])
+def test_tiling_does_not_change_the_result(frame, with_variance):
+    """Tiles and threads give the same flags as one tile; bad pixels are kept.
+
+    Without a variance the noise is estimated from the data, over the whole
+    frame whatever the tiles.
+    """
+    data, variance, coefficients, hits, _ = frame
+    variance = variance if with_variance else None
+    mask = np.zeros(data.shape, dtype=np.uint16)
+    mask[hits] = 1
+
+    whole = cosmic_rays.find_cosmic_rays(
+        data, variance, coefficients=coefficients, tile_size=1000, n_threads=1
+    )
+    tiled = cosmic_rays.find_cosmic_rays(
+        data, variance, coefficients=coefficients, tile_size=64, n_threads=4
+    )
+    masked = cosmic_rays.find_cosmic_rays(
+        data, variance, mask=mask, coefficients=coefficients, tile_size=64
+    )
+
+    np.testing.assert_array_equal(tiled, whole)
+    assert not masked[hits].any()
@@ -0,0 +1,124 @@
+"""Tests for the INSTRUME to class table in front of the astrodata factory.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}_instruments/{{ cookiecutter.instrument_name_lower }}/dispatch.py.
+"""
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import AstroData{{ cookiecutter.instrument_name_title }}  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import dispatch  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.headers import INSTRUMENT_FITS_NAME, instrument_key  # fmt: skip
+
+
+def _instrument_class(instrument, base=astrodata.AstroData):
+    """An AstroData class matching ``instrument``, counting its matches."""
+
+    def _matches_data(source):
+        cls.calls += 1
+        return source[0].header.get("INSTRUME", "").strip().upper() == instrument
+
+    cls = type(
+        f"AstroData{instrument.title()}",
+        (base,),
+        {"_matches_data": staticmethod(_matches_data), "calls": 0},
+    )
+
+    return cls
+
+
+def _hdulist(instrument):
+    phu = fits.PrimaryHDU()
+    phu.header["INSTRUME"] = instrument
+
+    return fits.HDUList(
+        [phu, fits.ImageHDU(np.zeros((4, 4), dtype=np.float32), name="SCI")]
+    )
+
+
+@pytest.fixture
+def factory():
+    """A factory of its own, with the base class and 20 instruments."""
+    factory = type(astrodata.factory)()
+    factory.addClass(astrodata.AstroData)
+
+    for i in range(20):
+        instrument = f"SYNTH{i:02d}"
+        cls = _instrument_class(instrument)
+        factory.addClass(cls)
+        dispatch.register(factory, instrument, cls)
+
+    return factory
+
+
+def test_table_gives_the_matching_class(factory, tmp_path):
+    """Registered instruments are identified without _matches_data."""
+    classes = {cls.__name__: cls for cls in factory._registry}
+
+    ad = factory.get_astrodata(_hdulist(" synth07 "))
+
+    path = tmp_path / "synth12.fits"
+    _hdulist("SYNTH12").writeto(path)
+    ad_from_file = factory.get_astrodata(str(path))
+
+    assert type(ad) is classes["AstroDataSynth07"]
+    assert type(ad_from_file) is classes["AstroDataSynth12"]
+    assert all(getattr(cls, "calls", 0) == 0 for cls in classes.values())
+
+    # Anything else is identified as before.
+    assert type(factory.get_astrodata(_hdulist("OTHER"))) is astrodata.AstroData
+    assert classes["AstroDataSynth07"].calls == 1
+
+
+def test_ambiguous_instruments_fall_back(factory):
+    """Shared INSTRUME values and registered subclasses use _matches_data."""
+    claimant = _instrument_class("SYNTH03")
+    factory.addClass(claimant)
+    dispatch.register(factory, "SYNTH03", claimant)
+
+    with pytest.raises(astrodata.AstroDataError, match="More than one class"):
+        factory.get_astrodata(_hdulist("SYNTH03"))
+
+    parent = next(cls for cls in factory._registry if cls.__name__.endswith("05"))
+    subclass = _instrument_class("SYNTH05", base=parent)
+    factory.addClass(subclass)
+
+    assert type(factory.get_astrodata(_hdulist("SYNTH05"))) is subclass
+
+
+def test_tagged_classes_are_in_the_table(factory, tmp_path):
+    """Classes only added to the factory are found from their instrument tag,
+    and confirmed with their own _matches_data alone.
+    """
+    classes = {cls.__name__: cls for cls in factory._registry}
+    tagged = _instrument_class("TAGGED")
+    tagged._tag_instrument = astrodata.astro_data_tag(
+        lambda self: astrodata.TagSet(["TAGGED"])
+    )
+    factory.addClass(tagged)
+
+    path = tmp_path / "tagged.fits"
+    _hdulist("TAGGED").writeto(path)
+
+    assert type(factory.get_astrodata(_hdulist("TAGGED"))) is tagged
+    assert type(factory.get_astrodata(str(path))) is tagged
+    assert tagged.calls == 2
+    assert all(getattr(cls, "calls", 0) == 0 for cls in classes.values())
+
+    # A tag that is not the INSTRUME value is not used.
+    tagged.calls = 0
+    tagged._matches_data = staticmethod(lambda source: False)
+
+    assert type(factory.get_astrodata(_hdulist("TAGGED"))) is astrodata.AstroData
+    assert classes["AstroDataSynth00"].calls == 1
+
+
+def test_package_registers_its_instrument():
+    """Importing the package puts its class in the default factory's table."""
+    table = getattr(astrodata.factory, dispatch.TABLE_ATTRIBUTE)
+    key = instrument_key(INSTRUMENT_FITS_NAME)
+
+    assert table[key] is AstroData{{ cookiecutter.instrument_name_title }}
@@ -0,0 +1,142 @@
+"""Tests for the columnar header index.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}_instruments/{{ cookiecutter.instrument_name_lower }}/header_index.py.
+"""
+
+import datetime
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import header_index
+
+
+def _write_mef(path, instrument="{{ cookiecutter.instrument_fits_name }}", **keywords):
+    phu = fits.PrimaryHDU()
+    phu.header["INSTRUME"] = instrument
+
+    for keyword, value in keywords.items():
+        phu.header[keyword] = value
+
+    sci = fits.ImageHDU(np.ones((10, 10), dtype=np.float32), name="SCI")
+    fits.HDUList([phu, sci]).writeto(path, overwrite=True)
+
+
+def test_scan_and_select(tmp_path):
+    """Files are found by keyword, descriptor and tag values."""
+    _write_mef(tmp_path / "a.fits", OBJECT="Dark", EXPTIME=10.0, READMODE="fast")
+    _write_mef(tmp_path / "b.fits", OBJECT="Dark", EXPTIME=300.0, READMODE="fast")
+    os.mkdir(tmp_path / "night2")
+    _write_mef(tmp_path / "night2" / "c.fits", OBJECT="HD 1", EXPTIME=300.0)
+    _write_mef(tmp_path / "other.fits", instrument="NOT_THIS_ONE")
+    (tmp_path / "notes.txt").write_text("not FITS")
+
+    index = header_index.scan(tmp_path)
+
+    assert len(index) == 3
+    assert index["EXPTIME"].dtype == np.float64
+    assert index.select("{{ cookiecutter.instrument_name }}", read_mode="fast") == [
+        str(tmp_path / "a.fits"),
+        str(tmp_path / "b.fits"),
+    ]
+    assert index.select(OBJECT="Dark", EXPTIME=lambda t: t > 100) == [
+        str(tmp_path / "b.fits")
+    ]
+    assert index.select("NOT_A_TAG") == []
+
+
+def test_rescan_is_incremental(monkeypatch, tmp_path):
+    """Only new and changed files are read again; deleted ones are dropped."""
+    for name in ("a", "b", "c"):
+        _write_mef(tmp_path / f"{name}.fits", EXPTIME=1.0)
+
+    header_index.scan(tmp_path)
+
+    evaluated = []
+    evaluate = header_index._evaluate
+    monkeypatch.setattr(
+        header_index,
+        "_evaluate",
+        lambda path: evaluated.append(os.path.basename(path)) or evaluate(path),
+    )
+
+    os.remove(tmp_path / "a.fits")
+    _write_mef(tmp_path / "b.fits", EXPTIME=2.0, OBJECT="changed")
+    _write_mef(tmp_path / "d.fits", EXPTIME=4.0)
+
+    index = header_index.scan(tmp_path)
+
+    assert sorted(evaluated) == ["b.fits", "d.fits"]
+    assert [os.path.basename(path) for path in index.paths] == [
+        "b.fits",
+        "c.fits",
+        "d.fits",
+    ]
+    np.testing.assert_array_equal(index["EXPTIME"], [2.0, 1.0, 4.0])
+    assert index["OBJECT"].tolist() == ["changed", "", ""]
+
+
+def test_closest_in_time(tmp_path):
+    """Calibration matching returns candidates sorted by time difference."""
+    night = datetime.datetime(2024, 1, 1)
+    rows = [
+        {"exposure_time": 10.0, "ut_datetime": night},
+        {"exposure_time": 10.0, "ut_datetime": night + datetime.timedelta(hours=5)},
+        {"exposure_time": 10.0, "ut_datetime": None},
+        {"exposure_time": 20.0, "ut_datetime": night + datetime.timedelta(hours=3)},
+        {"exposure_time": 10.0, "ut_datetime": night + datetime.timedelta(hours=1)},
+    ]
+    tags = [{"DARK"}, {"DARK"}, {"DARK"}, {"DARK"}, {"FLAT"}]
+    paths = [f"{i}.fits" for i in range(5)]
+
+    index = header_index.HeaderIndex.from_rows(paths, [0] * 5, [0] * 5, rows, tags)
+    index.save(tmp_path / "index.npz")
+    index = header_index.HeaderIndex.load(tmp_path / "index.npz")
+
+    when = night + datetime.timedelta(hours=4)
+
+    assert index.closest(when, "DARK", exposure_time=10.0) == [
+        "1.fits",
+        "0.fits",
+        "2.fits",
+    ]
+
+
+def test_closest_without_times():
+    """Files are matched even when none of them has a time, and columns of
+    something else are refused.
+    """
+    rows = [{"exposure_time": 10.0}, {"exposure_time": 10.0}]
+    index = header_index.HeaderIndex.from_rows(
+        ["0.fits", "1.fits"], [0, 0], [0, 0], rows, [{"DARK"}, {"DARK"}]
+    )
+    when = datetime.datetime(2024, 1, 1)
+
+    assert index.closest(when, "DARK") == ["0.fits", "1.fits"]
+
+    with pytest.raises(ValueError, match="exposure_time"):
+        index.closest(when, "DARK", time_column="exposure_time")
+
+
+def test_unreadable_files_are_left_out(monkeypatch, tmp_path, caplog):
+    """A file that cannot be opened is logged and skipped."""
+    _write_mef(tmp_path / "a.fits", EXPTIME=1.0)
+    _write_mef(tmp_path / "b.fits", EXPTIME=2.0)
+
+    evaluate = header_index._evaluate
+
+    def corrupt_b(path):
+        if path.endswith("b.fits"):
+            raise OSError("truncated file")
+
+        return evaluate(path)
+
+    monkeypatch.setattr(header_index, "_evaluate", corrupt_b)
+
+    index = header_index.scan(tmp_path)
+
+    assert [os.path.basename(path) for path in index.paths] == ["a.fits"]
+    assert "b.fits" in caplog.text and "truncated file" in caplog.text
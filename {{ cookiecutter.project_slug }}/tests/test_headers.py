@@ -0,0 +1,86 @@
+"""Tests for the header-only identification path.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}_instruments/{{ cookiecutter.instrument_name_lower }}/headers.py.
+"""
+
+import gzip
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import AstroData{{ cookiecutter.instrument_name_title }}  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.headers import (
+    matches_file,
+    read_primary_header,
+)
+
+
+def _write_mef(path, instrument="{{ cookiecutter.instrument_fits_name }}", **keywords):
+    phu = fits.PrimaryHDU()
+    phu.header["INSTRUME"] = instrument
+
+    for keyword, value in keywords.items():
+        phu.header[keyword] = value
+
+    sci = fits.ImageHDU(np.ones((10, 10), dtype=np.float32), name="SCI")
+    fits.HDUList([phu, sci]).writeto(path, overwrite=True)
+
+
+def test_read_primary_header_matches_astropy(tmp_path):
+    """Values should agree with what astropy reads."""
+    path = tmp_path / "test.fits"
+    _write_mef(path, OBJECT="It's a star", EXPTIME=30.5, NCOADDS=4, DARK=True)
+
+    header = read_primary_header(path)
+
+    with fits.open(path) as hdulist:
+        for keyword in ("INSTRUME", "OBJECT", "EXPTIME", "NCOADDS", "DARK"):
+            assert header[keyword] == hdulist[0].header[keyword], keyword
+
+
+def test_matches_file_agrees_with_matches_data(tmp_path):
+    """The fast path should identify files the same way as the adclass."""
+    for instrument in ("{{ cookiecutter.instrument_fits_name }}", "OTHER"):
+        path = tmp_path / f"{instrument}.fits"
+        _write_mef(path, instrument=instrument)
+
+        with fits.open(path) as hdulist:
+            expected = AstroData{{ cookiecutter.instrument_name_title }}._matches_data(hdulist)
+
+        assert matches_file(path) == expected
+
+
+def test_matches_file_gzip(tmp_path):
+    """Gzipped files are read without decompressing them to disk."""
+    path = tmp_path / "test.fits"
+    _write_mef(path)
+
+    gz_path = tmp_path / "test.fits.gz"
+    gz_path.write_bytes(gzip.compress(path.read_bytes()))
+
+    assert matches_file(gz_path)
+
+
+def test_cache_invalidated_on_change(tmp_path):
+    """Rewriting a file should not return the stale cached header."""
+    path = tmp_path / "test.fits"
+    _write_mef(path)
+    assert matches_file(path)
+
+    _write_mef(path, instrument="OTHER", PADDING="x")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert not matches_file(path)
+
+
+@pytest.mark.parametrize("contents", [b"", b"not a fits file" * 500])
+def test_non_fits_files_do_not_match(contents, tmp_path):
+    """Non-FITS files are rejected rather than raising."""
+    path = tmp_path / "junk.fits"
+    path.write_bytes(contents)
+
+    assert not matches_file(path)
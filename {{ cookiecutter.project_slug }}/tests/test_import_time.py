@@ -0,0 +1,92 @@
+"""Import-time budget for the parts of the package that identify files.
+
+Importing these must not pull in astrodata, gemini_instruments, geminidr or
+gempy, and must stay within ``IMPORT_BUDGET_MS``, as measured by
+``python -X importtime``.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Cumulative import time allowed for each module, in milliseconds.
+IMPORT_BUDGET_MS = 250
+
+HEAVY_PACKAGES = ("astrodata", "gemini_instruments", "geminidr", "gempy")
+
+PROJECT_ROOT = Path(__file__).parents[1]
+
+
+def _import_times(module):
+    """Return the cumulative import time of every module imported, in us."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "{{ cookiecutter.instrument_name_lower }}_instruments",
+        "{{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.headers",
+        "{{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.tag_cache",
+        "{{ cookiecutter.instrument_name_lower }}dr",
+        "{{ cookiecutter.instrument_name_lower }}dr.streaming",
+        "{{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}",
+    ],
+)
+def test_import_is_cheap(module):
+    times = _import_times(module)
+
+    heavy = {name for name in times if name.split(".")[0] in HEAVY_PACKAGES}
+    assert not heavy, f"importing {module} imported {sorted(heavy)}"
+
+    assert times[module] / 1000 < IMPORT_BUDGET_MS
+
+
+@pytest.mark.parametrize("first", ["astrodata", "gemini_instruments.gemini"])
+def test_class_registered_when_astrodata_imported(first):
+    """The AstroData class is still registered, once astrodata is imported.
+
+    gemini_instruments.gemini imports astrodata before defining the class the
+    package needs, so importing it after the package must work too.
+    """
+    script = "\n".join(
+        [
+            "import {{ cookiecutter.instrument_name_lower }}_instruments",
+            f"import {first}",
+            "import astrodata",
+            "from astropy.io import fits",
+            "from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import headers",
+            "phu = fits.PrimaryHDU()",
+            "phu.header['INSTRUME'] = headers.INSTRUMENT_FITS_NAME",
+            "print(type(astrodata.create(phu)).__name__)",
+        ]
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "AstroData{{ cookiecutter.instrument_name_title }}"
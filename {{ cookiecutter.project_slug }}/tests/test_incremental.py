@@ -0,0 +1,141 @@
+"""Tests for incremental recipe execution.
+
+This is defined in {{ cookiecutter.instrument_name_lower }}dr/incremental.py.
+"""
+
+from unittest.mock import MagicMock
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}dr import incremental
+from {{ cookiecutter.instrument_name_lower }}dr.streaming import Barrier, Step
+
+
+class _Primitives:
+    """Two cached primitives, and one that is not timestamped."""
+
+    timestamp_keys = {"addOne": "ADDONE", "stackAll": "STACKALL"}
+
+    def __init__(self, adinputs):
+        self.streams = {"main": adinputs}
+        self.params = {}
+        self.log = MagicMock()
+        self.calls = []
+
+    def addOne(self, adinputs=None, **params):
+        self.calls.append(("addOne", len(adinputs)))
+
+        for ad in adinputs:
+            ad[0].data += params.get("amount", 1)
+            ad.phu["ADDONE"] = "done"
+            ad.update_filename(suffix="_added")
+
+        return adinputs
+
+    def stackAll(self, adinputs=None, **params):
+        self.calls.append(("stackAll", len(adinputs)))
+
+        stack = astrodata.create(adinputs[0].phu)
+        stack.append(sum(ad[0].data for ad in adinputs))
+        stack.filename = "stack.fits"
+
+        return [stack]
+
+    def showInputs(self, adinputs=None, **params):
+        self.calls.append(("showInputs", len(adinputs)))
+        return adinputs
+
+
+def _write_frames(directory, indices):
+    paths = []
+
+    for i in indices:
+        path = directory / f"frame{i:03d}.fits"
+
+        if not path.exists():
+            data = np.full((4, 4), i, dtype=np.float32)
+            fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(data)]).writeto(path)
+
+        paths.append(path)
+
+    return paths
+
+
+def _reduce(paths, manifest, amount=1):
+    p = _Primitives([astrodata.open(str(path)) for path in paths])
+    steps = [Step("addOne", amount=amount), Step("showInputs"), Barrier("stackAll")]
+
+    outputs = incremental.run(p, steps, manifest=manifest)
+
+    return p.calls, outputs
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = incremental.Manifest(tmp_path / "cache")
+    yield manifest
+    manifest.close()
+
+
+def test_only_new_frames_processed(tmp_path, manifest):
+    """Adding frames only runs the per-frame stages on the new ones."""
+    calls, outputs = _reduce(_write_frames(tmp_path, range(4)), manifest)
+
+    assert calls == [("addOne", 1)] * 4 + [("showInputs", 1)] * 4 + [("stackAll", 4)]
+    np.testing.assert_array_equal(outputs[0][0].data, 0 + 1 + 2 + 3 + 4)
+
+    calls, outputs = _reduce(_write_frames(tmp_path, range(6)), manifest)
+
+    assert calls.count(("addOne", 1)) == 2
+    assert calls[-1] == ("stackAll", 6)
+    np.testing.assert_array_equal(outputs[0][0].data, sum(range(1, 7)))
+
+
+def test_rerun_reuses_everything(tmp_path, manifest):
+    """An unchanged re-run reads the final product back from disk."""
+    paths = _write_frames(tmp_path, range(3))
+    _, first = _reduce(paths, manifest)
+
+    calls, second = _reduce(paths, manifest)
+
+    assert ("addOne", 1) not in calls and ("stackAll", 3) not in calls
+    assert second[0].filename == first[0].filename == "stack.fits"
+    np.testing.assert_array_equal(second[0][0].data, first[0][0].data)
+
+
+def test_parameters_change_the_key(tmp_path, manifest):
+    """Changing a parameter runs the stages again."""
+    paths = _write_frames(tmp_path, range(2))
+    _reduce(paths, manifest)
+
+    calls, outputs = _reduce(paths, manifest, amount=10)
+
+    assert calls.count(("addOne", 1)) == 2
+    np.testing.assert_array_equal(outputs[0][0].data, 10 + 11)
+
+
+def test_code_version_changes_the_key(tmp_path, manifest, monkeypatch):
+    """A new version of the reduction code runs the stages again."""
+    paths = _write_frames(tmp_path, range(2))
+    _reduce(paths, manifest)
+
+    monkeypatch.setattr(incremental.versions, "code_version", lambda: "new")
+    calls, _ = _reduce(paths, manifest)
+
+    assert calls.count(("addOne", 1)) == 2 and calls[-1] == ("stackAll", 2)
+
+
+def test_already_processed_frames_skip_stage(tmp_path, manifest):
+    """Inputs carrying a stage's timestamp skip that stage."""
+    paths = _write_frames(tmp_path, range(2))
+
+    with fits.open(paths[0], mode="update") as hdulist:
+        hdulist[0].header["ADDONE"] = "done"
+
+    calls, outputs = _reduce(paths, manifest)
+
+    assert calls[:1] == [("addOne", 1)] and calls.count(("addOne", 1)) == 1
+    np.testing.assert_array_equal(outputs[0][0].data, 0 + 1 + 1)
@@ -0,0 +1,75 @@
+"""Tests for running code when a module gets imported.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}_instruments/{{ cookiecutter.instrument_name_lower }}/lazy.py.
+"""
+
+import importlib
+import sys
+
+import pytest
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import lazy
+
+CALLS = []
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    """Write modules to a temporary directory, and forget them afterwards."""
+    monkeypatch.syspath_prepend(str(tmp_path))
+    CALLS.clear()
+    names = []
+
+    def write(name, source=""):
+        (tmp_path / f"{name}.py").write_text(source)
+        names.append(name)
+
+    yield write
+
+    for name in names:
+        sys.modules.pop(name, None)
+
+
+def test_callback_waits_for_the_import(modules):
+    """The callback runs once the module is imported, not before."""
+    modules("lazy_target")
+    lazy.when_imported("lazy_target", lambda: CALLS.append("target"))
+
+    assert CALLS == []
+
+    importlib.import_module("lazy_target")
+
+    assert CALLS == ["target"]
+
+    lazy.when_imported("lazy_target", lambda: CALLS.append("again"))
+
+    assert CALLS == ["target", "again"]
+
+
+def test_callback_for_a_module_being_imported(modules):
+    """A module hooked while it is being imported, by a module it imports,
+    gets its callback once it has finished.
+    """
+    modules(
+        "lazy_hooking",
+        "\n".join(
+            [
+                "import sys",
+                "from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import lazy",
+                "def hooked():",
+                "    sys.modules['lazy_importer'].hooked = True",
+                "lazy.when_imported('lazy_importer', hooked)",
+            ]
+        ),
+    )
+    modules("lazy_importer", "import lazy_hooking\nhooked = False\n")
+    modules("lazy_later")
+
+    importer = importlib.import_module("lazy_importer")
+
+    assert not importer.hooked
+
+    importlib.import_module("lazy_later")
+
+    assert importer.hooked
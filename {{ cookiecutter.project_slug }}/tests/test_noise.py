@@ -0,0 +1,64 @@
+"""Tests for the fused ADU to electrons and variance conversion.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/noise.py.
+"""
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.headers import INSTRUMENT_FITS_NAME  # fmt: skip
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import noise
+
+
+def _frame(with_variance):
+    """A frame of this instrument, in ADU, with or without a variance plane."""
+    rng = np.random.default_rng(42)
+    data = rng.normal(100, 80, (101, 67)).astype(np.float32)
+    data[3, 4] = np.nan
+
+    phu = fits.PrimaryHDU()
+    phu.header["INSTRUME"] = INSTRUMENT_FITS_NAME
+    ad = astrodata.create(phu, [fits.ImageHDU(data)])
+    ad.filename = "frame.fits"
+
+    if with_variance:
+        ad[0].variance = rng.uniform(0, 50, data.shape).astype(np.float32)
+
+    return ad
+
+
+@pytest.mark.parametrize("with_variance", [False, True])
+@pytest.mark.parametrize("read_noise", [False, True])
+def test_identical_to_dragons_primitives(with_variance, read_noise):
+    """The fused primitive matches the separate DRAGONS primitives bit for bit."""
+    pytest.importorskip("geminidr")
+    from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.primitives_{{ cookiecutter.instrument_name }} import {{ cookiecutter.instrument_name_title }}  # fmt: skip
+
+    separate = {{ cookiecutter.instrument_name_title }}([_frame(with_variance)])
+    separate.addVAR(read_noise=read_noise)
+    separate.ADUToElectrons()
+    (expected,) = separate.addVAR(poisson_noise=True)
+
+    fused = {{ cookiecutter.instrument_name_title }}([_frame(with_variance)])
+    (result,) = fused.ADUToElectronsAndVAR(read_noise=read_noise)
+
+    for out, ref in zip(
+        (result[0].data, result[0].variance), (expected[0].data, expected[0].variance)
+    ):
+        assert out.dtype == ref.dtype
+        assert out.tobytes() == ref.tobytes()
+
+
+def test_works_in_place():
+    """Existing data and variance arrays are updated, not replaced."""
+    data = np.ones((70, 10), dtype=np.float32)
+    variance = np.ones_like(data)
+
+    out_data, out_var = noise.electrons_and_variance(data, variance, 2.0, 3.0)
+
+    assert out_data is data and out_var is variance
+    np.testing.assert_array_equal(data, 2)
+    np.testing.assert_array_equal(variance, 4 + 9 + 2)
@@ -0,0 +1,129 @@
+"""Tests for echelle order tracing and extraction.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/orders.py.
+"""
+
+import numpy as np
+import pytest
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import orders
+
+
+def _make_frame(shape=(300, 400), n_orders=8, sigma=1.5, flux=1000.0):
+    """Curved gaussian orders with a known trace and total flux per column."""
+    ny, nx = shape
+    x = np.arange(nx)
+    y = np.arange(ny)[:, np.newaxis]
+
+    spacing = ny / (n_orders + 1)
+    centers = np.array(
+        [
+            spacing * (i + 1) + 4 * ((x - nx / 2) / nx) ** 2 + 0.002 * x
+            for i in range(n_orders)
+        ]
+    )
+
+    frame = np.zeros(shape)
+
+    for center in centers:
+        frame += np.exp(-0.5 * ((y - center) / sigma) ** 2)
+
+    frame *= flux / (sigma * np.sqrt(2 * np.pi))
+
+    return frame, centers
+
+
+def test_trace_follows_orders():
+    """Fitted traces stay within a fraction of a pixel of the truth."""
+    frame, centers = _make_frame()
+
+    coefficients = orders.trace_orders(frame, half_width=4, degree=2)
+
+    assert coefficients.shape == (8, 3)
+    np.testing.assert_allclose(
+        orders.trace_centers(coefficients, frame.shape[1]), centers, atol=0.2
+    )
+
+
+def test_trace_table_round_trip():
+    """Traces survive being stored as an ORDERS table."""
+    coefficients = np.arange(12, dtype=float).reshape(4, 3)
+
+    result, half_width = orders.coefficients_from_table(
+        orders.trace_table(coefficients, 6)
+    )
+
+    np.testing.assert_array_equal(result, coefficients)
+    assert half_width == 6
+
+
+@pytest.mark.parametrize("method", ["optimal", "box"])
+def test_extraction_recovers_flux(method):
+    """Both extraction methods recover the flux put into each order."""
+    frame, _ = _make_frame(flux=1000.0)
+    variance = frame + 25
+
+    coefficients = orders.trace_orders(frame, half_width=4, degree=2)
+    flux, flux_var, no_data = orders.extract_orders(
+        frame, coefficients, 6, variance=variance, method=method
+    )
+
+    assert flux.shape == (8, frame.shape[1])
+    assert not no_data.any()
+    np.testing.assert_allclose(flux, 1000.0, rtol=0.01)
+    assert (flux_var > 0).all()
+
+
+def test_extraction_ignores_masked_pixels():
+    """A masked hot pixel does not leak into the optimal extraction."""
+    frame, centers = _make_frame()
+    coefficients = orders.trace_orders(frame, half_width=4, degree=2)
+
+    row = int(round(centers[3, 200]))
+    mask = np.zeros(frame.shape, dtype=np.uint16)
+    mask[row, 200] = 1
+    frame[row, 200] = 1e6
+
+    flux, _, _ = orders.extract_orders(frame, coefficients, 6, mask=mask)
+
+    assert flux[3, 200] == pytest.approx(1000.0, rel=0.02)
+
+
+def test_cached_trace_reused():
+    """Frames with the same configuration key share one trace."""
+    orders.clear_trace_cache()
+    frame, _ = _make_frame()
+
+    first = orders.cached_trace("config", frame, half_width=4)
+    second = orders.cached_trace("config", np.zeros_like(frame), half_width=4)
+
+    assert second is first
+
+
+def test_blaze_correction():
+    """Dividing a blazed spectrum by the flat's blaze flattens it."""
+    x = np.linspace(-1, 1, 500)
+    blaze = np.sinc(x)[np.newaxis, :] ** 2
+    science = 200 * blaze
+
+    flux, variance, low = orders.correct_blaze(
+        science, science.copy(), orders.blaze_from_flat(3 * blaze, window=1)
+    )
+
+    np.testing.assert_allclose(flux[~low], flux[~low].mean())
+    assert low[0, 0] and not low[0, 250]
+
+
+def test_blaze_of_single_orders():
+    """Orders of different lengths can each be corrected on their own."""
+    short = np.sinc(np.linspace(-1, 1, 300)) ** 2
+    long = np.sinc(np.linspace(-1, 1, 500)) ** 2
+
+    for order in (short, long):
+        blaze = orders.blaze_from_flat(order, window=5)
+
+        assert blaze.shape == order.shape
+        np.testing.assert_allclose(
+            blaze, orders.blaze_from_flat(order[np.newaxis], window=5)[0]
+        )
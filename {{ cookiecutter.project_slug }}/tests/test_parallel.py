@@ -0,0 +1,60 @@
+"""Tests for process-pool execution of per-AD primitives.
+
+This is defined in {{ cookiecutter.instrument_name_lower }}dr/parallel.py.
+"""
+
+from unittest.mock import MagicMock
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}dr.parallel import per_ad_primitive
+
+
+class _Primitives:
+    """Just enough of a primitive set to run per-AD primitives."""
+
+    def __init__(self, adinputs, **kwargs):
+        self.log = MagicMock()
+
+    @per_ad_primitive
+    def markFile(self, ad, **params):
+        ad.phu["MARKED"] = True
+        ad[0].data[:] += 1
+        ad.update_filename(suffix=params["suffix"])
+
+        return None if ad.phu.get("DROPME") else ad
+
+
+def _make_ads(n_files):
+    adinputs = []
+
+    for i in range(n_files):
+        phu = fits.PrimaryHDU()
+        phu.header["INDEX"] = i
+        phu.header["DROPME"] = i == 2
+
+        ad = astrodata.create(phu, [fits.ImageHDU(np.full((5, 5), i, np.float32))])
+        ad.filename = f"file{i}.fits"
+        adinputs.append(ad)
+
+    return adinputs
+
+
+@pytest.mark.parametrize("n_workers", [1, 3])
+def test_outputs_in_order(n_workers):
+    """Outputs keep their order, filenames, headers and data."""
+    adoutputs = _Primitives([]).markFile(
+        _make_ads(5), suffix="_marked", n_workers=n_workers
+    )
+
+    assert [ad.phu["INDEX"] for ad in adoutputs] == [0, 1, 3, 4]
+    assert [ad.filename for ad in adoutputs] == [
+        f"file{i}_marked.fits" for i in (0, 1, 3, 4)
+    ]
+
+    for ad in adoutputs:
+        assert ad.phu["MARKED"]
+        np.testing.assert_array_equal(ad[0].data, ad.phu["INDEX"] + 1)
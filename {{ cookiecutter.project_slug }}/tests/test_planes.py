@@ -0,0 +1,68 @@
+"""Tests for copy-on-write handling of the pixel planes.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/planes.py.
+"""
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import planes
+
+
+@pytest.fixture
+def ad():
+    ad = astrodata.create(fits.PrimaryHDU())
+
+    for _ in range(2):
+        ad.append(np.ones((20, 30), dtype=np.float32))
+        ad[-1].variance = np.full((20, 30), 4, dtype=np.float32)
+        ad[-1].mask = np.zeros((20, 30), dtype=np.uint16)
+
+    ad[0].ORDERS = Table({"order": [1, 2]})
+    ad.filename = "frame.fits"
+
+    return ad
+
+
+def test_view_copies_only_what_is_written(ad):
+    """Views share every plane until one is written, and never touch the input."""
+    ad_out = planes.view(ad)
+
+    planes.assert_no_copies(ad_out, ad)
+    assert not ad_out[0].data.flags.writeable
+
+    with pytest.raises(ValueError):
+        ad_out[0].data += 1
+
+    planes.writable(ad_out[1], "mask")[...] |= 8
+    ad_out.phu["EDITED"] = True
+    ad_out[0].ORDERS["order"][0] = 10
+
+    planes.assert_no_copies(ad_out, ad, allowed=["mask"])
+    assert ad_out[1].mask.max() == 8 and ad[1].mask.max() == 0
+    assert "EDITED" not in ad.phu
+    assert ad[0].ORDERS["order"][0] == 1
+    assert ad_out.filename == "frame.fits"
+
+    with pytest.raises(AssertionError, match="extension 1 mask"):
+        planes.assert_no_copies(ad_out, ad)
+
+
+@pytest.mark.parametrize("mode", planes.PLANE_MODES)
+def test_output_modes(ad, mode):
+    """Only "copy" copies the planes; "inplace" gives back the input."""
+    ad_out = planes.output(ad, mode)
+
+    assert (ad_out is ad) == (mode == "inplace")
+
+    if mode == "copy":
+        with pytest.raises(AssertionError):
+            planes.assert_no_copies(ad_out, ad)
+
+    else:
+        planes.assert_no_copies(ad_out, ad)
+        assert planes.writable(ad_out[0], "data") is ad_out[0].data
@@ -0,0 +1,99 @@
+"""Tests for the prefetching reader.
+
+This is defined in {{ cookiecutter.instrument_name_lower }}dr/prefetch.py.
+"""
+
+import threading
+import time
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}dr import prefetch
+
+# Simulated latency of the filesystem, and processing time of each frame.
+READ_DELAY = 0.1
+COMPUTE_TIME = 0.1
+
+
+@pytest.fixture
+def paths(tmp_path):
+    paths = []
+
+    for i in range(6):
+        ad = astrodata.create(fits.PrimaryHDU())
+        ad.append(np.full((100, 100), i, dtype=np.float32))
+        path = tmp_path / f"frame{i}.fits"
+        ad.write(path)
+        paths.append(str(path))
+
+    return paths
+
+
+def _slow_load(item):
+    time.sleep(READ_DELAY)
+
+    return prefetch.load(item)
+
+
+@pytest.mark.parametrize("depth", [0, 2])
+def test_reading_overlaps_processing(paths, depth):
+    """With prefetching, the consumer hardly waits for the slow reads."""
+    reader = prefetch.Prefetcher(paths, depth=depth, loader=_slow_load)
+    values = []
+    start = time.perf_counter()
+
+    for ad in reader:
+        time.sleep(COMPUTE_TIME)
+        values.append(ad[0].data[0, 0])
+
+    elapsed = time.perf_counter() - start
+    serial = len(paths) * (READ_DELAY + COMPUTE_TIME)
+
+    assert values == list(range(6))
+    assert reader.stats["frames"] == 6
+    assert reader.stats["bytes"] == 6 * 100 * 100 * 4
+    assert reader.stats["compute"] >= len(paths) * COMPUTE_TIME
+
+    if depth:
+        assert elapsed < 0.75 * serial
+        assert reader.stats["wait"] < 2 * READ_DELAY
+
+    else:
+        assert elapsed >= serial
+        assert reader.stats["wait"] >= len(paths) * READ_DELAY
+
+
+def test_memory_is_bounded(paths):
+    """No more than ``max_bytes`` of files are held, but one always fits."""
+    size = prefetch._file_size(paths[0])
+
+    for max_bytes, peak in ((2.5 * size, 2 * size), (size / 2, size)):
+        reader = prefetch.Prefetcher(
+            paths, depth=5, max_bytes=max_bytes, loader=_slow_load
+        )
+
+        assert len(list(reader)) == 6
+        assert reader.peak_bytes == peak
+
+
+def test_errors_reach_the_consumer(paths):
+    """A failed read is raised in order, and the background threads stop."""
+    threads = threading.active_count()
+
+    def load(item):
+        if item == paths[2]:
+            raise OSError("unreadable")
+
+        return _slow_load(item)
+
+    seen = []
+
+    with pytest.raises(OSError, match="unreadable"):
+        for ad in prefetch.Prefetcher(paths, depth=3, loader=load):
+            seen.append(ad.filename)
+
+    assert seen == ["frame0.fits", "frame1.fits"]
+    assert threading.active_count() == threads
@@ -0,0 +1,119 @@
+"""Tests for per-primitive profiling.
+
+This is defined in {{ cookiecutter.instrument_name_lower }}dr/profiling.py.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from {{ cookiecutter.instrument_name_lower }}dr import profiling
+
+
+class _Primitives:
+    """A primitive set with three primitives and a helper method."""
+
+    def __init__(self, adinputs):
+        self.streams = {"main": adinputs}
+        self.params = {"double": None, "drop": None, "quadruple": None}
+        self.log = MagicMock()
+        profiling.attach(self)
+
+    def double(self, adinputs=None, **params):
+        adinputs = self.streams["main"] if adinputs is None else adinputs
+        return adinputs * 2
+
+    def drop(self, adinputs=None, **params):
+        return []
+
+    def quadruple(self, adinputs=None, **params):
+        return self.double(adinputs=self.double(adinputs=adinputs))
+
+    def helper(self):
+        return "not a primitive"
+
+
+@pytest.fixture
+def profiler(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "_profiler", None)
+    monkeypatch.setenv(profiling.PROFILE_ENV_VAR, str(tmp_path / "trace.json"))
+
+    return profiling.get_profiler()
+
+
+def test_disabled_by_default(monkeypatch):
+    """Without the environment variable nothing is wrapped."""
+    monkeypatch.delenv(profiling.PROFILE_ENV_VAR, raising=False)
+    monkeypatch.setattr(profiling, "_profiler", None)
+
+    p = _Primitives([1])
+
+    assert "double" not in vars(p)
+
+
+def test_calls_recorded(profiler):
+    """Every primitive call is recorded, with its inputs and outputs."""
+    p = _Primitives([1, 2])
+    p.double()
+    p.drop(adinputs=[1, 2, 3, 4])
+    p.helper()
+
+    assert [record["name"] for record in profiler.records] == ["double", "drop"]
+    assert [(r["n_in"], r["n_out"]) for r in profiler.records] == [(2, 4), (4, 0)]
+
+    for record in profiler.records:
+        assert record["wall"] >= 0
+        assert record["cpu"] >= 0
+
+
+def test_attach_is_idempotent(profiler):
+    """Attaching twice doesn't record calls twice."""
+    p = _Primitives([1])
+    profiling.attach(p)
+    p.double()
+
+    assert len(profiler.records) == 1
+
+
+def test_trace_and_summary(profiler):
+    """The trace is a valid Chrome trace and the summary lists primitives."""
+    p = _Primitives([1])
+    p.double()
+    p.double()
+
+    profiler.write()
+
+    with open(profiler.path) as trace_file:
+        events = json.load(trace_file)["traceEvents"]
+
+    assert [event["ph"] for event in events] == ["X", "X"]
+    assert events[0]["args"]["n_in"] == 1
+
+    summary = profiler.summary()
+    assert "double" in summary.splitlines()[1]
+    assert summary.splitlines()[1].split()[1] == "2"
+
+
+def test_written_when_the_recipe_finishes(profiler):
+    """The trace is written and the summary logged after each outermost call,
+    not after the calls it makes.
+    """
+    p = _Primitives([1])
+    p.double()
+
+    with open(profiler.path) as trace_file:
+        assert len(json.load(trace_file)["traceEvents"]) == 1
+
+    assert "double" in p.log.stdinfo.call_args.args[0]
+
+    p.log.reset_mock()
+    p.quadruple()
+
+    assert p.log.stdinfo.call_count == 2
+    assert [record["name"] for record in profiler.records] == [
+        "double",
+        "double",
+        "double",
+        "quadruple",
+    ]
@@ -0,0 +1,156 @@
+"""Tests for the primitive result cache.
+
+This is defined in {{ cookiecutter.instrument_name_lower }}dr/result_cache.py.
+"""
+
+import copy
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}dr import result_cache
+
+
+class _Primitives:
+    """One cached primitive, and one that always runs."""
+
+    timestamp_keys = {"addOne": "ADDONE", "writeOutputs": "WRITEOUT"}
+
+    def __init__(self, adinputs):
+        self.streams = {"main": adinputs}
+        self.params = {
+            "addOne": {"suffix": "_added", "amount": 1, "n_workers": 1},
+            "writeOutputs": {},
+        }
+        self.log = MagicMock()
+        self.calls = []
+        result_cache.attach(self)
+
+    def addOne(self, adinputs=None, **params):
+        """Return new objects, leaving the stream to the caller, as primitives
+        called with adinputs do.
+        """
+        self.calls.append("addOne")
+        adoutputs = [copy.deepcopy(ad) for ad in adinputs]
+
+        for ad in adoutputs:
+            ad[0].data += params.get("amount", 1)
+            ad.phu["ADDONE"] = "done"
+            ad.update_filename(suffix="_added")
+
+        return adoutputs
+
+    def writeOutputs(self, adinputs=None, **params):
+        self.calls.append("writeOutputs")
+        return adinputs
+
+
+def _make_ads(n_files=2, value=0):
+    adinputs = []
+
+    for i in range(n_files):
+        data = np.full((4, 4), value + i, dtype=np.float32)
+        ad = astrodata.create(fits.PrimaryHDU(), [fits.ImageHDU(data)])
+        ad.filename = f"frame{i}.fits"
+        adinputs.append(ad)
+
+    return adinputs
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv(result_cache.CACHE_DIR_ENV_VAR, str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+def test_key():
+    """Keys change with the data and parameters, not with the param order."""
+    config = {"suffix": "_x", "param1": "a", "n_workers": 1}
+    key = result_cache.ResultCache.key("prim", config, {}, _make_ads())
+
+    assert key == result_cache.ResultCache.key(
+        "prim", dict(reversed(config.items())), {"n_workers": 4}, _make_ads()
+    )
+    assert key != result_cache.ResultCache.key(
+        "prim", config, {"param1": "b"}, _make_ads()
+    )
+    assert key != result_cache.ResultCache.key("prim", config, {}, _make_ads(value=1))
+
+
+def test_results_reused(cache_dir):
+    """The second identical call reads the results back instead of running."""
+    computed = _Primitives(_make_ads())
+    first = computed.addOne()
+
+    assert computed.calls == ["addOne"]
+    assert computed.streams["main"] is first
+
+    p = _Primitives(_make_ads())
+    second = p.addOne()
+
+    assert p.calls == []
+    assert p.streams["main"] is second
+    assert [ad.filename for ad in second] == ["frame0_added.fits", "frame1_added.fits"]
+
+    for ad_first, ad_second in zip(first, second):
+        np.testing.assert_array_equal(ad_second[0].data, ad_first[0].data)
+        assert ad_second.phu["ADDONE"] == "done"
+
+    p.addOne(amount=2)
+    p.writeOutputs()
+    p.writeOutputs()
+
+    assert p.calls == ["addOne", "writeOutputs", "writeOutputs"]
+
+
+def test_least_recently_used_evicted(tmp_path):
+    """Going over the size limit removes the results unused for longest."""
+    cache = result_cache.ResultCache(tmp_path, max_size=1)
+
+    for key in ("a", "b", "c"):
+        cache.put(key, "addOne", _make_ads(1))
+
+    cache.get("a")
+    cache.max_size = 2.5 * cache.size() / 3 / 1e9
+    cache.evict()
+
+    assert sorted(entry[0] for entry in cache.entries()) == ["a", "c"]
+    assert cache.get("b") is None
+    assert sorted(path.name for path in tmp_path.glob("*.gz")) == [
+        "a_0.fits.gz",
+        "c_0.fits.gz",
+    ]
+
+    cache.close()
+
+
+def test_command_line(cache_dir, capsys):
+    """The command line lists and purges the cache."""
+    _Primitives(_make_ads()).addOne()
+
+    result_cache.main(["list"])
+    assert "addOne" in capsys.readouterr().out
+
+    result_cache.main(["purge", "--primitive", "someOtherPrimitive"])
+    result_cache.main(["purge"])
+    assert capsys.readouterr().out.splitlines() == [
+        "Removed 0 result(s)",
+        "Removed 1 result(s)",
+    ]
+
+
+def test_command_line_as_a_script():
+    """The command line also works when the file is run directly."""
+    result = subprocess.run(
+        [sys.executable, result_cache.__file__, "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.startswith("usage: result_cache.py")
@@ -0,0 +1,147 @@
+"""Tests for out-of-core stacking.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/stacking.py.
+"""
+
+import resource
+import tracemalloc
+
+import astrodata
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }} import stacking
+
+
+def _make_stack(n_inputs=7, shape=(37, 23), seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(100, 5, (n_inputs, *shape)).astype(np.float32)
+
+    # Add some cosmic rays and bad pixels for the rejection to deal with.
+    data[rng.random(data.shape) < 0.01] += 5000
+    mask = np.where(rng.random(data.shape) < 0.05, 1, 0).astype(np.uint16)
+    mask[:, 0, 0] = 1
+    variance = np.full(data.shape, 25, dtype=np.float32)
+
+    return data, mask, variance
+
+
+@pytest.mark.parametrize("operation", ["median", "mean"])
+@pytest.mark.parametrize("reject_method", ["sigclip", "none"])
+def test_chunked_matches_in_memory(operation, reject_method):
+    """The chunked combination is bit-identical to the in-memory one."""
+    data, mask, variance = _make_stack()
+    kwargs = {"operation": operation, "reject_method": reject_method}
+
+    expected = stacking.combine(data, mask, variance, **kwargs)
+
+    # Small enough to force a handful of rows per chunk.
+    memory_limit = 5 * len(data) * data.shape[2] * stacking.BYTES_PER_STACKED_PIXEL
+
+    result = stacking.chunked_combine(
+        list(data), list(mask), list(variance), memory_limit=memory_limit, **kwargs
+    )
+
+    for out, ref in zip(result, expected):
+        assert out.dtype == ref.dtype
+        assert out.tobytes() == ref.tobytes()
+
+
+def test_sigclip_rejects_outliers():
+    """A single hot input pixel doesn't make it into the mean."""
+    data = np.full((5, 3, 3), 10, dtype=np.float32)
+    data[:, 1, 1] = [9, 10, 11, 10, 1000]
+
+    out_data, out_mask, _ = stacking.combine(
+        data, operation="mean", reject_method="sigclip", lsigma=1.5, hsigma=1.5
+    )
+
+    assert out_data[1, 1] == pytest.approx(10)
+    assert not out_mask.any()
+
+
+def test_fully_flagged_pixels_keep_common_bits():
+    """Pixels flagged in every input are combined anyway and stay flagged."""
+    data = np.ones((3, 2, 2), dtype=np.float32)
+    mask = np.zeros((3, 2, 2), dtype=np.uint16)
+    mask[:, 0, 0] = [1, 3, 1]
+
+    out_data, out_mask, _ = stacking.combine(data, mask)
+
+    assert out_data[0, 0] == 1
+    assert out_mask[0, 0] == 1
+    assert out_mask[1, 1] == 0
+
+
+def test_fits_rows_round_trip(tmp_path):
+    """Memory-mapped reads undo the unsigned integer offset."""
+    dq = np.arange(40, dtype=np.uint16).reshape(8, 5) * 1000
+    sci = np.linspace(0, 1, 40, dtype=np.float32).reshape(8, 5)
+
+    path = tmp_path / "test.fits"
+    hdus = [fits.PrimaryHDU(), fits.ImageHDU(sci), fits.ImageHDU(dq)]
+    fits.HDUList(hdus).writeto(path)
+
+    with fits.open(path, memmap=True, do_not_scale_image_data=True) as hdulist:
+        sci_rows = stacking.FitsRows(hdulist[1])
+        dq_rows = stacking.FitsRows(hdulist[2])
+
+        np.testing.assert_array_equal(sci_rows[2:5], sci[2:5])
+        np.testing.assert_array_equal(dq_rows[2:5], dq[2:5])
+        assert dq_rows[2:5].dtype == np.uint16
+
+
+def test_spilled_inputs_release_their_memory(tmp_path, record_property):
+    """Spilling and combining adds at most one input to the peak memory."""
+    tracemalloc.start()
+
+    try:
+        data, mask, variance = _make_stack(n_inputs=16, shape=(512, 256))
+        adinputs = []
+
+        for sci, dq, var in zip(data, mask, variance):
+            ad = astrodata.create(fits.PrimaryHDU())
+            ad.append(sci.copy())
+            ad[0].mask = dq.copy()
+            ad[0].variance = var.copy()
+            adinputs.append(ad)
+
+        input_bytes = data[0].nbytes + mask[0].nbytes + variance[0].nbytes
+        expected = stacking.combine(data, mask, variance)
+        del data, mask, variance
+
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        paths = stacking.spill(adinputs, tmp_path)
+        memmap = {"memmap": True, "do_not_scale_image_data": True}
+        hdulists = [fits.open(path, **memmap) for path in paths]
+
+        result = stacking.chunked_combine(
+            *(
+                [stacking.FitsRows(hdulist[(extname, 1)]) for hdulist in hdulists]
+                for extname in ("SCI", "DQ", "VAR")
+            ),
+            memory_limit=4 * input_bytes,
+        )
+
+        for hdulist in hdulists:
+            hdulist.close()
+
+        _, peak = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    record_property("peak_traced_mb", (peak - baseline) / 2**20)
+    record_property("peak_rss", peak_rss)
+    print(f"peak above inputs {(peak - baseline) / 2**20:.1f} MB, ru_maxrss {peak_rss}")
+
+    assert all(len(ad) == 0 for ad in adinputs)
+    assert peak - baseline < 2 * input_bytes
+
+    for out, ref in zip(result, expected):
+        assert out.tobytes() == ref.tobytes()
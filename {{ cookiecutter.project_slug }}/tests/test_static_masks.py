@@ -0,0 +1,89 @@
+"""Tests for the cached static mask loader.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}dr/{{ cookiecutter.instrument_name_lower }}/lookups/static_masks.py.
+"""
+
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from {{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.lookups import static_masks  # fmt: skip
+
+
+def _frame(x_bin=1, y_bin=1, read_mode="default", date=None):
+    """Just the descriptors used to pick a mask."""
+    return SimpleNamespace(
+        detector_x_bin=lambda: x_bin,
+        detector_y_bin=lambda: y_bin,
+        read_mode=lambda: read_mode,
+        ut_date=lambda: date,
+    )
+
+
+@pytest.fixture
+def bpm_index(monkeypatch, tmp_path):
+    entries = [
+        (1, 1, "default", None, "2023-12-31", "old.fits"),
+        (1, 1, "default", "2024-01-01", None, "new.fits"),
+        (2, 2, "default", None, None, "binned.fits"),
+    ]
+    index = static_masks._build_index(entries, 3)
+    monkeypatch.setattr(static_masks, "_BPM_INDEX", index)
+    monkeypatch.setattr(static_masks, "BPM_DIR", str(tmp_path))
+
+    for name in ("old.fits", "new.fits", "binned.fits"):
+        dq = np.zeros((6, 4), dtype=np.uint16)
+        dq[2, 3] = 1
+        fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(dq)]).writeto(tmp_path / name)
+
+    static_masks.clear_cache()
+    yield tmp_path
+    static_masks.clear_cache()
+
+
+@pytest.mark.parametrize(
+    "frame, expected",
+    [
+        (_frame(date=datetime.date(2023, 6, 1)), "old.fits"),
+        (_frame(date=datetime.date(2024, 6, 1)), "new.fits"),
+        (_frame(), "new.fits"),
+        (_frame(2, 2, date=datetime.date(2024, 6, 1)), "binned.fits"),
+        (_frame(read_mode="fast"), None),
+    ],
+)
+def test_bpm_resolution(bpm_index, frame, expected):
+    """Masks are picked by binning, read mode and date."""
+    path = static_masks.bpm_filename(frame)
+
+    if expected is None:
+        assert path is None
+    else:
+        assert path == str(bpm_index / expected)
+
+
+def test_images_are_mapped_read_only(tmp_path):
+    """Unscaled images are read-only views of the file, loaded once."""
+    data = np.arange(12, dtype=np.int16).reshape(3, 4)
+    path = tmp_path / "mask.fits"
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(data)]).writeto(path)
+
+    (_, _), (_, mapped) = static_masks.load(path)
+
+    np.testing.assert_array_equal(mapped, data)
+    assert not mapped.flags.writeable
+    assert not mapped.flags.owndata
+    assert static_masks.load(path)[1][1] is mapped
+
+
+def test_unsigned_masks(bpm_index):
+    """uint16 masks come back unsigned, with their values intact."""
+    bpm = static_masks.get_bpm(_frame())
+
+    assert bpm[0].data.dtype == np.uint16
+    assert bpm[0].data[2, 3] == 1
+    assert bpm[0].data.sum() == 1
+    assert not bpm[0].data.flags.writeable
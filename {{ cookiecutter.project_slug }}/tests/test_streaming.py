@@ -0,0 +1,77 @@
+"""Tests for streaming recipe execution.
+
+This is defined in {{ cookiecutter.instrument_name_lower }}dr/streaming.py.
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from {{ cookiecutter.instrument_name_lower }}dr.streaming import Barrier, Step, stream
+
+
+class _Primitives:
+    """Records which primitive saw which frames, in order."""
+
+    def __init__(self, adinputs):
+        self.streams = {"main": adinputs}
+        self.log = MagicMock()
+        self.calls = []
+
+    def __getattr__(self, name):
+        def primitive(adinputs=None, **params):
+            self.calls.append((name, list(adinputs)))
+
+            if name == "stack":
+                return [sum(adinputs)]
+
+            return [ad * 10 for ad in adinputs]
+
+        return primitive
+
+
+@pytest.mark.parametrize("window", [1, 2])
+def test_frames_go_through_all_steps_in_turn(window):
+    """Each window finishes every step before the next one is read."""
+    p = _Primitives([1, 2, 3])
+
+    outputs = stream(p, [Step("first"), Step("second")], window=window)
+
+    assert outputs == p.streams["main"] == [100, 200, 300]
+
+    if window == 1:
+        assert p.calls == [
+            ("first", [1]),
+            ("second", [10]),
+            ("first", [2]),
+            ("second", [20]),
+            ("first", [3]),
+            ("second", [30]),
+        ]
+
+    else:
+        assert p.calls == [
+            ("first", [1, 2]),
+            ("second", [10, 20]),
+            ("first", [3]),
+            ("second", [30]),
+        ]
+
+
+def test_barrier_sees_all_frames():
+    """A barrier waits for every frame, then streaming resumes."""
+    p = _Primitives([1, 2, 3])
+
+    outputs = stream(p, [Step("first"), Barrier("stack"), Step("second")])
+
+    assert outputs == [600]
+    assert p.calls[-2:] == [("stack", [10, 20, 30]), ("second", [60])]
+
+
+def test_inputs_released():
+    """Frames are taken out of the input list, and dropped if not kept."""
+    adinputs = [1, 2, 3]
+    p = _Primitives(adinputs)
+
+    assert stream(p, [Step("first")], keep=False) == []
+    assert adinputs == []
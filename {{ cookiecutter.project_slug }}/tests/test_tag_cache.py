@@ -0,0 +1,105 @@
+"""Tests for the on-disk tag/descriptor cache.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}_instruments/{{ cookiecutter.instrument_name_lower }}/tag_cache.py.
+"""
+
+import os
+
+import pytest
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import tag_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A TagCache in a temporary location."""
+    cache = tag_cache.TagCache(tmp_path / "tags.sqlite", max_entries=3)
+    yield cache
+    cache.close()
+
+
+def _touch(path, contents="x"):
+    path.write_text(contents)
+    return path
+
+
+def test_round_trip(cache, tmp_path):
+    """Stored tags and descriptors are returned unchanged."""
+    path = _touch(tmp_path / "a.fits")
+
+    tags = {"{{ cookiecutter.instrument_name }}", "RAW"}
+    descriptors = {"gain": 3, "object": "M31"}
+
+    assert cache.get(path) is None
+
+    cache.put(path, tags, descriptors)
+
+    assert cache.get(path) == (tags, descriptors)
+
+
+def test_changed_file_is_a_miss(cache, tmp_path):
+    """Changing a file on disk invalidates its entry."""
+    path = _touch(tmp_path / "a.fits")
+    cache.put(path, {"RAW"}, {})
+
+    _touch(path, "something longer")
+
+    assert cache.get(path) is None
+    assert len(cache) == 0
+
+
+def test_other_code_version_is_a_miss(cache, tmp_path):
+    """Entries made by another version of the code are not served."""
+    path = _touch(tmp_path / "a.fits")
+    cache.put(path, {"RAW"}, {})
+
+    upgraded = tag_cache.TagCache(cache.path, version="upgraded")
+
+    try:
+        assert upgraded.get(path) is None
+        assert len(upgraded) == 0
+
+    finally:
+        upgraded.close()
+
+
+def test_lru_eviction(cache, tmp_path):
+    """The least recently used entry goes first once the cache is full."""
+    paths = [_touch(tmp_path / f"{i}.fits") for i in range(4)]
+
+    for path in paths[:3]:
+        cache.put(path, {"RAW"}, {})
+
+    # Touch the oldest entry so the second one becomes least recently used.
+    assert cache.get(paths[0]) is not None
+
+    cache.put(paths[3], {"RAW"}, {})
+
+    assert len(cache) == 3
+    assert cache.get(paths[1]) is None
+    assert cache.get(paths[0]) is not None
+
+
+def test_get_tags_only_evaluates_once(cache, tmp_path, monkeypatch):
+    """A warm cache does not open the file again; opting out always does."""
+    path = _touch(tmp_path / "a.fits")
+    calls = []
+
+    def fake_evaluate(path):
+        calls.append(path)
+        return {"RAW"}, {"gain": 3}
+
+    monkeypatch.setattr(tag_cache, "_evaluate", fake_evaluate)
+    monkeypatch.setattr(tag_cache, "_default_cache", cache)
+
+    assert tag_cache.get_tags(path) == {"RAW"}
+    assert tag_cache.get_descriptors(path) == {"gain": 3}
+    assert len(calls) == 1
+
+    tag_cache.get_tags(path, use_cache=False)
+    assert len(calls) == 2
+
+    monkeypatch.setitem(os.environ, tag_cache.DISABLE_ENV_VAR, "1")
+    tag_cache.get_tags(path)
+    assert len(calls) == 3
@@ -0,0 +1,41 @@
+"""Tests for the version of the code the caches are keyed on.
+
+This is defined in
+{{ cookiecutter.instrument_name_lower }}_instruments/{{ cookiecutter.instrument_name_lower }}/versions.py.
+"""
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import versions
+
+
+def test_editing_a_package_changes_the_version(tmp_path, monkeypatch):
+    """Editing any source file of the packages, such as a lookup table,
+    changes the version.
+    """
+    package = tmp_path / "somepackage"
+    (package / "sub").mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "sub" / "lookup.py").write_text("gain = 3\n")
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(versions, "PACKAGES", ("somepackage",))
+
+    # Not through the lru_cache, which holds the version of the real packages.
+    version = versions.code_version.__wrapped__()
+    (package / "sub" / "lookup.py").write_text("gain = 1\n")
+
+    assert versions.code_version.__wrapped__() != version
+
+
+def test_missing_packages_are_skipped(monkeypatch):
+    """A package that is not installed does not stop the others from being
+    versioned.
+    """
+    monkeypatch.setattr(
+        versions, "PACKAGES", versions.PACKAGES + ("no_such_package_here",)
+    )
+
+    version = versions.code_version.__wrapped__().split("-")
+
+    # One version per package, DRAGONS' and the digest.
+    assert len(version) == len(versions.PACKAGES) + 2
+    assert version[len(versions.PACKAGES) - 1] == "unknown"
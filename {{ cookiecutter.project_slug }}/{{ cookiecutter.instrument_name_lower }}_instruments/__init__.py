@@ -1,6 +1,5 @@
 # Import the modules under this package to trigger any class
-# registering that may be needed.
-
-import astrodata  # noqa: F401
+# registering that may be needed. This is cheap: the AstroData class is
+# only registered once astrodata itself is imported.
 
 from . import {{ cookiecutter.instrument_name_lower }}  # noqa: F401
@@ -1,10 +1,61 @@
-__all__ = ["AstroData{{ cookiecutter.instrument_name }}"]
+"""The {{ cookiecutter.instrument_name }} AstroData class and the modules that work from headers alone.
 
-from astrodata import factory
-from gemini_instruments.gemini import addInstrumentFilterWavelengths
-from .adclass import AstroData{{ cookiecutter.instrument_name_title }}
-from .lookup import filter_wavelengths
+Importing this package is cheap: it does not import ``astrodata``. Its
+AstroData class is registered with the astrodata factory as soon as
+``astrodata`` is imported, by anyone. The class is based on
+``gemini_instruments``' ``AstroDataGemini``, so once this package is imported,
+importing ``astrodata`` also imports ``gemini_instruments``.
+"""
 
-factory.addClass(AstroData{{ cookiecutter.instrument_name_title }})
+__all__ = ["AstroData{{ cookiecutter.instrument_name }}", "matches_file"]
 
-addInstrumentFilterWavelengths("{{ cookiecutter.instrument_name }}", filter_wavelengths)
+import importlib
+import sys
+
+from .headers import matches_file
+from .lazy import when_imported
+
+
+def _register():
+    from astrodata import factory
+    from gemini_instruments.gemini import addInstrumentFilterWavelengths
+    from .adclass import AstroData{{ cookiecutter.instrument_name_title }}
+    from .dispatch import register
+    from .headers import INSTRUMENT_FITS_NAME
+    from .lookup import filter_wavelengths
+
+    factory.addClass(AstroData{{ cookiecutter.instrument_name_title }})
+    register(factory, INSTRUMENT_FITS_NAME, AstroData{{ cookiecutter.instrument_name_title }})
+
+    addInstrumentFilterWavelengths("{{ cookiecutter.instrument_name }}", filter_wavelengths)
+
+
+def __getattr__(name):
+    # The AstroData class is only imported when it is asked for.
+    if name == "AstroData{{ cookiecutter.instrument_name_title }}":
+        from .adclass import AstroData{{ cookiecutter.instrument_name_title }}
+
+        return AstroData{{ cookiecutter.instrument_name_title }}
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _import_adclass():
+    importlib.import_module(f"{__name__}.adclass")
+
+
+def _astrodata_imported():
+    # gemini_instruments.gemini imports astrodata before defining
+    # AstroDataGemini, which adclass needs. When it is what imported astrodata,
+    # adclass waits for it to finish instead.
+    if "gemini_instruments.gemini" not in sys.modules:
+        _import_adclass()
+
+
+# Registration waits for astrodata to be imported, by anyone; importing this
+# package does not import astrodata or gemini_instruments. The class registers
+# itself once adclass is imported, including when adclass is what triggers the
+# import of astrodata.
+when_imported(f"{__name__}.adclass", _register)
+when_imported("gemini_instruments.gemini", _import_adclass)
+when_imported("astrodata", _astrodata_imported)
@@ -1,17 +1,62 @@
+import numpy as np
+
 from astrodata import astro_data_tag, astro_data_descriptor, TagSet
 from . import lookup
+from .headers import instrument_matches
 from gemini_instruments.gemini import AstroDataGemini
 
 
+# Per-amplifier properties, from lookup.py.
+_AMP_FIELDS = ("gain", "read_noise", "saturation")
+
+
+def _amp_keys(read_modes, amps):
+    """Combine read modes and amplifier names into single lookup keys."""
+    return np.char.add(np.char.add(read_modes, "|"), amps)
+
+
+def _amp_table(defaults, overrides):
+    """Turn lookup.array_properties and amp_properties into a structured
+    array, with one row per (read mode, amplifier).
+    """
+    rows = {("default", "default"): defaults}
+    rows.update(
+        (key, {**defaults, **properties}) for key, properties in overrides.items()
+    )
+
+    return np.array(
+        [
+            (read_mode, amp, *(values.get(name, np.nan) for name in _AMP_FIELDS))
+            for (read_mode, amp), values in rows.items()
+        ],
+        dtype=[("read_mode", "U16"), ("amp", "U16")]
+        + [(name, "f8") for name in _AMP_FIELDS],
+    )
+
+
+_AMP_TABLE = _amp_table(lookup.array_properties, lookup.amp_properties)
+
+# Sorted keys of _AMP_TABLE, so every extension of a frame can be matched with
+# a single searchsorted call.
+_AMP_KEYS = _amp_keys(_AMP_TABLE["read_mode"], _AMP_TABLE["amp"])
+_AMP_ORDER = np.argsort(_AMP_KEYS)
+_SORTED_AMP_KEYS = _AMP_KEYS[_AMP_ORDER]
+
+
 class AstroData{{ cookiecutter.instrument_name_title }}(AstroDataGemini):
     # single keyword mapping.  add only the ones that are different
     # from what's already defined in AstroDataGemini.
 
-    __keyword_dict = dict()
+    __keyword_dict = dict(
+        read_mode="READMODE",
+        amp_name="AMPNAME",
+    )
 
     @staticmethod
     def _matches_data(source):
-        return source[0].header.get("INSTRUME", "").upper() == "{{ cookiecutter.instrument_fits_name }}"
+        # For identifying files on disk without opening them, see
+        # headers.matches_file.
+        return instrument_matches(source[0].header.get("INSTRUME", ""))
 
     @astro_data_tag
     def _tag_instrument(self):
@@ -23,18 +68,102 @@ class AstroData{{ cookiecutter.instrument_name_title }}(AstroDataGemini):
         #    return TagSet(['FLAT', 'CAL']])
         pass
 
+    # ---------------------
+    # Per-amplifier lookups
+    # ---------------------
+
+    def _amp_properties(self):
+        """Return the per-amplifier properties of every extension.
+
+        All extensions are resolved at once, the first time they are needed,
+        and the rows are kept on this instance: the read mode and amplifier
+        names are not read from the headers again. Extensions without a
+        matching row get NaN.
+        """
+        rows = self.__dict__.get("_amp_rows")
+
+        if rows is None:
+            read_mode = self.read_mode()
+            amps = self.hdr.get(self._keyword_for("amp_name"), "default")
+
+            if self.is_single:
+                amps = [amps]
+
+            query = _amp_keys(np.full(len(amps), read_mode), np.asarray(amps, str))
+            index = np.searchsorted(_SORTED_AMP_KEYS, query)
+            index = np.minimum(index, len(_SORTED_AMP_KEYS) - 1)
+            found = _SORTED_AMP_KEYS[index] == query
+
+            rows = _AMP_TABLE[_AMP_ORDER[index]]
+
+            for name in _AMP_FIELDS:
+                rows[name][~found] = np.nan
+
+            self.__dict__["_amp_rows"] = rows
+
+        return rows
+
+    def _amp_descriptor(self, field):
+        """Return one per-amplifier column, as a descriptor would."""
+        values = [
+            None if np.isnan(value) else value
+            for value in self._amp_properties()[field].tolist()
+        ]
+
+        return values[0] if self.is_single else values
+
     # ------------------
     # Common descriptors
     # ------------------
 
+    @astro_data_descriptor
+    def read_mode(self):
+        """
+        Returns the detector read mode, or "default" if the header does not
+        say
+
+        Returns
+        -------
+        str
+            read mode
+        """
+        return self.phu.get(self._keyword_for("read_mode"), "default")
+
     @astro_data_descriptor
     def gain(self):
         """
-        Returns the gain (electrons/ADU) from lookup table
+        Returns the gain (electrons/ADU) for each extension from the
+        per-amplifier lookup table
 
         Returns
         -------
         float/list
             gain
         """
-        return lookup.array_properties.get("gain")
+        return self._amp_descriptor("gain")
+
+    @astro_data_descriptor
+    def read_noise(self):
+        """
+        Returns the read noise (electrons) for each extension from the
+        per-amplifier lookup table
+
+        Returns
+        -------
+        float/list
+            read noise
+        """
+        return self._amp_descriptor("read_noise")
+
+    @astro_data_descriptor
+    def saturation_level(self):
+        """
+        Returns the saturation level (ADU) for each extension from the
+        per-amplifier lookup table
+
+        Returns
+        -------
+        float/list
+            saturation level
+        """
+        return self._amp_descriptor("saturation")
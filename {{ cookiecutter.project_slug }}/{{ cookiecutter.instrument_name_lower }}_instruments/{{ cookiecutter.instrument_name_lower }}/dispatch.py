@@ -0,0 +1,221 @@
+"""``INSTRUME`` to AstroData class table, in front of the astrodata factory.
+
+The factory identifies a file by trying the ``_matches_data`` of every class
+added with ``factory.addClass``. With many instrument packages installed, that
+is one ``INSTRUME`` comparison per instrument for every file opened. Instead,
+the first instrument package to :func:`register` its ``INSTRUME`` value puts a
+lookup in a table in front of the factory: files whose ``INSTRUME`` is in the
+table go straight to their class, others are identified with ``_matches_data``
+as before.
+
+The table is built from every class added to the factory, and rebuilt when
+classes are added:
+
++ values given to :func:`register` map to their class. These are trusted:
+  the class is used without calling its ``_matches_data``;
++ other classes, such as those of ``gemini_instruments``, map the tags their
+  ``_tag_instrument`` gives, when it can be called without data, as these are
+  usually the ``INSTRUME`` value. These are checked with the class's own
+  ``_matches_data``, on the primary header, which is one call instead of one
+  per class.
+
+Values claimed by two classes, neither of which is a subclass of the other,
+and classes with a more specific subclass added to the factory, are left to
+``_matches_data``. A class outside the table that also matches a value in it
+is not tried: classes matching files by their ``INSTRUME`` value should claim
+only their own.
+
+Registered values are kept on the factory, as ``TABLE_ATTRIBUTE``, so that
+they are shared by every instrument package made from this template, whichever
+copy of this module registers first. Keep the attribute name and the table
+format the same across them.
+"""
+
+import functools
+import logging
+import os
+
+from astropy.io import fits
+
+from .headers import instrument_key, read_primary_header
+
+# Attribute of the factory holding the registered values, mapping
+# instrument_key() values to classes, or to None for values claimed by more
+# than one class.
+TABLE_ATTRIBUTE = "_instrument_classes"
+
+# Attribute of the factory holding the table built from all its classes, with
+# the number of classes it was built from.
+LOOKUP_ATTRIBUTE = "_instrument_lookup"
+
+log = logging.getLogger(__name__)
+
+
+def register(factory, instrument, cls):
+    """Map ``INSTRUME`` value ``instrument`` to ``cls`` in the factory's table.
+
+    ``cls`` must also be added to the factory, and should only match files
+    with that ``INSTRUME`` value. Values are compared as
+    ``headers.instrument_key`` makes them.
+    """
+    table = getattr(factory, TABLE_ATTRIBUTE, None)
+
+    if table is None:
+        table = {}
+        setattr(factory, TABLE_ATTRIBUTE, table)
+        _install(factory)
+
+    key = instrument_key(instrument)
+    claimed = table.get(key, cls)
+
+    if claimed is not cls:
+        if claimed is not None:
+            log.warning(
+                "INSTRUME %s is claimed by both %s and %s, identifying it with "
+                "_matches_data",
+                key,
+                claimed.__name__,
+                cls.__name__,
+            )
+
+        cls = None
+
+    table[key] = cls
+
+    # Rebuilt with the new value on the next lookup.
+    setattr(factory, LOOKUP_ATTRIBUTE, None)
+
+
+def _tagged_instruments(cls):
+    """The instrument tags of a class, or nothing if they depend on the data."""
+    try:
+        tags = cls._tag_instrument(None)
+
+    except Exception:
+        return ()
+
+    return getattr(tags, "add", None) or ()
+
+
+def _has_subclass_in(cls, registry):
+    return any(
+        subclass in registry or _has_subclass_in(subclass, registry)
+        for subclass in cls.__subclasses__()
+    )
+
+
+def _most_specific(classes):
+    """The one class of ``classes`` the others are bases of, or None."""
+    specific = [
+        cls
+        for cls in classes
+        if not any(other is not cls and issubclass(other, cls) for other in classes)
+    ]
+
+    return specific[0] if len(specific) == 1 else None
+
+
+def build_table(factory):
+    """Return the table of all the factory's classes.
+
+    It maps instrument_key() values to ``(class, checked)``, where ``checked``
+    tells whether the class's ``_matches_data`` has to confirm it, or to None
+    for values left to ``_matches_data``.
+    """
+    registry = list(getattr(factory, "_registry", ()))
+    registered = getattr(factory, TABLE_ATTRIBUTE, None) or {}
+    claims = {}
+
+    for cls in registry:
+        for tag in _tagged_instruments(cls):
+            claims.setdefault(instrument_key(tag), []).append(cls)
+
+    table = {}
+
+    for key, classes in claims.items():
+        cls = _most_specific(classes)
+        table[key] = None if cls is None else (cls, True)
+
+    for key, cls in registered.items():
+        # Registration is trusted over the tags, but not over registrations
+        # of other classes.
+        table[key] = None if cls is None or cls not in registry else (cls, False)
+
+    for key, entry in table.items():
+        if entry is not None and _has_subclass_in(entry[0], registry):
+            table[key] = None
+
+    return table
+
+
+def _table(factory):
+    """The factory's table, rebuilt if classes were added since it was built."""
+    n_classes = len(getattr(factory, "_registry", ()))
+    built = getattr(factory, LOOKUP_ATTRIBUTE, None)
+
+    if built is None or built[0] != n_classes:
+        built = (n_classes, build_table(factory))
+        setattr(factory, LOOKUP_ATTRIBUTE, built)
+
+    return built[1]
+
+
+def lookup(factory, source):
+    """Return the class the table gives for ``source``, or None.
+
+    ``source`` is a path or an HDU list. None means the file has to be
+    identified with ``_matches_data``.
+    """
+    is_path = isinstance(source, (str, os.PathLike))
+
+    # Anything the factory cannot open is left for it to report.
+    try:
+        header = read_primary_header(source) if is_path else source[0].header
+
+    except Exception:
+        return None
+
+    instrument = header.get("INSTRUME")
+
+    if instrument is None:
+        return None
+
+    entry = _table(factory).get(instrument_key(instrument))
+
+    if entry is None:
+        return None
+
+    cls, checked = entry
+
+    if checked:
+        if is_path:
+            source = fits.HDUList([fits.PrimaryHDU(header=fits.Header(header))])
+
+        # The factory takes classes failing to match as not matching.
+        try:
+            if not cls._matches_data(source):
+                return None
+
+        except Exception:
+            return None
+
+    return cls
+
+
+def _install(factory):
+    """Put the table lookup in front of the factory's identification."""
+    # Older versions of astrodata only have the camel case name.
+    name = "get_astrodata" if hasattr(factory, "get_astrodata") else "getAstroData"
+    match_all = getattr(factory, name)
+
+    @functools.wraps(match_all)
+    def get_astrodata(source):
+        cls = lookup(factory, source)
+
+        if cls is None:
+            return match_all(source)
+
+        # Only the primary header was read so far: the file is opened once.
+        return cls.read(source)
+
+    setattr(factory, name, get_astrodata)
@@ -0,0 +1,408 @@
+"""Columnar index of the {{ cookiecutter.instrument_name }} files in a directory.
+
+:func:`scan` walks a directory once and records, for every {{ cookiecutter.instrument_name }} file, the
+primary header keywords in ``INDEXED_KEYWORDS``, the descriptors in
+``INDEXED_DESCRIPTORS`` and the tags. Each of them becomes a NumPy array with
+one element per file, so selecting frames or matching calibrations is a
+vectorized filter instead of opening every file::
+
+    index = scan("/data/{{ cookiecutter.instrument_name_lower }}")
+    darks = index.select("DARK", exposure_time=300.0, read_mode="fast")
+    long_exposures = index.select(exposure_time=lambda t: t > 600)
+
+    best_dark = index.closest(
+        ad.ut_datetime(), "DARK", exposure_time=ad.exposure_time()
+    )[0]
+
+The index is saved next to the files as an ``.npz`` file. Scanning the
+directory again only opens the files that are new or changed since (by mtime
+and size) and forgets files that have gone. Files that cannot be read are
+logged and left out.
+
+Column types follow the values: numbers become ``float64`` (NaN where
+missing), times ``datetime64[ms]`` (NaT), booleans ``bool`` and anything else
+``str`` (empty where missing). Descriptors returning one value per extension
+are indexed when all extensions agree, and missing otherwise.
+"""
+
+import argparse
+import datetime
+import logging
+import os
+
+import numpy as np
+
+from .headers import matches_file, read_primary_header
+
+# Primary header keywords stored in the index. Add any keyword the adclass
+# starts using.
+INDEXED_KEYWORDS = (
+    "INSTRUME",
+    "OBJECT",
+    "OBSTYPE",
+    "OBSCLASS",
+    "OBSID",
+    "DATALAB",
+    "READMODE",
+    "EXPTIME",
+    "DATE-OBS",
+    "TIME-OBS",
+)
+
+# Descriptors stored in the index, evaluated with astrodata.
+INDEXED_DESCRIPTORS = (
+    "data_label",
+    "exposure_time",
+    "gain",
+    "object",
+    "observation_type",
+    "read_mode",
+    "read_noise",
+    "ut_datetime",
+)
+
+FITS_SUFFIXES = (".fits", ".fits.gz", ".fits.fz", ".fz")
+
+DEFAULT_INDEX_NAME = ".{{ cookiecutter.instrument_name_lower }}_index.npz"
+
+log = logging.getLogger(__name__)
+
+
+def _column(values):
+    """Turn a list of Python values (None if missing) into an array."""
+    present = [value for value in values if value is not None]
+
+    if present and all(isinstance(value, bool) for value in present):
+        return np.array([bool(value) for value in values])
+
+    if all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in present
+    ):
+        return np.array(
+            [np.nan if value is None else value for value in values], dtype=np.float64
+        )
+
+    if all(isinstance(value, datetime.datetime) for value in present):
+        return np.array(
+            [np.datetime64("NaT") if value is None else value for value in values],
+            dtype="datetime64[ms]",
+        )
+
+    return np.array(["" if value is None else str(value) for value in values])
+
+
+def _values(column):
+    """Inverse of :func:`_column`."""
+    if column.dtype.kind == "f":
+        return [None if np.isnan(value) else value for value in column.tolist()]
+
+    if column.dtype.kind == "M":
+        return [None if np.isnat(value) else value.item() for value in column]
+
+    if column.dtype.kind == "U":
+        return [value or None for value in column.tolist()]
+
+    return column.tolist()
+
+
+def _scalar(value):
+    """One value for a descriptor, or None if the extensions disagree."""
+    if isinstance(value, np.generic):
+        value = value.item()
+
+    if isinstance(value, (list, tuple)):
+        return value[0] if value and all(item == value[0] for item in value) else None
+
+    if isinstance(value, (bool, int, float, str, datetime.datetime)):
+        return value
+
+    return None
+
+
+def _evaluate(path):
+    """Read the keywords, tags and descriptors of one file."""
+    # Imported here so loading and querying an index never need astrodata.
+    import astrodata
+
+    header = read_primary_header(path)
+    row = {keyword: header.get(keyword) for keyword in INDEXED_KEYWORDS}
+
+    ad = astrodata.open(path)
+
+    for name in INDEXED_DESCRIPTORS:
+        try:
+            row[name] = _scalar(getattr(ad, name)())
+
+        # Many descriptors legitimately fail on raw data; leave those missing.
+        except Exception:
+            row[name] = None
+
+    return row, set(ad.tags)
+
+
+class HeaderIndex:
+    """Keywords, descriptors and tags of a set of files, as columns.
+
+    Parameters
+    ----------
+    paths : array of str
+        The files, as absolute paths.
+    mtimes, sizes : array of int
+        Modification times (ns) and sizes of the files when indexed.
+    columns : dict
+        One array per keyword and descriptor. Keywords are upper case and
+        descriptors lower case.
+    tag_names : array of str
+        All the tags seen.
+    tags : 2D array of bool
+        Whether each file (row) has each tag (column).
+    """
+
+    def __init__(self, paths, mtimes, sizes, columns, tag_names, tags):
+        self.paths = np.asarray(paths, dtype=str)
+        self.mtimes = np.asarray(mtimes, dtype=np.int64)
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.columns = columns
+        self.tag_names = np.asarray(tag_names, dtype=str)
+        self.tags = np.asarray(tags, dtype=bool).reshape(
+            len(self.paths), len(self.tag_names)
+        )
+
+    @classmethod
+    def from_rows(cls, paths, mtimes, sizes, rows, tag_sets):
+        names = sorted(set().union(*tag_sets)) if tag_sets else []
+        tags = np.array([[name in tag_set for name in names] for tag_set in tag_sets])
+        columns = {
+            name: _column([row.get(name) for row in rows])
+            for name in INDEXED_KEYWORDS + INDEXED_DESCRIPTORS
+        }
+
+        return cls(paths, mtimes, sizes, columns, names, tags)
+
+    def rows(self):
+        """Iterate over the files as ``(path, mtime, size, row, tags)``."""
+        names = list(self.columns)
+        values = [_values(self.columns[name]) for name in names]
+
+        for i, path in enumerate(self.paths.tolist()):
+            yield (
+                path,
+                int(self.mtimes[i]),
+                int(self.sizes[i]),
+                {name: column[i] for name, column in zip(names, values)},
+                set(self.tag_names[self.tags[i]].tolist()),
+            )
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def has_tags(self, *tags):
+        """Return a mask of the files having all ``tags``."""
+        mask = np.ones(len(self), dtype=bool)
+
+        for tag in tags:
+            if tag not in self.tag_names:
+                return np.zeros(len(self), dtype=bool)
+
+            mask &= self.tags[:, np.flatnonzero(self.tag_names == tag)[0]]
+
+        return mask
+
+    def mask(self, *tags, **values):
+        """Return a mask of the files having all ``tags`` and ``values``.
+
+        Each keyword argument names a column. Its value is either compared
+        for equality, or, if callable, called with the column and expected to
+        return a mask.
+        """
+        mask = self.has_tags(*tags)
+
+        for name, value in values.items():
+            column = self.columns[name]
+            mask &= value(column) if callable(value) else column == value
+
+        return mask
+
+    def select(self, *tags, **values):
+        """Return the paths of the files having all ``tags`` and ``values``.
+
+        See :meth:`mask` for the meaning of the arguments.
+        """
+        return self.paths[self.mask(*tags, **values)].tolist()
+
+    def closest(self, when, *tags, time_column="ut_datetime", **values):
+        """Return the matching files, closest in time to ``when`` first.
+
+        This is how calibrations are matched to a science frame: ``tags`` and
+        ``values`` select the candidates (see :meth:`mask`), which are then
+        sorted by their distance in time. Files without a time come last, so
+        if no file has one, the matching files are returned in index order.
+
+        Raises
+        ------
+        ValueError
+            If ``time_column`` holds values that are not times.
+        """
+        mask = self.mask(*tags, **values)
+        times = self.columns[time_column][mask]
+
+        # A column is only made of times if at least one file has one.
+        if times.dtype.kind != "M":
+            if any(value is not None for value in _values(self.columns[time_column])):
+                raise ValueError(f"{time_column} is not a column of times")
+
+            return self.paths[mask].tolist()
+
+        distance = np.abs(times - np.datetime64(when, "ms")).astype(np.float64)
+        distance[np.isnat(times)] = np.inf
+
+        return self.paths[mask][np.argsort(distance, kind="stable")].tolist()
+
+    def save(self, path):
+        """Write the index to an ``.npz`` file."""
+        np.savez(
+            path,
+            paths=self.paths,
+            mtimes=self.mtimes,
+            sizes=self.sizes,
+            tag_names=self.tag_names,
+            tags=self.tags,
+            **{f"column:{name}": column for name, column in self.columns.items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by :meth:`save`."""
+        with np.load(path, allow_pickle=False) as arrays:
+            columns = {
+                name.split(":", 1)[1]: arrays[name]
+                for name in arrays.files
+                if name.startswith("column:")
+            }
+
+            return cls(
+                arrays["paths"],
+                arrays["mtimes"],
+                arrays["sizes"],
+                columns,
+                arrays["tag_names"],
+                arrays["tags"],
+            )
+
+
+def scan(directory, index_path=None, recursive=True):
+    """Index the {{ cookiecutter.instrument_name }} files in ``directory``, updating the saved index.
+
+    Parameters
+    ----------
+    directory : str
+        Where the files are.
+    index_path : str, optional
+        Where the index is kept; ``.{{ cookiecutter.instrument_name_lower }}_index.npz`` in ``directory`` by
+        default. Files whose mtime and size match the saved index are not
+        read again.
+    recursive : bool
+        Also index the subdirectories?
+
+    Returns
+    -------
+    HeaderIndex
+    """
+    directory = os.path.abspath(directory)
+
+    if index_path is None:
+        index_path = os.path.join(directory, DEFAULT_INDEX_NAME)
+
+    known = {}
+
+    if os.path.exists(index_path):
+        known = {entry[0]: entry for entry in HeaderIndex.load(index_path).rows()}
+
+    entries = []
+
+    for root, dirs, files in os.walk(directory):
+        if not recursive:
+            dirs.clear()
+
+        for filename in sorted(files):
+            if not filename.endswith(FITS_SUFFIXES):
+                continue
+
+            path = os.path.join(root, filename)
+            entry = known.get(path)
+
+            # One unreadable file must not stop the whole directory from
+            # being indexed.
+            try:
+                stat = os.stat(path)
+
+                if entry is None or entry[1:3] != (stat.st_mtime_ns, stat.st_size):
+                    if not matches_file(path):
+                        continue
+
+                    entry = (path, stat.st_mtime_ns, stat.st_size, *_evaluate(path))
+
+            except Exception as error:
+                log.warning("Leaving %s out of the index: %s", path, error)
+                continue
+
+            entries.append(entry)
+
+    index = HeaderIndex.from_rows(*zip(*entries)) if entries else _empty()
+    index.save(index_path)
+
+    return index
+
+
+def _empty():
+    return HeaderIndex.from_rows([], [], [], [], [])
+
+
+def _parse(column, text):
+    """Convert command-line text to the type of ``column``."""
+    if column.dtype.kind == "b":
+        return text.lower() in ("1", "t", "true", "yes")
+
+    if column.dtype.kind == "U":
+        return text
+
+    return column.dtype.type(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        # __spec__ is None when this file is run as a script.
+        prog=f"python -m {__spec__.name}" if __spec__ else None,
+        description="Index {{ cookiecutter.instrument_name }} files and select from the index.",
+    )
+    parser.add_argument("directory", help="directory to index")
+    parser.add_argument("--index", help="index file (default: in the directory)")
+    parser.add_argument("--tags", default="", help="comma-separated required tags")
+    parser.add_argument(
+        "--where",
+        nargs="*",
+        default=[],
+        metavar="NAME=VALUE",
+        help="required keyword or descriptor values",
+    )
+    args = parser.parse_args(argv)
+
+    index = scan(args.directory, args.index)
+    values = {}
+
+    for condition in args.where:
+        name, _, value = condition.partition("=")
+        values[name] = _parse(index[name], value)
+
+    tags = [tag for tag in args.tags.split(",") if tag]
+
+    for path in index.select(*tags, **values):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
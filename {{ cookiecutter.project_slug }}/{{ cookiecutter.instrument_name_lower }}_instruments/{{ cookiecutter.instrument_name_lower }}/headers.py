@@ -0,0 +1,195 @@
+"""Header-only access to {{ cookiecutter.instrument_name }} files.
+
+Identifying a file only needs a few primary header keywords, so the functions
+here read the FITS header blocks of the primary HDU directly instead of
+opening the full HDU list. The data units are never touched.
+
+Parsed headers are cached per ``(path, mtime, size)``, so a file that changes
+on disk is read again the next time it is asked for.
+"""
+
+import gzip
+import os
+from functools import lru_cache
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+# Upper bound on the number of 2880-byte blocks read looking for ``END``.
+# 64 blocks is 2304 cards, far more than any raw primary header should need.
+MAX_HEADER_BLOCKS = 64
+
+HEADER_CACHE_SIZE = 8192
+
+INSTRUMENT_FITS_NAME = "{{ cookiecutter.instrument_fits_name }}"
+
+
+def instrument_key(value):
+    """Return an ``INSTRUME`` value in the form instruments are compared in."""
+    return str(value).strip().upper()
+
+
+def instrument_matches(value):
+    """Return True if an ``INSTRUME`` value belongs to this instrument."""
+    return instrument_key(value) == INSTRUMENT_FITS_NAME
+
+
+def matches_file(path):
+    """Return True if the file at ``path`` is a {{ cookiecutter.instrument_name }} file.
+
+    This is the header-only equivalent of
+    ``AstroData{{ cookiecutter.instrument_name_title }}._matches_data``. Files that are not FITS, or that
+    cannot be read, do not match.
+    """
+    try:
+        header = read_primary_header(path)
+
+    except (OSError, ValueError):
+        return False
+
+    return instrument_matches(header.get("INSTRUME", ""))
+
+
+def read_primary_header(path):
+    """Return the primary header of a FITS file as a ``dict``.
+
+    Only the header blocks of the primary HDU are read. ``.gz`` files are
+    decompressed on the fly; tile-compressed (``.fz``) files keep their primary
+    header uncompressed and are read like any other file.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to the file.
+
+    Returns
+    -------
+    dict
+        Keyword to value mapping. ``COMMENT``, ``HISTORY`` and blank cards are
+        skipped, and long-string ``CONTINUE`` cards are not joined.
+
+    Raises
+    ------
+    ValueError
+        If the file is not FITS, or ``END`` is not found within
+        ``MAX_HEADER_BLOCKS`` blocks.
+    """
+    path = os.path.abspath(os.fspath(path))
+    stat = os.stat(path)
+
+    # Copy so callers can't modify the cached header.
+    return dict(_read_primary_header(path, stat.st_mtime_ns, stat.st_size))
+
+
+def clear_header_cache():
+    """Empty the parsed header cache."""
+    _read_primary_header.cache_clear()
+
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _read_primary_header(path, mtime, size):
+    """Cached header reader; ``mtime`` and ``size`` are only part of the key."""
+    opener = gzip.open if path.endswith(".gz") else open
+
+    with opener(path, "rb") as fileobj:
+        cards = _read_header_cards(fileobj)
+
+    return _parse_cards(cards)
+
+
+def _read_header_cards(fileobj):
+    """Read header blocks until the ``END`` card, returning the card strings."""
+    cards = []
+
+    for _ in range(MAX_HEADER_BLOCKS):
+        block = fileobj.read(BLOCK_SIZE)
+
+        if len(block) < BLOCK_SIZE:
+            raise ValueError("Truncated FITS header")
+
+        text = block.decode("ascii", errors="replace")
+
+        if not cards and not text.startswith("SIMPLE  ="):
+            raise ValueError("Not a FITS file")
+
+        for start in range(0, BLOCK_SIZE, CARD_SIZE):
+            card = text[start : start + CARD_SIZE]
+
+            if card[:8].rstrip() == "END":
+                return cards
+
+            cards.append(card)
+
+    raise ValueError(f"No END card in the first {MAX_HEADER_BLOCKS} blocks")
+
+
+def _parse_cards(cards):
+    """Convert raw 80-character cards into a keyword/value dict."""
+    header = {}
+
+    for card in cards:
+        keyword = card[:8].rstrip()
+
+        if keyword == "HIERARCH":
+            keyword, sep, rest = card[9:].partition("=")
+
+            if not sep:
+                continue
+
+            header[keyword.strip()] = _parse_value(rest)
+            continue
+
+        if not keyword or card[8:10] != "= ":
+            continue
+
+        header[keyword] = _parse_value(card[10:])
+
+    return header
+
+
+def _parse_value(text):
+    """Parse the value field of a card (everything after ``= ``)."""
+    text = text.strip()
+
+    if text.startswith("'"):
+        chars = []
+        i = 1
+
+        while i < len(text):
+            if text[i] == "'":
+                # A doubled quote is an escaped quote.
+                if text[i + 1 : i + 2] == "'":
+                    chars.append("'")
+                    i += 2
+                    continue
+
+                break
+
+            chars.append(text[i])
+            i += 1
+
+        # Trailing spaces are not significant in FITS strings.
+        return "".join(chars).rstrip()
+
+    text = text.split("/", 1)[0].strip()
+
+    if not text:
+        return None
+
+    if text == "T":
+        return True
+
+    if text == "F":
+        return False
+
+    try:
+        return int(text)
+
+    except ValueError:
+        pass
+
+    try:
+        return float(text.replace("D", "E"))
+
+    except ValueError:
+        return text
@@ -0,0 +1,107 @@
+"""Run code when a module gets imported, without importing it first.
+
+:func:`when_imported` lets the package register its AstroData class with the
+factory as soon as ``astrodata`` is imported, by whoever imports it, instead of
+importing ``astrodata`` itself. Tools that only need the cheap parts of the
+package (``headers``, the tag cache) then never pay for ``astrodata``,
+``gemini_instruments`` and their dependencies.
+
+Callbacks for a module that is still being imported, which happens when the
+import of this package comes from that module, cannot wait for its loader:
+it is already running. They are deferred instead, and run at the first import
+that goes through the import system once the module has finished.
+"""
+
+import importlib.abc
+import sys
+
+# Callbacks waiting for a module, by module name.
+_hooks = {}
+
+# Callbacks waiting for a module that was already being imported, as
+# (module name, callback).
+_deferred = []
+
+
+def when_imported(name, callback):
+    """Call ``callback()`` once module ``name`` has been imported.
+
+    If the module is already imported, the callback runs straight away. If it
+    is being imported, the callback is deferred until it has been.
+    """
+    module = sys.modules.get(name)
+
+    if module is not None:
+        if not _initializing(module):
+            callback()
+            return
+
+        _deferred.append((name, callback))
+
+    else:
+        _hooks.setdefault(name, []).append(callback)
+
+    if not any(isinstance(finder, _HookFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, _HookFinder())
+
+
+def _initializing(module):
+    return getattr(getattr(module, "__spec__", None), "_initializing", False)
+
+
+def _run_deferred():
+    """Run the deferred callbacks of the modules that have been imported."""
+    for entry in list(_deferred):
+        name, callback = entry
+        module = sys.modules.get(name)
+
+        if module is None or not _initializing(module):
+            _deferred.remove(entry)
+
+            # A module that failed to import gets no callbacks, as for hooks.
+            if module is not None:
+                callback()
+
+
+class _HookFinder(importlib.abc.MetaPathFinder):
+    """Wraps the loaders of hooked modules to run their callbacks."""
+
+    def find_spec(self, fullname, path, target=None):
+        if _deferred:
+            _run_deferred()
+
+        if fullname not in _hooks:
+            return None
+
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(fullname, path, target)
+
+            if spec is not None:
+                break
+
+        else:
+            return None
+
+        if spec.loader is not None:
+            spec.loader = _HookLoader(spec.loader)
+
+        return spec
+
+
+class _HookLoader(importlib.abc.Loader):
+    def __init__(self, loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Put the real loader back, for reloads and importlib.resources.
+        module.__spec__.loader = module.__loader__ = self.loader
+        self.loader.exec_module(module)
+
+        for callback in _hooks.pop(module.__name__, []):
+            callback()
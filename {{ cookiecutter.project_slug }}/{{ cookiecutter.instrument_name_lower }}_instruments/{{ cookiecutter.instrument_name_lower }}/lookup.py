@@ -8,5 +8,18 @@ filter_wavelengths = {
 
 array_properties = {
     # EDIT AS NEEDED
-    "gain": 3,  # electrons/ADU  (MADE UP VALUE for example)
+    "gain": 3.0,  # electrons/ADU  (MADE UP VALUE for example)
+    "read_noise": 5.0,  # electrons  (MADE UP VALUE for example)
+    "saturation": 65535.0,  # ADU  (MADE UP VALUE for example)
+}
+
+# Per-amplifier detector properties, by (read mode, amplifier), where they
+# differ from array_properties. The read mode comes from the PHU and the
+# amplifier name from each extension header (see the keyword dict in
+# adclass.py). Headers without those keywords use array_properties, and other
+# amplifiers have no values.
+amp_properties = {
+    # EDIT AS NEEDED (MADE UP VALUES for example)
+    # ("fast", "AMP1"): {"gain": 2.9, "read_noise": 8.1},
+    # ("fast", "AMP2"): {"gain": 3.1, "read_noise": 8.4},
 }
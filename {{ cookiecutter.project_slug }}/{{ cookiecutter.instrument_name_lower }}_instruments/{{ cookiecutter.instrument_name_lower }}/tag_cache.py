@@ -0,0 +1,285 @@
+"""Persistent on-disk cache of tags and descriptor values.
+
+Scripts that repeatedly open the same raw files only to look at their tags or
+a few descriptors can use :func:`get_tags` and :func:`get_descriptors` instead
+of ``astrodata.open``. On a cache hit the file is not opened at all.
+
+Entries are keyed by absolute path and validated against the file's mtime and
+size, and against the version of the code that computed them (see
+:func:`.versions.code_version`); a file that changed on disk, or whose entry
+was made by another version of this package or of DRAGONS, is opened and
+evaluated again. The cache is an SQLite database holding at most
+``max_entries`` files, evicting the least recently used ones.
+
+The cache location can be set with the ``{{ cookiecutter.instrument_name_upper }}_TAG_CACHE`` environment
+variable, and the cache can be turned off entirely by setting
+``{{ cookiecutter.instrument_name_upper }}_NO_TAG_CACHE=1`` or by passing ``use_cache=False``.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from .versions import code_version
+
+CACHE_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_TAG_CACHE"
+DISABLE_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_NO_TAG_CACHE"
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+# Fraction of max_entries evicted beyond the limit, so that a full cache is
+# only counted and trimmed once every so many puts.
+EVICTION_SLACK = 0.1
+
+# Descriptors evaluated and stored alongside the tags. Only values that are
+# str, int, float, bool or None (or lists of those) are cached.
+CACHED_DESCRIPTORS = (
+    "gain",
+    "instrument",
+    "object",
+    "observation_type",
+    "exposure_time",
+    "data_label",
+)
+
+# Bumped when the table layout changes; older tables are dropped.
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    descriptors TEXT NOT NULL,
+    last_access INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+_default_cache = None
+
+
+def default_cache_path():
+    """Return the cache file location, honouring ``{{ cookiecutter.instrument_name_upper }}_TAG_CACHE``."""
+    if os.environ.get(CACHE_ENV_VAR):
+        return Path(os.environ[CACHE_ENV_VAR])
+
+    cache_home = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+    return Path(cache_home) / "{{ cookiecutter.instrument_name_lower }}_instruments" / "tags.sqlite"
+
+
+def cache_disabled():
+    """Return True if the cache is switched off through the environment."""
+    return os.environ.get(DISABLE_ENV_VAR, "").lower() in ("1", "true", "yes")
+
+
+class TagCache:
+    """SQLite-backed LRU cache of tags and descriptor values per file.
+
+    Parameters
+    ----------
+    path : str or os.PathLike, optional
+        Location of the database. Defaults to :func:`default_cache_path`.
+    max_entries : int
+        Maximum number of files kept; least recently used entries are evicted
+        beyond this.
+    version : str, optional
+        Version of the code the entries are valid for. Defaults to
+        :func:`.versions.code_version`.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, version=None):
+        self.path = Path(path) if path is not None else default_cache_path()
+        self.max_entries = max_entries
+        self.version = version if version is not None else code_version()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # WAL lets several processes read while one writes.
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+        (schema_version,) = self._conn.execute("PRAGMA user_version").fetchone()
+
+        if schema_version != SCHEMA_VERSION:
+            with self._conn:
+                self._conn.execute("DROP TABLE IF EXISTS entries")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        self._conn.executescript(_SCHEMA)
+
+        # Kept up to date by this connection, and recounted before evicting,
+        # as other processes may share the database.
+        self._count = len(self)
+
+    def get(self, path):
+        """Return ``(tags, descriptors)`` for ``path``, or None on a miss.
+
+        Stale entries (the file's mtime or size changed, or the entry was
+        made by another version of the code) are dropped and reported as a
+        miss.
+        """
+        path = os.path.abspath(os.fspath(path))
+        stat = os.stat(path)
+
+        row = self._conn.execute(
+            "SELECT mtime_ns, size, version, tags, descriptors FROM entries "
+            "WHERE path = ?",
+            (path,),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        mtime_ns, size, version, tags, descriptors = row
+        current = (stat.st_mtime_ns, stat.st_size, self.version)
+
+        with self._conn:
+            if (mtime_ns, size, version) != current:
+                self._conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+                self._count -= 1
+                return None
+
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE path = ?",
+                (time.time_ns(), path),
+            )
+
+        return set(json.loads(tags)), json.loads(descriptors)
+
+    def put(self, path, tags, descriptors):
+        """Store the tags and descriptor values computed for ``path``."""
+        path = os.path.abspath(os.fspath(path))
+        stat = os.stat(path)
+
+        values = (
+            stat.st_mtime_ns,
+            stat.st_size,
+            self.version,
+            json.dumps(sorted(tags)),
+            json.dumps(descriptors),
+            time.time_ns(),
+            path,
+        )
+
+        with self._conn:
+            updated = self._conn.execute(
+                "UPDATE entries SET mtime_ns = ?, size = ?, version = ?, tags = ?, "
+                "descriptors = ?, last_access = ? WHERE path = ?",
+                values,
+            ).rowcount
+
+            if not updated:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (mtime_ns, size, version, tags, "
+                    "descriptors, last_access, path) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    values,
+                )
+                self._count += 1
+
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Drop the least recently used entries beyond ``max_entries``, and
+        ``EVICTION_SLACK`` of it more.
+        """
+        self._count = len(self)
+
+        if self._count <= self.max_entries:
+            return
+
+        keep = self.max_entries - int(self.max_entries * EVICTION_SLACK)
+
+        self._conn.execute(
+            "DELETE FROM entries WHERE path IN "
+            "(SELECT path FROM entries ORDER BY last_access, rowid LIMIT ?)",
+            (self._count - keep,),
+        )
+        self._count = keep
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+        self._count = 0
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def get_default_cache():
+    """Return the process-wide :class:`TagCache`, creating it if needed."""
+    global _default_cache
+
+    if _default_cache is None:
+        _default_cache = TagCache()
+
+    return _default_cache
+
+
+def get_tags(path, use_cache=True):
+    """Return the tags of the file at ``path``."""
+    return _lookup(path, use_cache)[0]
+
+
+def get_descriptors(path, use_cache=True):
+    """Return the cached descriptor values of the file at ``path``.
+
+    Only the descriptors in ``CACHED_DESCRIPTORS`` that could be evaluated are
+    included.
+    """
+    return _lookup(path, use_cache)[1]
+
+
+def _lookup(path, use_cache):
+    if not use_cache or cache_disabled():
+        return _evaluate(path)
+
+    cache = get_default_cache()
+    entry = cache.get(path)
+
+    if entry is None:
+        entry = _evaluate(path)
+        cache.put(path, *entry)
+
+    return entry
+
+
+def _evaluate(path):
+    """Open the file and compute its tags and cacheable descriptors."""
+    # Imported here so that cache hits never need astrodata at all.
+    import astrodata
+
+    ad = astrodata.open(path)
+    descriptors = {}
+
+    for name in CACHED_DESCRIPTORS:
+        try:
+            value = getattr(ad, name)()
+
+        # Many descriptors legitimately fail on raw data; skip those.
+        except Exception:
+            continue
+
+        if _is_cacheable(value):
+            descriptors[name] = value
+
+    return set(ad.tags), descriptors
+
+
+def _is_cacheable(value):
+    if isinstance(value, list):
+        return all(_is_cacheable(item) for item in value)
+
+    return value is None or isinstance(value, (str, int, float, bool))
@@ -0,0 +1,51 @@
+"""Version of the code, for the caches that must not outlive it.
+
+The tag cache, the primitive result cache and incremental execution all key
+their entries on :func:`code_version`, so that upgrading or editing any part
+of this project, or DRAGONS, computes everything again.
+"""
+
+import functools
+import hashlib
+import importlib.metadata
+import importlib.util
+from pathlib import Path
+
+# Packages of this project. They are found without being imported, so that
+# the reduction package does not have to be installed.
+PACKAGES = (
+    "{{ cookiecutter.instrument_name_lower }}_instruments",
+    "{{ cookiecutter.instrument_name_lower }}dr",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Return the version of the code, as used in the cache keys.
+
+    This is the installed version of each package of this project and of
+    DRAGONS, if known, plus a digest of the packages' source files, so that
+    editing a descriptor, a lookup table or a primitive in a development
+    checkout also changes it.
+    """
+    versions = []
+    digest = hashlib.sha1()
+
+    for distribution in PACKAGES + ("dragons",):
+        try:
+            versions.append(importlib.metadata.version(distribution))
+
+        except importlib.metadata.PackageNotFoundError:
+            versions.append("unknown")
+
+    for package in PACKAGES:
+        spec = importlib.util.find_spec(package)
+        locations = spec.submodule_search_locations if spec is not None else None
+
+        for location in locations or ():
+            for path in sorted(Path(location).rglob("*.py")):
+                digest.update(path.read_bytes())
+
+    versions.append(digest.hexdigest())
+
+    return "-".join(versions)
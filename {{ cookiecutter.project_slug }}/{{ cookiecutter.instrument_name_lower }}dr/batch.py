@@ -0,0 +1,683 @@
+"""Batch reduction of many observation groups, on one node or several.
+
+A batch is planned by :func:`plan`:
+
+1. each raw file is assigned to the recipe library whose ``recipe_tags``
+   best match its tags (read through the tag cache, so files are opened at
+   most once), as ``reduce`` would do;
+2. files of the same library are grouped by the descriptors in ``GROUP_BY``,
+   each group becoming one task, i.e. one ``reduce`` run;
+3. tasks depend on the tasks of the earlier ``STAGES`` that they may use,
+   i.e. that share the descriptors in ``MATCH_BY``: darks are made before
+   the calibrations and science with their exposure time, and other
+   calibrations before science, so that each task finds its calibrations in
+   the calibration database.
+
+The tasks are then run by an executor:
+
+:class:`LocalExecutor`
+    A process pool on this machine. With a journal file, a batch that was
+    interrupted can be started again and only runs the tasks not yet done.
+
+:class:`QueueExecutor`
+    A work queue made of files in a directory. Tasks are submitted once and
+    any number of workers, on any node that sees the directory, pull them
+    until the queue is drained. Tasks are claimed by atomically renaming
+    their file, and a task whose worker stopped renewing its lease (because
+    the node died, say) is handed to another worker.
+
+Both retry failed tasks and return one record per task, which
+:func:`report` turns into throughput figures. From the command line::
+
+    python -m {{ cookiecutter.instrument_name_lower }}dr.batch run -j 8 --journal night.jsonl raw/*.fits
+
+    python -m {{ cookiecutter.instrument_name_lower }}dr.batch submit --queue /shared/queue raw/*.fits
+    python -m {{ cookiecutter.instrument_name_lower }}dr.batch work --queue /shared/queue    # on each node
+    python -m {{ cookiecutter.instrument_name_lower }}dr.batch report --queue /shared/queue
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pkgutil
+import re
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import tag_cache  # fmt: skip
+
+log = logging.getLogger(__name__)
+
+# Recipe libraries searched by default.
+RECIPE_PACKAGE = f"{__package__}.{{ cookiecutter.instrument_name_lower }}.recipes"
+DEFAULT_MODE = "sq"
+
+# Descriptors that must be equal for files to be reduced together.
+GROUP_BY = ("object", "exposure_time")
+
+# Tasks whose recipe tags include all the tags of a stage run after every
+# task of the earlier stages. Tasks matching no stage come last.
+STAGES = ({"DARK"}, {"CAL"})
+
+# Descriptors, from GROUP_BY, a task must share with a task of each stage to
+# depend on it: darks are only used at their own exposure time.
+MATCH_BY = (("exposure_time",), ())
+
+DEFAULT_RETRIES = 2
+
+# Seconds a queue worker may go without renewing the lease on its task.
+DEFAULT_LEASE = 300
+
+
+def recipe_libraries(mode=DEFAULT_MODE):
+    """Return the recipe libraries of ``mode``, as ``{module name: tags}``."""
+    package = importlib.import_module(f"{RECIPE_PACKAGE}.{mode}")
+    libraries = {}
+
+    for module_info in pkgutil.iter_modules(package.__path__):
+        module = importlib.import_module(f"{package.__name__}.{module_info.name}")
+
+        if hasattr(module, "recipe_tags"):
+            libraries[module.__name__] = set(module.recipe_tags)
+
+    return libraries
+
+
+def _stage(recipe_tags):
+    for index, stage_tags in enumerate(STAGES):
+        if stage_tags <= recipe_tags:
+            return index
+
+    return len(STAGES)
+
+
+def _uses(task, calibration):
+    """Whether ``task`` may use the products of an earlier ``calibration``."""
+    return calibration["stage"] < task["stage"] and all(
+        calibration["group"][name] == task["group"][name]
+        for name in MATCH_BY[calibration["stage"]]
+    )
+
+
+def _task_id(library, group, files):
+    name = "_".join([library.rsplit("_", 1)[-1]] + [str(value) for value in group])
+    name = re.sub(r"[^\w.-]+", "_", name)
+    digest = hashlib.sha1("\n".join(files).encode()).hexdigest()
+
+    return f"{name}-{digest[:8]}"
+
+
+def plan(paths, mode=DEFAULT_MODE, recipe=None):
+    """Group files into tasks and work out the order they must run in.
+
+    Parameters
+    ----------
+    paths : list of str
+        Raw files.
+    mode : str
+        Recipe mode, i.e. the recipe libraries used.
+    recipe : str, optional
+        Recipe to run instead of each library's default.
+
+    Returns
+    -------
+    tasks : list of dict
+        One per group, in an order that satisfies the dependencies. Each has
+        an ``id``, the recipe ``library``, the ``files`` (absolute paths),
+        their ``group`` descriptors and the ids of the tasks it ``depends`` on.
+    unmatched : list of str
+        Files for which no recipe library matches.
+    """
+    libraries = recipe_libraries(mode)
+    groups = {}
+    unmatched = []
+
+    for path in sorted(os.path.abspath(path) for path in paths):
+        tags = tag_cache.get_tags(path)
+        matches = [
+            name for name, recipe_tags in libraries.items() if recipe_tags <= tags
+        ]
+
+        if not matches:
+            unmatched.append(path)
+            continue
+
+        library = max(matches, key=lambda name: len(libraries[name]))
+        descriptors = tag_cache.get_descriptors(path)
+        group = tuple(descriptors.get(name) for name in GROUP_BY)
+        groups.setdefault((library, group), []).append(path)
+
+    tasks = []
+
+    for (library, group), files in groups.items():
+        tasks.append(
+            {
+                "id": _task_id(library, group, files),
+                "library": library,
+                "recipe": recipe,
+                "mode": mode,
+                "files": files,
+                "group": dict(zip(GROUP_BY, group)),
+                "stage": _stage(libraries[library]),
+            }
+        )
+
+    tasks.sort(key=lambda task: (task["stage"], task["id"]))
+
+    for task in tasks:
+        task["depends"] = [other["id"] for other in tasks if _uses(task, other)]
+
+    return tasks, unmatched
+
+
+def reduce_task(task):
+    """Reduce the files of one task, as ``reduce`` would."""
+    from recipe_system.reduction.coreReduce import Reduce
+
+    reduce = Reduce()
+    reduce.files = list(task["files"])
+    reduce.drpkg = __package__
+    reduce.mode = task["mode"]
+
+    if task["recipe"]:
+        reduce.recipename = task["recipe"]
+
+    reduce.runr()
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _attempt(runner, task):
+    """Run one task, returning its record instead of raising."""
+    record = {
+        "id": task["id"],
+        "n_files": len(task["files"]),
+        "worker": _worker_name(),
+        "start": time.time(),
+        "error": None,
+    }
+
+    try:
+        runner(task)
+
+    except Exception as error:
+        record["error"] = f"{type(error).__name__}: {error}"
+
+    record["end"] = time.time()
+    record["status"] = "failed" if record["error"] else "done"
+
+    return record
+
+
+class LocalExecutor:
+    """Runs tasks in a pool of processes on this machine.
+
+    Parameters
+    ----------
+    n_workers : int, optional
+        Number of processes; the number of CPUs by default.
+    journal : str, optional
+        File recording finished tasks, one JSON record per line. Tasks it
+        lists as done are not run again.
+    """
+
+    def __init__(self, n_workers=None, journal=None):
+        self.n_workers = n_workers or os.cpu_count()
+        self.journal = journal
+
+    def records(self):
+        """Return the latest record of every task in the journal."""
+        records = {}
+
+        if self.journal and os.path.exists(self.journal):
+            with open(self.journal) as journal:
+                for line in journal:
+                    record = json.loads(line)
+                    records[record["id"]] = record
+
+        return list(records.values())
+
+    def _write(self, record):
+        if self.journal:
+            with open(self.journal, "a") as journal:
+                journal.write(json.dumps(record) + "\n")
+
+    def run(self, tasks, runner=reduce_task, retries=DEFAULT_RETRIES):
+        """Run ``tasks`` in dependency order and return their records."""
+        done = {
+            record["id"]: record
+            for record in self.records()
+            if record["status"] == "done"
+        }
+        records = dict(done)
+        pending = {task["id"]: task for task in tasks if task["id"] not in done}
+        attempts = dict.fromkeys(pending, 0)
+
+        if done:
+            log.info(f"Resuming: {len(tasks) - len(pending)} task(s) already done")
+
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            running = {}
+
+            while pending or running:
+                for task in _blocked(pending, records):
+                    records[task["id"]] = _dependency_failure(task)
+                    self._write(records[task["id"]])
+                    del pending[task["id"]]
+
+                for task in _ready(pending, records):
+                    attempts[task["id"]] += 1
+                    future = executor.submit(_attempt, runner, task)
+                    running[future] = pending.pop(task["id"])
+
+                if not running:
+                    # What is left depends on tasks missing from this batch.
+                    for task in pending.values():
+                        records[task["id"]] = _dependency_failure(task)
+                        self._write(records[task["id"]])
+
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    task = running.pop(future)
+                    record = future.result()
+                    record["attempts"] = attempts[task["id"]]
+
+                    if record["error"] and attempts[task["id"]] <= retries:
+                        log.warning(f"Retrying {task['id']}: {record['error']}")
+                        pending[task["id"]] = task
+                        continue
+
+                    records[task["id"]] = record
+                    self._write(record)
+
+        return [records[task["id"]] for task in tasks]
+
+
+def _ready(pending, records):
+    """Tasks whose dependencies are all done."""
+    return [
+        task
+        for task in list(pending.values())
+        if all(
+            records.get(dependency, {}).get("status") == "done"
+            for dependency in task["depends"]
+        )
+    ]
+
+
+def _blocked(pending, records):
+    """Tasks with a dependency that failed, and so can never run."""
+    return [
+        task
+        for task in list(pending.values())
+        if any(
+            records.get(dependency, {}).get("status") == "failed"
+            for dependency in task["depends"]
+        )
+    ]
+
+
+def _dependency_failure(task, error="A task it depends on failed"):
+    now = time.time()
+
+    return {
+        "id": task["id"],
+        "n_files": len(task["files"]),
+        "worker": None,
+        "start": now,
+        "end": now,
+        "attempts": 0,
+        "status": "failed",
+        "error": error,
+    }
+
+
+class QueueExecutor:
+    """A work queue shared through a directory.
+
+    The directory holds one subdirectory per state. A task is a JSON file in
+    ``tasks``, and a file named after it in ``todo``, ``running``, ``done`` or
+    ``failed`` says where it is. The ``done`` and ``failed`` files hold the
+    task's record.
+
+    Parameters
+    ----------
+    directory : str
+        The queue, on a filesystem shared by all workers.
+    lease : float
+        Seconds after which a running task whose worker stopped renewing its
+        lease is handed to another worker.
+    """
+
+    STATES = ("tasks", "todo", "running", "done", "failed")
+
+    def __init__(self, directory, lease=DEFAULT_LEASE):
+        self.directory = os.path.abspath(directory)
+        self.lease = lease
+
+        for state in self.STATES:
+            os.makedirs(os.path.join(self.directory, state), exist_ok=True)
+
+    def _path(self, state, task_id):
+        return os.path.join(self.directory, state, task_id)
+
+    def _move(self, task_id, source, destination):
+        os.rename(self._path(source, task_id), self._path(destination, task_id))
+
+    def _ids(self, state):
+        return set(os.listdir(os.path.join(self.directory, state)))
+
+    def _status(self, task_id):
+        if os.path.exists(self._path("done", task_id)):
+            return "done"
+
+        if os.path.exists(self._path("failed", task_id)):
+            return "failed"
+
+        return None
+
+    def submit(self, tasks):
+        """Add tasks to the queue, except those already there."""
+        known = self._ids("tasks")
+        submitted = 0
+
+        for task in tasks:
+            if task["id"] in known:
+                continue
+
+            with open(self._path("tasks", task["id"]), "w") as task_file:
+                json.dump(task, task_file)
+
+            with open(self._path("todo", task["id"]), "w") as todo:
+                json.dump({"attempts": 0}, todo)
+
+            submitted += 1
+
+        return submitted
+
+    def _claim(self):
+        """Take a runnable task, or return None if there is none right now.
+
+        Tasks that can never run, because a task they depend on failed or was
+        never submitted, are marked as failed on the way.
+        """
+        submitted = self._ids("tasks")
+
+        for task_id in sorted(self._ids("todo")):
+            with open(self._path("tasks", task_id)) as task_file:
+                task = json.load(task_file)
+
+            statuses = [self._status(dependency) for dependency in task["depends"]]
+            missing = set(task["depends"]) - submitted
+
+            if "failed" in statuses or missing:
+                try:
+                    self._move(task_id, "todo", "running")
+
+                except FileNotFoundError:
+                    continue
+
+                if missing:
+                    record = _dependency_failure(
+                        task, f"Depends on tasks never submitted: {sorted(missing)}"
+                    )
+
+                else:
+                    record = _dependency_failure(task)
+
+                self._finish(task_id, record, "failed")
+                continue
+
+            if any(status != "done" for status in statuses):
+                continue
+
+            try:
+                # Atomic: only one worker can move the file.
+                self._move(task_id, "todo", "running")
+
+            except FileNotFoundError:
+                continue
+
+            with open(self._path("running", task_id)) as running:
+                state = json.load(running)
+
+            return task, state
+
+        return None
+
+    def _finish(self, task_id, record, status):
+        with open(self._path(status, task_id), "w") as result:
+            json.dump(record, result)
+
+        os.remove(self._path("running", task_id))
+
+    def _requeue_expired(self):
+        """Put back tasks whose worker stopped renewing its lease."""
+        now = time.time()
+
+        for task_id in self._ids("running"):
+            try:
+                if now - os.path.getmtime(self._path("running", task_id)) > self.lease:
+                    self._move(task_id, "running", "todo")
+                    log.warning(f"Lease expired on {task_id}; requeued")
+
+            except FileNotFoundError:
+                pass
+
+    def _renew(self, task_id, stop):
+        while not stop.wait(self.lease / 4):
+            try:
+                os.utime(self._path("running", task_id))
+
+            except FileNotFoundError:
+                return
+
+    def work(self, runner=reduce_task, retries=DEFAULT_RETRIES, poll=1.0):
+        """Run tasks from the queue until it is drained.
+
+        Returns the records of the tasks run by this worker.
+        """
+        records = []
+
+        while True:
+            claimed = self._claim()
+
+            if claimed is None:
+                if not self._ids("todo") and not self._ids("running"):
+                    return records
+
+                self._requeue_expired()
+                time.sleep(poll)
+                continue
+
+            task, state = claimed
+            stop = threading.Event()
+            lease = threading.Thread(
+                target=self._renew, args=(task["id"], stop), daemon=True
+            )
+            lease.start()
+
+            try:
+                record = _attempt(runner, task)
+
+            finally:
+                stop.set()
+                lease.join()
+
+            record["attempts"] = state["attempts"] + 1
+
+            if record["error"] and record["attempts"] <= retries:
+                log.warning(f"Retrying {task['id']}: {record['error']}")
+
+                with open(self._path("running", task["id"]), "w") as running:
+                    json.dump({"attempts": record["attempts"]}, running)
+
+                self._move(task["id"], "running", "todo")
+                continue
+
+            self._finish(task["id"], record, record["status"])
+            records.append(record)
+
+    def run(self, tasks, runner=reduce_task, retries=DEFAULT_RETRIES):
+        """Submit ``tasks`` and work on the queue until it is drained."""
+        self.submit(tasks)
+        self.work(runner, retries)
+
+        return self.records()
+
+    def records(self):
+        """Return the records of all finished tasks."""
+        records = []
+
+        for state in ("done", "failed"):
+            for task_id in sorted(self._ids(state)):
+                with open(self._path(state, task_id)) as result:
+                    records.append(json.load(result))
+
+        return records
+
+
+def report(records):
+    """Summarize task records.
+
+    Returns
+    -------
+    dict
+        Numbers of tasks done and failed, files reduced, the wall time from
+        the first task started to the last one finished, the throughput in
+        files per hour, the time spent in tasks, and the tasks per worker.
+    """
+    started = [record for record in records if record["worker"] is not None]
+    done = [record for record in records if record["status"] == "done"]
+
+    wall = (
+        max(record["end"] for record in started)
+        - min(record["start"] for record in started)
+        if started
+        else 0
+    )
+    n_files = sum(record["n_files"] for record in done)
+
+    workers = {}
+
+    for record in started:
+        workers[record["worker"]] = workers.get(record["worker"], 0) + 1
+
+    return {
+        "tasks": len(records),
+        "done": len(done),
+        "failed": len(records) - len(done),
+        "files": n_files,
+        "wall": wall,
+        "files_per_hour": 3600 * n_files / wall if wall else 0,
+        "task_time": sum(record["end"] - record["start"] for record in started),
+        "retries": sum(max(record["attempts"] - 1, 0) for record in records),
+        "workers": workers,
+        "errors": {
+            record["id"]: record["error"] for record in records if record["error"]
+        },
+    }
+
+
+def format_report(summary):
+    lines = [
+        f"Tasks:      {summary['done']} done, {summary['failed']} failed "
+        f"({summary['retries']} retries)",
+        f"Files:      {summary['files']}",
+        f"Wall time:  {summary['wall']:.1f} s "
+        f"({summary['task_time']:.1f} s in tasks)",
+        f"Throughput: {summary['files_per_hour']:.0f} files/hour",
+        f"Workers:    {len(summary['workers'])}",
+    ]
+    lines.extend(f"  {worker}: {n} task(s)" for worker, n in summary["workers"].items())
+    lines.extend(
+        f"Failed {task_id}: {error}" for task_id, error in summary["errors"].items()
+    )
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        # __spec__ is None when this file is run as a script.
+        prog=f"python -m {__spec__.name}" if __spec__ else None,
+        description="Reduce many groups of {{ cookiecutter.instrument_name }} files.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_plan_arguments(command):
+        command.add_argument("files", nargs="+", help="raw files")
+        command.add_argument("--mode", default=DEFAULT_MODE, help="recipe mode")
+        command.add_argument("--recipe", help="recipe to run instead of the default")
+
+    def add_queue_argument(command):
+        command.add_argument("--queue", required=True, help="queue directory")
+
+    add_plan_arguments(commands.add_parser("plan", help="show the tasks"))
+
+    run_parser = commands.add_parser("run", help="reduce on this machine")
+    add_plan_arguments(run_parser)
+    run_parser.add_argument("-j", "--workers", type=int, help="number of processes")
+    run_parser.add_argument("--journal", help="file recording finished tasks")
+    run_parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+
+    submit_parser = commands.add_parser("submit", help="add tasks to a queue")
+    add_plan_arguments(submit_parser)
+    add_queue_argument(submit_parser)
+
+    work_parser = commands.add_parser("work", help="run tasks from a queue")
+    add_queue_argument(work_parser)
+    work_parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    work_parser.add_argument("--lease", type=float, default=DEFAULT_LEASE)
+
+    report_parser = commands.add_parser("report", help="summarize a batch")
+    source = report_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--queue", help="queue directory")
+    source.add_argument("--journal", help="journal of a local run")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command in ("plan", "run", "submit"):
+        tasks, unmatched = plan(args.files, args.mode, args.recipe)
+
+        for path in unmatched:
+            log.warning(f"No recipe library matches {path}; skipped")
+
+    if args.command == "plan":
+        for task in tasks:
+            after = ", ".join(task["depends"]) or "-"
+            print(f"{task['id']}: {len(task['files'])} file(s), after {after}")
+
+    elif args.command == "run":
+        executor = LocalExecutor(args.workers, args.journal)
+        print(format_report(report(executor.run(tasks, retries=args.retries))))
+
+    elif args.command == "submit":
+        submitted = QueueExecutor(args.queue).submit(tasks)
+        print(f"Submitted {submitted} task(s) to {args.queue}")
+
+    elif args.command == "work":
+        queue = QueueExecutor(args.queue, lease=args.lease)
+        records = queue.work(retries=args.retries)
+        print(format_report(report(records)))
+
+    elif args.queue:
+        print(format_report(report(QueueExecutor(args.queue).records())))
+
+    else:
+        print(format_report(report(LocalExecutor(journal=args.journal).records())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Incremental recipe execution: skip work that was already done.
+
+:func:`run` executes a list of :class:`~.streaming.Step` and
+:class:`~.streaming.Barrier` objects, like :func:`.streaming.stream`, but
+remembers what every stage produced. Each output is written to a cache
+directory and recorded in a manifest under a key made of
+
++ the checksum of the raw input file (or, for a barrier, of all its inputs),
++ the name of every primitive applied since,
++ a hash of the parameters each of them was run with, and
++ the version of the code, as :func:`{{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.versions.code_version`
+  gives it, so that upgrading or editing the packages runs everything again.
+
+Keys only depend on the inputs and the recipe, not on the data produced, so
+on a re-run the manifest is searched before anything is loaded. A frame whose
+final product is known is simply read back from disk; one whose first stages
+are known restarts from the last product available. Re-reducing a night after
+adding 5 frames to 200 therefore runs the per-frame primitives on the 5 new
+frames only. Barriers (such as stacking) run again if their set of inputs
+changed.
+
+Only the primitives in the primitive set's ``timestamp_keys`` are cached,
+since those are the ones that record that they ran in the headers. Frames that
+already carry a primitive's timestamp skip it without being loaded further.
+Primitives that write to disk or to the calibration database (``write*`` and
+``store*``) always run.
+
+The manifest is an SQLite database in the cache directory, which is
+``{{ cookiecutter.instrument_name_lower }}_incremental`` in the working directory unless the
+``{{ cookiecutter.instrument_name_upper }}_INCREMENTAL_DIR`` environment variable says otherwise.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import astrodata
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import versions  # fmt: skip
+
+from . import result_cache
+
+CACHE_DIR_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_INCREMENTAL_DIR"
+DEFAULT_CACHE_DIR = "{{ cookiecutter.instrument_name_lower }}_incremental"
+
+
+class Manifest:
+    """Maps stage keys to the files holding their outputs.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path, optional
+        Where the manifest and the cached products live. Defaults to the
+        ``{{ cookiecutter.instrument_name_upper }}_INCREMENTAL_DIR`` environment variable, or
+        ``{{ cookiecutter.instrument_name_lower }}_incremental`` in the working directory.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.environ.get(CACHE_DIR_ENV_VAR, DEFAULT_CACHE_DIR)
+
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(
+            os.path.join(self.directory, "manifest.sqlite")
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checksums (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                checksum TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS outputs (
+                key TEXT PRIMARY KEY,
+                primitive TEXT NOT NULL,
+                outputs TEXT NOT NULL,
+                created INTEGER NOT NULL
+            );
+            """
+        )
+
+    def checksum(self, path):
+        """Return the SHA-1 of a file, reusing it while the file is unchanged."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        row = self._connection.execute(
+            "SELECT checksum FROM checksums WHERE path = ? AND mtime_ns = ? "
+            "AND size = ?",
+            (path, stat.st_mtime_ns, stat.st_size),
+        ).fetchone()
+
+        if row is not None:
+            return row[0]
+
+        digest = hashlib.sha1()
+
+        with open(path, "rb") as input_file:
+            for block in iter(lambda: input_file.read(1 << 20), b""):
+                digest.update(block)
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size, digest.hexdigest()),
+            )
+
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the outputs recorded for ``key``, or None.
+
+        Outputs are ``(path, filename, orig_filename)`` lists. Entries whose
+        files have gone missing count as unknown.
+        """
+        row = self._connection.execute(
+            "SELECT outputs FROM outputs WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        outputs = json.loads(row[0])
+
+        if not all(os.path.exists(output[0]) for output in outputs):
+            return None
+
+        return outputs
+
+    def put(self, key, primitive, adoutputs):
+        """Write the outputs of a stage to the cache and record them."""
+        outputs = []
+
+        for i, ad in enumerate(adoutputs):
+            path = os.path.join(self.directory, f"{key[:20]}_{i}_{ad.filename}")
+            ad.write(path, overwrite=True)
+            outputs.append([path, ad.filename, ad.orig_filename])
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?)",
+                (key, primitive, json.dumps(outputs), time.time_ns()),
+            )
+
+        return outputs
+
+    def close(self):
+        self._connection.close()
+
+
+class _Frame:
+    """A frame in the recipe: its key and the frame, or where to find it."""
+
+    def __init__(self, key, directory, ad=None, output=None):
+        self.key = key
+        self.directory = directory
+        self.ad = ad
+        self.output = output
+
+    def load(self):
+        if self.ad is None:
+            path, filename, orig_filename = self.output
+            self.ad = astrodata.open(path)
+
+            # Make it look as if it had just been produced.
+            self.ad.path = os.path.join(self.directory, filename)
+            self.ad.orig_filename = orig_filename
+
+        return self.ad
+
+
+def run(p, steps, manifest=None):
+    """Run ``steps`` over the main stream of ``p``, reusing earlier results.
+
+    Parameters
+    ----------
+    p : PrimitivesBASE
+        The primitive set of the recipe.
+    steps : list of Step
+        The primitives to run, in order.
+    manifest : Manifest, optional
+        Where results are looked up and recorded. A default one is opened
+        if not given.
+
+    Returns
+    -------
+    list of AstroData
+        The outputs, which also become the main stream.
+    """
+    own_manifest = manifest is None
+    manifest = Manifest() if own_manifest else manifest
+
+    frames = [
+        _Frame(
+            manifest.checksum(ad.path) if ad.path and os.path.exists(ad.path) else None,
+            os.path.dirname(ad.path or ""),
+            ad=ad,
+        )
+        for ad in p.streams["main"]
+    ]
+    counts = {"reused": 0, "run": 0}
+
+    try:
+        for step in steps:
+            if step.barrier:
+                frames = _barrier(p, step, frames, manifest, counts)
+
+            else:
+                frames = [
+                    output
+                    for frame in frames
+                    for output in _per_frame(p, step, frame, manifest, counts)
+                ]
+
+        p.streams["main"] = [frame.load() for frame in frames]
+
+    finally:
+        if own_manifest:
+            manifest.close()
+
+    p.log.stdinfo(
+        f"Incremental run: {counts['reused']} stage(s) reused, {counts['run']} run"
+    )
+
+    return p.streams["main"]
+
+
+def _is_cached(p, step):
+    return step.primitive in p.timestamp_keys and not step.primitive.startswith(
+        result_cache.ALWAYS_RUN_PREFIXES
+    )
+
+
+def _stage_key(p, step, input_keys):
+    """Key of the outputs of ``step`` applied to inputs with ``input_keys``."""
+    try:
+        params = dict(p.params[step.primitive].items())
+
+    except (KeyError, AttributeError):
+        params = {}
+
+    params.update(step.params)
+
+    description = json.dumps(
+        [input_keys, step.primitive, params, versions.code_version()],
+        sort_keys=True,
+        default=str,
+    )
+
+    return hashlib.sha1(description.encode()).hexdigest()
+
+
+def _per_frame(p, step, frame, manifest, counts):
+    if not _is_cached(p, step) or frame.key is None:
+        adoutputs = step(p, [frame.load()])
+        return [_Frame(frame.key, frame.directory, ad=ad) for ad in adoutputs]
+
+    key = _stage_key(p, step, frame.key)
+    outputs = manifest.get(key)
+
+    if outputs is not None:
+        counts["reused"] += 1
+        return [_Frame(key, frame.directory, output=output) for output in outputs]
+
+    ad = frame.load()
+
+    if ad.phu.get(p.timestamp_keys[step.primitive]):
+        # Already done before it reached us; nothing to run or record.
+        return [frame]
+
+    counts["run"] += 1
+    adoutputs = step(p, [ad])
+    manifest.put(key, step.primitive, adoutputs)
+
+    return [_Frame(key, frame.directory, ad=ad) for ad in adoutputs]
+
+
+def _barrier(p, step, frames, manifest, counts):
+    input_keys = [frame.key for frame in frames]
+    directory = frames[0].directory if frames else ""
+
+    if not _is_cached(p, step) or not frames or None in input_keys:
+        adoutputs = step(p, [frame.load() for frame in frames])
+        return [_Frame(None, directory, ad=ad) for ad in adoutputs]
+
+    key = _stage_key(p, step, sorted(input_keys))
+    outputs = manifest.get(key)
+
+    if outputs is not None:
+        counts["reused"] += 1
+        return [_Frame(key, directory, output=output) for output in outputs]
+
+    counts["run"] += 1
+    adoutputs = step(p, [frame.load() for frame in frames])
+    manifest.put(key, step.primitive, adoutputs)
+
+    return [_Frame(key, directory, ad=ad) for ad in adoutputs]
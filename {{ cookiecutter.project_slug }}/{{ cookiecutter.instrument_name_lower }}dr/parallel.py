@@ -0,0 +1,159 @@
+"""Process-pool execution for primitives that treat each input independently.
+
+Primitives written with :func:`per_ad_primitive` only describe what happens
+to a single AstroData object::
+
+    @per_ad_primitive
+    def someStuff(self, ad, **params):
+        ...
+        return ad
+
+The decorator turns this into a regular primitive taking ``adinputs``. With
+``n_workers`` set to more than one in the primitive's config, the inputs are
+spread over a process pool. AstroData objects are never pickled: each input is
+written to a temporary FITS file, the worker opens it (memory-mapped), runs the
+function and writes its output back, and the parent reads the results in the
+original order. Anything the function records in the headers, such as the
+``mark_history`` timestamps, travels with the file.
+
+When the inputs are processed serially, a ``prefetch`` field in the config
+reads that many inputs ahead in the background (see :mod:`.prefetch`), so
+reading the next frame overlaps with processing the current one.
+
+Returning None from the function drops that input from the outputs.
+"""
+
+import functools
+import importlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import astrodata
+
+from gempy.gemini import gemini_tools as gt
+
+from .prefetch import Prefetcher
+
+# Undecorated per-AD functions, by (module, qualified name), so that worker
+# processes can find them again after importing the module.
+_PER_AD_FUNCTIONS = {}
+
+# Primitive set instances created in worker processes, one per class.
+_WORKER_PRIMITIVES = {}
+
+
+def per_ad_primitive(func):
+    """Make a primitive out of a function operating on one AstroData object.
+
+    The config of the decorated primitive may have an ``n_workers`` field; if
+    it is missing or 1, inputs are processed serially in this process, reading
+    ``prefetch`` inputs ahead if the config has that field.
+    """
+    _PER_AD_FUNCTIONS[(func.__module__, func.__qualname__)] = func
+
+    @functools.wraps(func)
+    def primitive(self, adinputs=None, **params):
+        self.log.debug(gt.log_message("primitive", func.__name__, "starting"))
+
+        n_workers = min(params.get("n_workers") or 1, len(adinputs))
+
+        if n_workers <= 1 and params.get("prefetch"):
+            reader = Prefetcher(adinputs, depth=params["prefetch"])
+            adoutputs = [func(self, ad, **params) for ad in reader]
+            self.log.stdinfo(f"{func.__name__}: {reader.summary()}")
+
+        elif n_workers <= 1:
+            adoutputs = [func(self, ad, **params) for ad in adinputs]
+
+        else:
+            self.log.stdinfo(
+                f"Running {func.__name__} on {len(adinputs)} inputs "
+                f"with {n_workers} processes"
+            )
+            adoutputs = _run_in_pool(self, func, adinputs, params, n_workers)
+
+        return [ad for ad in adoutputs if ad is not None]
+
+    return primitive
+
+
+def _run_in_pool(primitives, func, adinputs, params, n_workers):
+    """Hand the inputs to a process pool through temporary files."""
+    cls = type(primitives)
+    key = (func.__module__, func.__qualname__)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tasks = []
+
+        for i, ad in enumerate(adinputs):
+            in_path = os.path.join(tmp_dir, f"in_{i:04d}.fits")
+            out_path = os.path.join(tmp_dir, f"out_{i:04d}.fits")
+            ad.write(in_path)
+
+            names = (ad.orig_filename, ad.filename)
+            tasks.append(
+                (cls.__module__, cls.__qualname__, key, in_path, out_path, names)
+            )
+
+        # Each worker takes a contiguous block of inputs.
+        chunksize = max(1, len(tasks) // (4 * n_workers))
+        run = functools.partial(_run_task, params=params)
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(run, tasks, chunksize=chunksize))
+
+        adoutputs = []
+
+        for ad, task, names in zip(adinputs, tasks, results):
+            if names is None:
+                adoutputs.append(None)
+                continue
+
+            ad_out = astrodata.open(task[4])
+            _load_data(ad_out)
+
+            # Point the output back at the input's directory, not tmp_dir.
+            orig_filename, filename = names
+            ad_out.path = os.path.join(os.path.dirname(ad.path or ""), filename)
+            ad_out.orig_filename = orig_filename
+            adoutputs.append(ad_out)
+
+    return adoutputs
+
+
+def _run_task(task, params):
+    """Worker side: open one input, process it and write the result."""
+    module_name, class_name, key, in_path, out_path, names = task
+
+    if class_name not in _WORKER_PRIMITIVES:
+        cls = importlib.import_module(module_name)
+
+        for attribute in class_name.split("."):
+            cls = getattr(cls, attribute)
+
+        _WORKER_PRIMITIVES[class_name] = cls([])
+
+    importlib.import_module(key[0])
+    func = _PER_AD_FUNCTIONS[key]
+
+    ad = astrodata.open(in_path)
+    ad.orig_filename, ad.filename = names
+
+    ad_out = func(_WORKER_PRIMITIVES[class_name], ad, **params)
+
+    if ad_out is None:
+        return None
+
+    names = (ad_out.orig_filename, ad_out.filename)
+    ad_out.write(out_path, overwrite=True)
+
+    return names
+
+
+def _load_data(ad):
+    """Read all lazily-loaded planes before their temporary file goes away."""
+    for ext in ad:
+        ext.data
+        ext.mask
+        ext.variance
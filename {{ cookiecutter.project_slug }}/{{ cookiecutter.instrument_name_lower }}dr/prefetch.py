@@ -0,0 +1,229 @@
+"""Read recipe inputs ahead of the primitive processing them.
+
+AstroData objects only read their pixels when they are first used, so a
+primitive looping over its inputs waits for each file in turn. On a network
+filesystem that wait can be longer than the processing itself. Iterating over
+a :class:`Prefetcher` instead overlaps the two: while the current frame is
+being processed, the next ``depth`` frames are read (opened if given as paths,
+and every data, mask and variance plane loaded) in the background::
+
+    reader = Prefetcher(adinputs, depth=4)
+
+    for ad in reader:
+        ...
+
+    log.stdinfo(reader.summary())
+
+Frames come out in their original order. Reads are scheduled by an asyncio
+event loop running in a background thread, which hands the blocking file
+reads to a pool of ``depth`` threads. The frames read ahead, plus the one
+being processed, never take more than ``max_bytes`` (judged by their file
+sizes), except that one frame is always allowed however large it is.
+
+The reader keeps count of the time the consumer spent waiting for a frame to
+be read and the time it spent processing frames, so it is easy to tell
+whether a reduction is limited by I/O.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import astrodata
+
+# Number of frames read ahead by default.
+DEFAULT_DEPTH = 2
+
+# Memory allowed for the frames read ahead, in bytes.
+DEFAULT_MAX_BYTES = 2e9
+
+_DONE = object()
+
+
+def _is_path(item):
+    return isinstance(item, (str, os.PathLike))
+
+
+def load(item):
+    """Open a frame if given its path, and read all its planes."""
+    ad = astrodata.open(os.fspath(item)) if _is_path(item) else item
+
+    for ext in ad:
+        ext.data, ext.mask, ext.variance
+
+    return ad
+
+
+def _file_size(item):
+    path = item if _is_path(item) else getattr(item, "path", None)
+
+    try:
+        return os.path.getsize(path)
+
+    except (OSError, TypeError):
+        return 0
+
+
+def _loaded_bytes(ad):
+    return sum(
+        plane.nbytes
+        for ext in ad
+        for plane in (ext.data, ext.mask, ext.variance)
+        if plane is not None
+    )
+
+
+class Prefetcher:
+    """Iterate over frames, reading the next ones in the background.
+
+    Parameters
+    ----------
+    items : iterable of AstroData or str
+        The frames, or their paths. The iterable is consumed lazily, from
+        the background thread.
+    depth : int
+        Number of frames read ahead. With 0, each frame is read when it is
+        asked for, as without a Prefetcher, but the timings are still kept.
+    max_bytes : float
+        Memory allowed for the frames read ahead and the current one.
+    loader : callable, optional
+        Reads one item and returns the frame; :func:`load` by default.
+    """
+
+    def __init__(
+        self, items, depth=DEFAULT_DEPTH, max_bytes=DEFAULT_MAX_BYTES, loader=load
+    ):
+        self.items = items
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.stats = dict(frames=0, bytes=0, read=0.0, wait=0.0, compute=0.0)
+        self.peak_bytes = 0
+
+        self._in_flight = 0
+        # The reads update the stats from several threads at once.
+        self._stats_lock = threading.Lock()
+
+    def _read(self, item):
+        start = time.perf_counter()
+        ad = self.loader(item)
+        elapsed, n_bytes = time.perf_counter() - start, _loaded_bytes(ad)
+
+        with self._stats_lock:
+            self.stats["read"] += elapsed
+            self.stats["bytes"] += n_bytes
+
+        return ad
+
+    async def _produce(self, queue, budget, executor):
+        loop = asyncio.get_running_loop()
+
+        try:
+            for item in self.items:
+                size = _file_size(item)
+
+                async with budget:
+                    await budget.wait_for(
+                        lambda: not self._in_flight
+                        or self._in_flight + size <= self.max_bytes
+                    )
+                    self._in_flight += size
+                    self.peak_bytes = max(self.peak_bytes, self._in_flight)
+
+                task = loop.run_in_executor(executor, self._read, item)
+
+                # Blocks while ``depth`` frames are waiting to be consumed.
+                await queue.put((task, size))
+
+        except Exception as error:
+            await queue.put((error, 0))
+
+        await queue.put((_DONE, 0))
+
+    async def _start(self, executor):
+        self._queue = asyncio.Queue(maxsize=self.depth)
+        self._budget = asyncio.Condition()
+        self._producer = asyncio.create_task(
+            self._produce(self._queue, self._budget, executor)
+        )
+
+    async def _next(self):
+        task, size = await self._queue.get()
+
+        if task is _DONE:
+            return _DONE, 0
+
+        if isinstance(task, Exception):
+            raise task
+
+        return await task, size
+
+    async def _release(self, size):
+        async with self._budget:
+            self._in_flight -= size
+            self._budget.notify_all()
+
+    async def _stop(self):
+        self._producer.cancel()
+
+    def __iter__(self):
+        if self.depth < 1:
+            yield from self._iter_serially()
+            return
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        executor = ThreadPoolExecutor(max_workers=self.depth)
+
+        def call(coroutine):
+            return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+        try:
+            call(self._start(executor))
+            size = 0
+
+            while True:
+                start = time.perf_counter()
+                call(self._release(size))
+                ad, size = call(self._next())
+                end = time.perf_counter()
+                self.stats["wait"] += end - start
+
+                if ad is _DONE:
+                    break
+
+                self.stats["frames"] += 1
+                yield ad
+                self.stats["compute"] += time.perf_counter() - end
+
+        finally:
+            call(self._stop())
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _iter_serially(self):
+        for item in self.items:
+            start = time.perf_counter()
+            ad = self._read(item)
+            end = time.perf_counter()
+            self.stats["wait"] += end - start
+            self.stats["frames"] += 1
+
+            yield ad
+
+            self.stats["compute"] += time.perf_counter() - end
+
+    def summary(self):
+        """Return a one-line account of where the time went."""
+        stats = self.stats
+
+        return (
+            f"Read {stats['frames']} frame(s), {stats['bytes'] / 1e6:.1f} MB, "
+            f"in {stats['read']:.2f} s: waited {stats['wait']:.2f} s for I/O "
+            f"and computed for {stats['compute']:.2f} s"
+        )
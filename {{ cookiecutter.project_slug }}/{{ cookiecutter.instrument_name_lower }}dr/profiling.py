@@ -0,0 +1,216 @@
+"""Per-primitive profiling for the {{ cookiecutter.instrument_name }} primitive sets.
+
+Set the ``{{ cookiecutter.instrument_name_upper }}_PROFILE`` environment variable to a file name to profile a
+reduction::
+
+    {{ cookiecutter.instrument_name_upper }}_PROFILE=profile.json reduce *.fits
+
+Every primitive called on a {{ cookiecutter.instrument_name }} primitive set is then timed. For each call
+the wall and CPU time, the growth of the peak resident memory, the bytes read
+and written by the process and the number of AstroData objects going in and
+out are recorded. Whenever a primitive called from outside any other primitive
+returns, the calls so far are written to the file in the Chrome trace format
+(open it in ``chrome://tracing`` or Perfetto), and a summary table of them, one
+line per primitive, is logged. Both are therefore complete as soon as the
+recipe finishes.
+
+Memory and I/O figures come from ``resource`` and ``/proc/self/io``; they are
+left empty on platforms without them.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_PROFILE"
+
+# ru_maxrss is in kilobytes on Linux, bytes on macOS.
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+_profiler = None
+
+
+def _peak_rss():
+    if resource is None:
+        return None
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def _io_counters():
+    """Bytes read and written by this process so far, if available."""
+    try:
+        with open("/proc/self/io") as io:
+            counters = dict(line.split(":") for line in io)
+
+    except OSError:
+        return None, None
+
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+def _difference(after, before):
+    return None if after is None or before is None else after - before
+
+
+class Profiler:
+    """Collects one record per primitive call."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    def wrap(self, name, method, primitives):
+        """Return ``method`` wrapped to record its calls."""
+
+        @functools.wraps(method)
+        def profiled(*args, **kwargs):
+            adinputs = kwargs.get("adinputs", args[0] if args else None)
+
+            if adinputs is None:
+                adinputs = primitives.streams.get("main", [])
+
+            n_in = len(adinputs)
+            rss, (read, written) = _peak_rss(), _io_counters()
+            cpu, wall = time.process_time(), time.perf_counter()
+
+            return_value = None
+            self._depth += 1
+
+            try:
+                return_value = method(*args, **kwargs)
+                return return_value
+
+            finally:
+                end_wall, end_cpu = time.perf_counter(), time.process_time()
+                end_read, end_written = _io_counters()
+                n_out = len(return_value) if isinstance(return_value, list) else None
+                self.records.append(
+                    {
+                        "name": name,
+                        "start": wall - self._start,
+                        "wall": end_wall - wall,
+                        "cpu": end_cpu - cpu,
+                        "peak_rss_delta": _difference(_peak_rss(), rss),
+                        "bytes_read": _difference(end_read, read),
+                        "bytes_written": _difference(end_written, written),
+                        "n_in": n_in,
+                        "n_out": n_out,
+                        "thread": threading.get_native_id(),
+                    }
+                )
+                self._depth -= 1
+
+                if self._depth == 0:
+                    self.write(primitives.log)
+
+        profiled.profiled = True
+
+        return profiled
+
+    def trace(self):
+        """Return the records as a Chrome trace."""
+        events = [
+            {
+                "name": record["name"],
+                "cat": "primitive",
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["wall"] * 1e6,
+                "pid": os.getpid(),
+                "tid": record["thread"],
+                "args": {
+                    key: value
+                    for key, value in record.items()
+                    if key not in ("name", "start", "thread")
+                },
+            }
+            for record in self.records
+        ]
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """Return a table of the totals per primitive, slowest first."""
+        totals = {}
+
+        for record in self.records:
+            total = totals.setdefault(
+                record["name"], {"calls": 0, "wall": 0, "cpu": 0, "rss": 0, "io": 0}
+            )
+            total["calls"] += 1
+            total["wall"] += record["wall"]
+            total["cpu"] += record["cpu"]
+            total["rss"] = max(total["rss"], record["peak_rss_delta"] or 0)
+            total["io"] += (record["bytes_read"] or 0) + (record["bytes_written"] or 0)
+
+        lines = [
+            f"{'primitive':<30}{'calls':>6}{'wall (s)':>10}{'cpu (s)':>10}"
+            f"{'peak RSS +MB':>14}{'I/O MB':>10}"
+        ]
+
+        for name, total in sorted(totals.items(), key=lambda item: -item[1]["wall"]):
+            lines.append(
+                f"{name:<30}{total['calls']:>6}{total['wall']:>10.3f}"
+                f"{total['cpu']:>10.3f}{total['rss'] / 1e6:>14.1f}"
+                f"{total['io'] / 1e6:>10.1f}"
+            )
+
+        return "\n".join(lines)
+
+    def write_trace(self):
+        """Write the trace file."""
+        with open(self.path, "w") as trace_file:
+            json.dump(self.trace(), trace_file)
+
+    def write(self, log=None):
+        """Write the trace file and log the summary to ``log``, if given."""
+        self.write_trace()
+
+        if log is not None:
+            log.stdinfo(f"Primitive profile written to {self.path}")
+            log.stdinfo(self.summary())
+
+
+def get_profiler():
+    """Return the profiler of this process, or None if profiling is off."""
+    global _profiler
+
+    path = os.environ.get(PROFILE_ENV_VAR)
+
+    if not path:
+        return None
+
+    if _profiler is None:
+        _profiler = Profiler(path)
+
+    return _profiler
+
+
+def attach(primitives):
+    """Profile every primitive of a primitive set, if profiling is on.
+
+    Primitives are the methods with a config in ``primitives.params``. Calling
+    this again on the same set only wraps primitives added since.
+    """
+    profiler = get_profiler()
+
+    if profiler is None:
+        return
+
+    for name in primitives.params:
+        method = getattr(primitives, name, None)
+
+        if callable(method) and not getattr(method, "profiled", False):
+            setattr(primitives, name, profiler.wrap(name, method, primitives))
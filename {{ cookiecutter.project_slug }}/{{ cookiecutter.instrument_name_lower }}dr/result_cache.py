@@ -0,0 +1,450 @@
+"""Content-addressed cache of primitive results.
+
+Set the ``{{ cookiecutter.instrument_name_upper }}_RESULT_CACHE`` environment variable to a directory to
+keep the outputs of every timestamped primitive run on a {{ cookiecutter.instrument_name }} primitive set::
+
+    {{ cookiecutter.instrument_name_upper }}_RESULT_CACHE=~/.cache/{{ cookiecutter.instrument_name_lower }}dr reduce *.fits
+
+A call is identified by
+
++ a hash of its inputs: filenames, headers and every data, mask and variance
+  plane,
++ a canonical hash of the primitive's config, after the parameters given in
+  the call and by the user have been applied, and
++ the version of the code, as :func:`{{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }}.versions.code_version`
+  gives it.
+
+When the same primitive is called again with the same key, its outputs are
+read back instead of being computed. Tuning a parameter of a late primitive
+and re-reducing therefore only recomputes from that primitive onwards.
+
+Outputs are stored as gzip-compressed FITS files. The cache is kept under
+``{{ cookiecutter.instrument_name_upper }}_RESULT_CACHE_SIZE`` gigabytes (10 by default) by removing the
+least recently used results. It can be inspected and purged with::
+
+    python -m {{ cookiecutter.instrument_name_lower }}dr.result_cache list
+    python -m {{ cookiecutter.instrument_name_lower }}dr.result_cache purge --primitive someStuff
+
+As with incremental execution, primitives that write to disk or to the
+calibration database (``write*`` and ``store*``) are never cached. Calibrations
+found through the calibration manager are not part of the key, so purge the
+primitives using them after processing new calibrations.
+"""
+
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import astrodata
+import numpy as np
+from astrodata.fits import ad_to_hdulist
+
+from {{ cookiecutter.instrument_name_lower }}_instruments.{{ cookiecutter.instrument_name_lower }} import versions  # fmt: skip
+
+CACHE_DIR_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_RESULT_CACHE"
+MAX_SIZE_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_RESULT_CACHE_SIZE"
+
+# Default size limit, in GB.
+DEFAULT_MAX_SIZE = 10
+
+# Primitives with side effects beyond their outputs, which always run.
+ALWAYS_RUN_PREFIXES = ("write", "store")
+
+# Parameters that change how a primitive runs but not what it produces.
+NON_RESULT_PARAMS = (
+    "n_workers",
+    "n_threads",
+    "memory_limit",
+    "prefetch",
+    "plane_mode",
+)
+
+# Fast gzip: cached files are written far more often than they are read.
+COMPRESSION_LEVEL = 1
+
+
+def _update_with_array(digest, array):
+    array = np.ascontiguousarray(array)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(memoryview(array).cast("B"))
+
+
+def _update_with_attributes(digest, obj, names):
+    """Hash the named arrays and tables attached to an AstroData object."""
+    for name in sorted(names):
+        digest.update(name.encode())
+        _update_with_array(digest, np.asarray(getattr(obj, name)))
+
+
+def data_hash(ad):
+    """Return a hash of everything in an AstroData object."""
+    digest = hashlib.sha1()
+    digest.update(f"{ad.orig_filename}\n{ad.filename}\n".encode())
+    digest.update(ad.phu.tostring().encode())
+    _update_with_attributes(digest, ad, ad.tables)
+
+    for ext in ad:
+        digest.update(ext.hdr.tostring().encode())
+
+        for plane in (ext.data, ext.mask, ext.variance):
+            digest.update(b"-" if plane is None else b"+")
+
+            if plane is not None:
+                _update_with_array(digest, plane)
+
+        _update_with_attributes(digest, ext, ext.exposed)
+
+    return digest.hexdigest()
+
+
+def config_hash(config, params=None):
+    """Return a canonical hash of a config with ``params`` applied.
+
+    The hash doesn't depend on the order of the fields or of ``params``, nor
+    on the parameters in ``NON_RESULT_PARAMS``.
+    """
+    values = dict(config.items()) if config is not None else {}
+    values.update(params or {})
+
+    for name in NON_RESULT_PARAMS:
+        values.pop(name, None)
+
+    description = json.dumps(values, sort_keys=True, default=repr)
+
+    return hashlib.sha1(description.encode()).hexdigest()
+
+
+class ResultCache:
+    """Stores primitive outputs, keyed by their inputs and parameters.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        Where the cached files and their index live.
+    max_size : float, optional
+        Size limit of the cache, in GB. Defaults to the
+        ``{{ cookiecutter.instrument_name_upper }}_RESULT_CACHE_SIZE`` environment variable, or 10.
+    """
+
+    def __init__(self, directory, max_size=None):
+        if max_size is None:
+            max_size = float(os.environ.get(MAX_SIZE_ENV_VAR, DEFAULT_MAX_SIZE))
+
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite"), timeout=60
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                primitive TEXT NOT NULL,
+                outputs TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            """
+        )
+
+    @staticmethod
+    def key(primitive, config, params, adinputs):
+        """Return the key of a primitive call."""
+        description = json.dumps(
+            [
+                primitive,
+                config_hash(config, params),
+                versions.code_version(),
+                [data_hash(ad) for ad in adinputs],
+            ]
+        )
+
+        return hashlib.sha1(description.encode()).hexdigest()
+
+    def get(self, key, directory=""):
+        """Return the outputs stored for ``key``, or None.
+
+        The outputs look as if they had just been produced in ``directory``.
+        """
+        row = self._connection.execute(
+            "SELECT outputs FROM results WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        outputs = json.loads(row[0])
+
+        try:
+            adoutputs = [astrodata.open(path) for path, _, _ in outputs]
+
+            for ad in adoutputs:
+                for ext in ad:
+                    # Read everything before the file can be evicted.
+                    ext.data, ext.mask, ext.variance
+
+        except OSError:
+            self._delete([key])
+            return None
+
+        for ad, (_, filename, orig_filename) in zip(adoutputs, outputs):
+            ad.path = os.path.join(directory, filename)
+            ad.orig_filename = orig_filename
+
+        with self._connection:
+            self._connection.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+
+        return adoutputs
+
+    def put(self, key, primitive, adoutputs):
+        """Store the outputs of a primitive call, then evict if needed."""
+        outputs = []
+        size = 0
+
+        for i, ad in enumerate(adoutputs):
+            path = os.path.join(self.directory, f"{key}_{i}.fits.gz")
+
+            with gzip.open(path, "wb", compresslevel=COMPRESSION_LEVEL) as output:
+                ad_to_hdulist(ad).writeto(output)
+
+            outputs.append([path, ad.filename, ad.orig_filename])
+            size += os.path.getsize(path)
+
+        now = time.time()
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, primitive, json.dumps(outputs), size, now, now),
+            )
+
+        self.evict()
+
+    def entries(self):
+        """Return the ``(key, primitive, size, created, last_used)`` rows."""
+        return self._connection.execute(
+            "SELECT key, primitive, size, created, last_used FROM results "
+            "ORDER BY last_used DESC"
+        ).fetchall()
+
+    def size(self):
+        """Return the total size of the cached files, in bytes."""
+        return self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def evict(self, max_size=None):
+        """Remove the least recently used results above ``max_size`` GB."""
+        max_size = (self.max_size if max_size is None else max_size) * 1e9
+        total = self.size()
+        keys = []
+
+        for key, _, size, _, _ in reversed(self.entries()):
+            if total <= max_size:
+                break
+
+            keys.append(key)
+            total -= size
+
+        self._delete(keys)
+
+        return len(keys)
+
+    def purge(self, primitive=None, older_than=None):
+        """Remove results, all of them by default.
+
+        Parameters
+        ----------
+        primitive : str, optional
+            Only remove the results of this primitive.
+        older_than : float, optional
+            Only remove results last used more than this many days ago.
+        """
+        query = "SELECT key FROM results WHERE 1"
+        arguments = []
+
+        if primitive is not None:
+            query += " AND primitive = ?"
+            arguments.append(primitive)
+
+        if older_than is not None:
+            query += " AND last_used < ?"
+            arguments.append(time.time() - older_than * 86400)
+
+        keys = [row[0] for row in self._connection.execute(query, arguments)]
+        self._delete(keys)
+
+        return len(keys)
+
+    def _delete(self, keys):
+        for key in keys:
+            row = self._connection.execute(
+                "SELECT outputs FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                continue
+
+            for path, _, _ in json.loads(row[0]):
+                try:
+                    os.remove(path)
+
+                except FileNotFoundError:
+                    pass
+
+            with self._connection:
+                self._connection.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def close(self):
+        self._connection.close()
+
+
+def _user_params(primitives, name):
+    """The user parameters that apply to primitive ``name``."""
+    params = {}
+
+    for key, value in getattr(primitives, "user_params", {}).items():
+        primitive, _, param = key.rpartition(":")
+
+        if primitive in ("", name):
+            params[param] = value
+
+    return params
+
+
+def wrap(cache, name, method, primitives):
+    """Return primitive ``method`` wrapped to look up its results in ``cache``."""
+
+    @functools.wraps(method)
+    def cached(adinputs=None, **params):
+        instream = params.get("instream", params.get("stream", "main"))
+        outstream = params.get("outstream", params.get("stream", "main"))
+
+        if adinputs is None:
+            adinputs = primitives.streams.get(instream, [])
+
+        call_params = _user_params(primitives, name)
+        call_params.update(params)
+
+        key = cache.key(name, primitives.params.get(name), call_params, adinputs)
+        directory = os.path.dirname(adinputs[0].path or "") if adinputs else ""
+        adoutputs = cache.get(key, directory)
+
+        if adoutputs is not None:
+            primitives.log.stdinfo(f"Reusing the cached results of {name}")
+            primitives.streams[outstream] = adoutputs
+
+            return adoutputs
+
+        # Primitives only put their outputs in the stream when called without
+        # adinputs, and they are given here.
+        adoutputs = method(adinputs=adinputs, **params)
+        primitives.streams[outstream] = adoutputs
+        cache.put(key, name, adoutputs)
+
+        return adoutputs
+
+    cached.result_cached = True
+
+    return cached
+
+
+def attach(primitives):
+    """Cache the results of a primitive set, if caching is on.
+
+    Only the primitives in ``primitives.timestamp_keys`` are cached, since
+    they are the ones known to run at most once on a given frame. Calling this
+    again on the same set only wraps primitives added since.
+    """
+    directory = os.environ.get(CACHE_DIR_ENV_VAR)
+
+    if not directory:
+        return
+
+    cache = ResultCache(directory)
+
+    for name in primitives.params:
+        if name not in primitives.timestamp_keys or name.startswith(
+            ALWAYS_RUN_PREFIXES
+        ):
+            continue
+
+        method = getattr(primitives, name, None)
+
+        if callable(method) and not getattr(method, "result_cached", False):
+            setattr(primitives, name, wrap(cache, name, method, primitives))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        # __spec__ is None when this file is run as a script.
+        prog=f"python -m {__spec__.name}" if __spec__ else None,
+        description="Inspect or purge the {{ cookiecutter.instrument_name }} primitive result cache.",
+    )
+    parser.add_argument(
+        "--directory",
+        default=os.environ.get(CACHE_DIR_ENV_VAR),
+        help=f"cache directory (default: ${CACHE_DIR_ENV_VAR})",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("info", help="show the size of the cache")
+    list_parser = commands.add_parser("list", help="list the cached results")
+    list_parser.add_argument("--primitive", help="only list this primitive")
+
+    purge_parser = commands.add_parser("purge", help="remove cached results")
+    purge_parser.add_argument("--primitive", help="only remove this primitive")
+    purge_parser.add_argument(
+        "--older-than", type=float, metavar="DAYS", help="only remove older results"
+    )
+    purge_parser.add_argument(
+        "--max-size",
+        type=float,
+        metavar="GB",
+        help="remove the least recently used results above this size",
+    )
+
+    args = parser.parse_args(argv)
+
+    if not args.directory:
+        parser.error(f"no cache directory given and ${CACHE_DIR_ENV_VAR} not set")
+
+    cache = ResultCache(args.directory)
+
+    try:
+        if args.command == "info":
+            print(f"Directory: {cache.directory}")
+            print(f"Results:   {len(cache.entries())}")
+            print(f"Size:      {cache.size() / 1e9:.3f} GB of {cache.max_size} GB")
+
+        elif args.command == "list":
+            for key, primitive, size, created, last_used in cache.entries():
+                if args.primitive in (None, primitive):
+                    print(
+                        f"{key[:12]}  {primitive:<30}{size / 1e6:>10.1f} MB  "
+                        f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))}"
+                    )
+
+        elif args.max_size is not None:
+            print(f"Removed {cache.evict(args.max_size)} result(s)")
+
+        else:
+            removed = cache.purge(args.primitive, args.older_than)
+            print(f"Removed {removed} result(s)")
+
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Streaming execution of recipes, for quick-look reductions.
+
+Recipes normally run every primitive over the whole list of inputs before
+moving to the next one, so every frame is in memory at every stage. With
+:func:`stream`, frames are instead taken from the main stream a window at a
+time and pushed through all the steps before the next window is read::
+
+    stream(
+        p,
+        [
+            Step("prepare"),
+            Step("addVAR", read_noise=True),
+            Barrier("stackDarks"),
+            Step("writeOutputs"),
+        ],
+    )
+
+A :class:`Step` only ever sees one window of frames. A :class:`Barrier` is for
+primitives that need every frame at once, such as stacking: it waits for all
+the frames coming out of the steps before it, and what it returns is streamed
+through the steps after it.
+
+Ending the steps with ``Step("writeOutputs")`` writes each frame as soon as
+it is done, so the first outputs appear after a single frame has been reduced
+rather than all of them. With ``keep=False`` finished frames are then dropped
+instead of piling up in the main stream.
+
+With ``prefetch`` set, the next frames are read in the background while the
+current window goes through the steps (see :mod:`.prefetch`).
+"""
+
+import itertools
+import time
+
+# Frames processed together by each Step, unless stream() is told otherwise.
+DEFAULT_WINDOW = 1
+
+
+class Step:
+    """A primitive run on one window of frames at a time."""
+
+    barrier = False
+
+    def __init__(self, primitive, **params):
+        self.primitive = primitive
+        self.params = params
+
+    def __call__(self, p, adinputs):
+        return getattr(p, self.primitive)(adinputs=adinputs, **self.params)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.primitive!r})"
+
+
+class Barrier(Step):
+    """A primitive that needs all the frames at once."""
+
+    barrier = True
+
+
+def stream(p, steps, window=DEFAULT_WINDOW, keep=True, prefetch=0):
+    """Run ``steps`` over the main stream of ``p``, a window at a time.
+
+    Frames are removed from ``p.streams["main"]`` as they are read, so inputs
+    that have been dealt with can be freed.
+
+    Parameters
+    ----------
+    p : PrimitivesBASE
+        The primitive set of the recipe.
+    steps : list of Step
+        The primitives to run, in order.
+    window : int
+        Number of frames going through the steps together.
+    keep : bool
+        Whether finished frames are kept; if not, they are dropped once the
+        last step is done with them.
+    prefetch : int
+        Number of frames read ahead of the steps; none if 0.
+
+    Returns
+    -------
+    list of AstroData
+        The frames kept, which also become the main stream.
+    """
+    start = time.perf_counter()
+    frames = _take(p.streams["main"])
+
+    if prefetch:
+        # prefetch imports astrodata, which this module otherwise does without.
+        from .prefetch import Prefetcher
+
+        frames = reader = Prefetcher(frames, depth=prefetch)
+
+    batches = _read(frames, window)
+
+    for step in steps:
+        if step.barrier:
+            batches = _barrier(p, step, batches, window)
+
+        else:
+            batches = _per_window(p, step, batches)
+
+    kept = []
+
+    for batch in batches:
+        p.log.stdinfo(
+            f"{len(batch)} frame(s) done after {time.perf_counter() - start:.1f} s"
+        )
+
+        if keep:
+            kept.extend(batch)
+
+    if prefetch:
+        p.log.stdinfo(reader.summary())
+
+    p.streams["main"] = kept
+
+    return kept
+
+
+def _take(frames):
+    """Take frames from the front of the list, so it no longer holds them."""
+    while frames:
+        yield frames.pop(0)
+
+
+def _read(frames, window):
+    """Group frames into windows."""
+    frames = iter(frames)
+
+    while batch := list(itertools.islice(frames, window)):
+        yield batch
+
+
+def _per_window(p, step, batches):
+    for batch in batches:
+        batch = step(p, batch)
+
+        if batch:
+            yield batch
+
+
+def _barrier(p, step, batches, window):
+    adinputs = [ad for batch in batches for ad in batch]
+    p.log.stdinfo(f"Waiting for {len(adinputs)} frame(s) before {step.primitive}")
+
+    adoutputs = step(p, adinputs)
+
+    yield from _read(_take(adoutputs), window)
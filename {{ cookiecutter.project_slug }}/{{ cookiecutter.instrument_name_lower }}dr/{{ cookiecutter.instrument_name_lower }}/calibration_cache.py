@@ -0,0 +1,464 @@
+"""Local index of processed calibrations, in front of the calibration manager.
+
+Looking up a calibration through the calibration manager for every science
+frame is slow for bulk processing. :class:`CalibrationCache` keeps, in a local
+SQLite database, the processed darks and flats seen so far, indexed by the
+descriptors they are matched on (``MATCH_DESCRIPTORS``). In memory, the
+calibrations sharing the same values are sorted by time, so a frame is matched
+to the closest one with a binary search (:mod:`bisect`), and matching
+thousands of frames takes a fraction of a second.
+
+Only the calibration types in ``MATCH_DESCRIPTORS`` are matched from the
+index, and it must reproduce the calibration manager's rules for
+{{ cookiecutter.instrument_name }} for them: calibrations match when those
+descriptors are equal, and the closest in time is picked. Add a calibration
+type only once its rules are reproduced; the others always go to the
+calibration manager. As the calibration manager does, ``procmode="sq"`` only
+matches calibrations processed in science quality mode, while other modes
+match any.
+
+The primitive sets put a :class:`CachedCalDB` in front of their calibration
+databases (see :func:`attach`). Frames with a match in the index get it from
+there; the others are looked up as usual, and the calibrations found that way
+are added to the index for next time, as are those stored by
+``storeProcessedDark`` and the like. The index only knows these: calibrations
+added to a calibration manager by other means are not used until a frame has
+no match in the index, or the index is cleared.
+
+Calibration files that changed or disappeared are dropped from the index when
+they are next matched. :func:`load` keeps the last ``LOADED_CALIBRATIONS``
+calibrations read in memory, and hands out read-only views of them.
+
+The database is ``calibration_cache.sqlite`` in the reduction's calibration
+directory, so it is not shared between reductions with different calibration
+databases, or wherever ``{{ cookiecutter.instrument_name_upper }}_CALIBRATION_CACHE`` says. Setting
+``{{ cookiecutter.instrument_name_upper }}_NO_CALIBRATION_CACHE=1`` turns the cache off.
+"""
+
+import bisect
+import datetime
+import functools
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import astrodata
+
+from . import planes
+
+CACHE_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_CALIBRATION_CACHE"
+DISABLE_ENV_VAR = "{{ cookiecutter.instrument_name_upper }}_NO_CALIBRATION_CACHE"
+
+# Name given as the origin of the calibrations found in the index.
+CACHE_NAME = "{{ cookiecutter.instrument_name_lower }}_calibration_cache"
+
+# Calibration directory of a reduction, as in DRAGONS.
+DEFAULT_CALIBRATION_DIR = "calibrations"
+CACHE_FILENAME = "calibration_cache.sqlite"
+
+# Descriptors that must be equal for a calibration to match a frame, by
+# calibration type, as in the calibration manager's rules. Only these types
+# are matched from the index.
+MATCH_DESCRIPTORS = {
+    "processed_dark": (
+        "exposure_time",
+        "coadds",
+        "read_mode",
+        "detector_x_bin",
+        "detector_y_bin",
+    ),
+    "processed_flat": (
+        "read_mode",
+        "detector_x_bin",
+        "detector_y_bin",
+        "filter_name",
+        "disperser",
+        "focal_plane_mask",
+    ),
+}
+
+# Number of calibrations kept in memory by load().
+LOADED_CALIBRATIONS = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calibrations (
+    path TEXT PRIMARY KEY,
+    caltype TEXT NOT NULL,
+    match TEXT NOT NULL,
+    procmode TEXT NOT NULL,
+    ut_time REAL NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calibrations_match ON calibrations (caltype, match);
+"""
+
+_caches = {}
+
+
+def default_cache_path(calibration_dir=None):
+    """Return the database location for a calibration directory.
+
+    ``{{ cookiecutter.instrument_name_upper }}_CALIBRATION_CACHE`` overrides it.
+    """
+    if os.environ.get(CACHE_ENV_VAR):
+        return Path(os.environ[CACHE_ENV_VAR])
+
+    return Path(calibration_dir or DEFAULT_CALIBRATION_DIR) / CACHE_FILENAME
+
+
+def cache_disabled():
+    """Return True if the cache is switched off through the environment."""
+    return os.environ.get(DISABLE_ENV_VAR, "").lower() in ("1", "true", "yes")
+
+
+def _value(ad, descriptor):
+    """A descriptor value that can be stored as JSON, or None."""
+    try:
+        value = getattr(ad, descriptor)()
+
+    except Exception:
+        return None
+
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value and all(item == value[0] for item in value) else None
+
+    return value if isinstance(value, (str, int, float, bool)) else None
+
+
+def match_key(ad, caltype):
+    """Return the values ``ad`` is matched on for ``caltype``, as a string."""
+    return json.dumps([_value(ad, name) for name in MATCH_DESCRIPTORS[caltype]])
+
+
+def _ut_time(ad):
+    try:
+        when = ad.ut_datetime()
+
+    except Exception:
+        return None
+
+    if when is None:
+        return None
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+
+    return when.timestamp()
+
+
+def _procmode(ad):
+    """The mode a calibration was processed in, "" if unknown."""
+    return str(getattr(ad, "phu", {}).get("PROCMODE") or "")
+
+
+class _Calibrations:
+    """Calibrations with the same type and match values, sorted by time."""
+
+    def __init__(self, rows=()):
+        self.times = []
+        self.rows = []
+
+        for row in sorted(rows):
+            self.add(row)
+
+    def add(self, row):
+        """Add a ``(ut_time, path, procmode, mtime_ns, size)`` row."""
+        self.remove(row[1])
+        i = bisect.bisect_right(self.times, row[0])
+        self.times.insert(i, row[0])
+        self.rows.insert(i, row)
+
+    def remove(self, path):
+        for i, row in enumerate(self.rows):
+            if row[1] == path:
+                del self.times[i], self.rows[i]
+                return
+
+    def nearest(self, ut_time, procmodes=None):
+        """The row closest to ``ut_time``, or the latest one if it is None,
+        among those processed in one of ``procmodes`` (any if None).
+        """
+        if ut_time is None:
+            ut_time = float("inf")
+
+        # The first suitable rows on each side of where ut_time would go.
+        i = bisect.bisect_left(self.times, ut_time)
+        candidates = [
+            next(
+                (
+                    self.rows[j]
+                    for j in indices
+                    if procmodes is None or self.rows[j][2] in procmodes
+                ),
+                None,
+            )
+            for indices in (range(i - 1, -1, -1), range(i, len(self.rows)))
+        ]
+
+        return min(
+            (row for row in candidates if row is not None),
+            key=lambda row: abs(row[0] - ut_time),
+            default=None,
+        )
+
+
+class CalibrationCache:
+    """SQLite index of processed calibrations.
+
+    Parameters
+    ----------
+    path : str or os.PathLike, optional
+        Location of the database. Defaults to :func:`default_cache_path`.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # WAL lets several processes read while one writes.
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        # Sorted calibrations by (caltype, match), read from the database
+        # when first needed, and again when another connection changed it.
+        self._index = {}
+        self._data_version = None
+
+    def _calibrations(self, caltype, key):
+        (data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+
+        if data_version != self._data_version:
+            self._index.clear()
+            self._data_version = data_version
+
+        if (caltype, key) not in self._index:
+            rows = self._conn.execute(
+                "SELECT ut_time, path, procmode, mtime_ns, size FROM calibrations "
+                "WHERE caltype = ? AND match = ?",
+                (caltype, key),
+            )
+            self._index[caltype, key] = _Calibrations(rows)
+
+        return self._index[caltype, key]
+
+    def add(self, ad, caltype, path=None):
+        """Add a processed calibration, stored at ``path`` or ``ad.path``.
+
+        Returns False, adding nothing, for calibration types that are not
+        indexed and calibrations without a time.
+        """
+        path = os.path.abspath(os.fspath(path or ad.path))
+        ut_time = _ut_time(ad)
+
+        if caltype not in MATCH_DESCRIPTORS or ut_time is None:
+            return False
+
+        key = match_key(ad, caltype)
+        stat = os.stat(path)
+        row = (ut_time, path, _procmode(ad), stat.st_mtime_ns, stat.st_size)
+        calibrations = self._calibrations(caltype, key)
+
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO calibrations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, caltype, key, row[2], ut_time, *row[3:]),
+            )
+
+        # Our own changes do not change data_version.
+        calibrations.add(row)
+
+        return True
+
+    def find(self, ad, caltype, procmode=None):
+        """Return the path of the calibration for ``ad``, or None.
+
+        This is the calibration of type ``caltype`` matching ``ad`` on
+        ``MATCH_DESCRIPTORS`` that is closest in time, processed in science
+        quality mode if ``procmode`` is "sq". Calibrations whose file has
+        changed or gone are dropped from the index.
+        """
+        if caltype not in MATCH_DESCRIPTORS:
+            return None
+
+        calibrations = self._calibrations(caltype, match_key(ad, caltype))
+        ut_time = _ut_time(ad)
+        procmodes = ("sq",) if procmode == "sq" else None
+
+        while True:
+            row = calibrations.nearest(ut_time, procmodes)
+
+            if row is None:
+                return None
+
+            _, path, _, mtime_ns, size = row
+
+            try:
+                stat = os.stat(path)
+
+            except FileNotFoundError:
+                stat = None
+
+            if stat and (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+                return path
+
+            self.remove(path)
+            calibrations.remove(path)
+
+    def find_all(self, adinputs, caltype, procmode=None):
+        """Return the calibration path, or None, for each of ``adinputs``."""
+        return [self.find(ad, caltype, procmode) for ad in adinputs]
+
+    def remove(self, path):
+        """Forget a calibration."""
+        path = os.path.abspath(path)
+
+        with self._conn:
+            self._conn.execute("DELETE FROM calibrations WHERE path = ?", (path,))
+
+        for calibrations in self._index.values():
+            calibrations.remove(path)
+
+    def clear(self):
+        """Forget every calibration."""
+        with self._conn:
+            self._conn.execute("DELETE FROM calibrations")
+
+        self._index.clear()
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM calibrations").fetchone()[0]
+
+
+def get_cache(path=None):
+    """Return the process-wide :class:`CalibrationCache` at ``path``.
+
+    ``path`` defaults to :func:`default_cache_path`.
+    """
+    path = Path(path if path is not None else default_cache_path()).resolve()
+
+    if path not in _caches:
+        _caches[path] = CalibrationCache(path)
+
+    return _caches[path]
+
+
+def load(path):
+    """Return a calibration with its planes read, kept in memory.
+
+    The planes of the result are read-only views shared by every caller;
+    use ``planes.writable`` to get a copy to modify. The calibration is read
+    again if the file changed.
+    """
+    stat = os.stat(path)
+
+    return planes.view(_load(os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+
+
+@functools.lru_cache(maxsize=LOADED_CALIBRATIONS)
+def _load(path, mtime_ns, size):
+    ad = astrodata.open(path)
+
+    for ext in ad:
+        ext.data, ext.mask, ext.variance
+
+    return ad
+
+
+def clear_loaded():
+    """Forget every calibration kept in memory by :func:`load`."""
+    _load.cache_clear()
+
+
+def _cal_return(files, origins):
+    # Imported here so the cache itself can be used without DRAGONS'
+    # calibration service.
+    from recipe_system.cal_service.caldb import CalReturn
+
+    return CalReturn(files=files, origins=origins)
+
+
+class CachedCalDB:
+    """Calibration databases with the local index in front of them.
+
+    Everything but getting and storing calibrations is passed on to
+    ``caldb``, the primitive set's own calibration databases.
+    """
+
+    def __init__(self, caldb, cache=None):
+        self.caldb = caldb
+        self.cache = cache or get_cache()
+
+    def __getattr__(self, name):
+        return getattr(self.caldb, name)
+
+    def get_calibrations(self, adinputs, caltype=None, procmode=None, howmany=1):
+        if caltype not in MATCH_DESCRIPTORS or howmany != 1:
+            return self.caldb.get_calibrations(
+                adinputs, caltype=caltype, procmode=procmode, howmany=howmany
+            )
+
+        files = self.cache.find_all(adinputs, caltype, procmode)
+        origins = [CACHE_NAME if path else None for path in files]
+        missing = [i for i, path in enumerate(files) if path is None]
+
+        if missing:
+            found = self.caldb.get_calibrations(
+                [adinputs[i] for i in missing], caltype=caltype, procmode=procmode
+            )
+
+            for i, path, origin in zip(missing, found.files, found.origins):
+                files[i], origins[i] = path, origin
+
+                if path:
+                    self.cache.add(astrodata.open(path), caltype)
+
+        return _cal_return(files, origins)
+
+    def get_processed_dark(self, adinputs, procmode=None):
+        return self.get_calibrations(
+            adinputs, caltype="processed_dark", procmode=procmode
+        )
+
+    def get_processed_flat(self, adinputs, procmode=None):
+        return self.get_calibrations(
+            adinputs, caltype="processed_flat", procmode=procmode
+        )
+
+    def store_calibration(self, calfile, caltype=None):
+        result = self.caldb.store_calibration(calfile, caltype=caltype)
+
+        if caltype in MATCH_DESCRIPTORS:
+            cals = calfile if isinstance(calfile, (list, tuple)) else [calfile]
+
+            for cal in cals:
+                if not isinstance(cal, astrodata.AstroData):
+                    cal = astrodata.open(cal)
+
+                if cal.path and os.path.exists(cal.path):
+                    self.cache.add(cal, caltype)
+
+        return result
+
+
+def attach(primitives):
+    """Put the calibration index in front of a primitive set's databases.
+
+    The index used is the one of the primitive set's calibration directory.
+    Does nothing if the cache is turned off or already attached.
+    """
+    caldb = getattr(primitives, "caldb", None)
+
+    if caldb is None or cache_disabled() or isinstance(caldb, CachedCalDB):
+        return
+
+    calibration_dir = getattr(primitives, "cachedict", {}).get("calibrations")
+    cache = get_cache(default_cache_path(calibration_dir))
+    primitives.caldb = CachedCalDB(caldb, cache)
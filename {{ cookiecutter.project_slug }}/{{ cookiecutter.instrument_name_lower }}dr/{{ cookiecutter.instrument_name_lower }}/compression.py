@@ -0,0 +1,146 @@
+"""Tile-compressed FITS output for {{ cookiecutter.instrument_name }} products.
+
+:func:`write_compressed` writes an AstroData object with every image plane
+(SCI, VAR, DQ and any other image extension) stored as a tile-compressed
+``CompImageHDU``. Tables are written unchanged. Integer planes are always
+compressed losslessly, with RICE_1. Float planes are either
+
+``"lossless"``
+    GZIP_2 without quantization, so the data read back are identical, or
+``"quantized"``
+    quantized to ``1 / quantize_level`` of the noise of each tile (with
+    subtractive dithering) and compressed with RICE_1, which gives much
+    smaller files at the cost of a controlled loss of precision.
+
+The planes are compressed in a pool of threads, since astropy's compression
+codecs release the GIL: each plane is compressed into a memory buffer by a
+worker, and the compressed binary tables are then written out in order.
+Files written this way are read back transparently by ``astrodata.open``.
+"""
+
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from astropy.io import fits
+from astrodata.fits import ad_to_hdulist
+
+COMPRESSION_MODES = ("none", "lossless", "quantized")
+
+# Parameters of the compressionConfig in parameters_{{ cookiecutter.instrument_name_lower }}.py.
+COMPRESSION_PARAMS = ("compression", "quantize_level", "n_threads")
+
+# Compression used for integer planes, by size of the integer in bytes.
+# RICE_1 does not support 64-bit integers.
+INTEGER_COMPRESSION = {1: "RICE_1", 2: "RICE_1", 4: "RICE_1", 8: "GZIP_2"}
+
+
+def _compression_options(data, mode, quantize_level):
+    if data.dtype.kind in "iub":
+        return {"compression_type": INTEGER_COMPRESSION[data.dtype.itemsize]}
+
+    if mode == "quantized":
+        return {"compression_type": "RICE_1", "quantize_level": quantize_level}
+
+    return {"compression_type": "GZIP_2", "quantize_level": 0.0}
+
+
+def _compress(hdu, mode, quantize_level):
+    """Compress one image HDU into a binary table HDU."""
+    data = hdu.data
+
+    if data.dtype.kind == "b":
+        data = data.astype(np.uint8)
+
+    compressed = fits.CompImageHDU(
+        data,
+        header=hdu.header,
+        **_compression_options(data, mode, quantize_level),
+    )
+
+    buffer = io.BytesIO()
+    fits.HDUList([fits.PrimaryHDU(), compressed]).writeto(buffer)
+    buffer.seek(0)
+
+    # Opened as a plain table, so it is written as is instead of being
+    # compressed again. The table reads its heap from the buffer, so the
+    # HDU list is left open.
+    return fits.open(buffer, disable_image_compression=True)[1]
+
+
+def _size(hdu):
+    """Bytes taken by an uncompressed HDU in a FITS file."""
+    data_size = 0 if hdu.data is None else hdu.data.nbytes
+    data_size = -(-data_size // 2880) * 2880
+
+    return len(hdu.header.tostring()) + data_size
+
+
+def write_compressed(
+    ad, filename, mode="lossless", quantize_level=16.0, n_threads=None, overwrite=False
+):
+    """Write an AstroData object as a tile-compressed FITS file.
+
+    Parameters
+    ----------
+    ad : AstroData
+        What to write.
+    filename : str
+        Where to write it.
+    mode : {"lossless", "quantized", "none"}
+        How float planes are compressed (see the module docstring). With
+        "none", the file is written uncompressed.
+    quantize_level : float
+        Quantization of the float planes in "quantized" mode, in fractions
+        of the noise of each tile.
+    n_threads : int, optional
+        Number of compression threads; one per CPU by default.
+    overwrite : bool
+        Overwrite an existing file?
+
+    Returns
+    -------
+    dict
+        ``raw_bytes`` and ``compressed_bytes``, the size of the file without
+        and with compression, their ``ratio``, the ``seconds`` taken, and the
+        write ``throughput`` in uncompressed MB/s.
+    """
+    if mode not in COMPRESSION_MODES:
+        raise ValueError(f"Unknown compression mode: {mode}")
+
+    start = time.perf_counter()
+    hdulist = ad_to_hdulist(ad)
+
+    # ad_to_hdulist leaves the primary data to be filled in on writing.
+    hdulist[0].data = None
+    raw_bytes = sum(_size(hdu) for hdu in hdulist)
+
+    if mode != "none":
+        images = [
+            i
+            for i, hdu in enumerate(hdulist)
+            if i > 0 and isinstance(hdu, fits.ImageHDU) and hdu.data is not None
+        ]
+
+        with ThreadPoolExecutor(max_workers=n_threads or os.cpu_count()) as pool:
+            tables = pool.map(
+                lambda i: _compress(hdulist[i], mode, quantize_level), images
+            )
+
+            for i, table in zip(images, tables):
+                hdulist[i] = table
+
+    hdulist.writeto(filename, overwrite=overwrite)
+
+    seconds = time.perf_counter() - start
+    compressed_bytes = os.path.getsize(filename)
+
+    return {
+        "raw_bytes": raw_bytes,
+        "compressed_bytes": compressed_bytes,
+        "ratio": raw_bytes / compressed_bytes,
+        "seconds": seconds,
+        "throughput": raw_bytes / 1e6 / seconds,
+    }
@@ -0,0 +1,171 @@
+"""Cosmic-ray detection for {{ cookiecutter.instrument_name }} echelle frames.
+
+A pixel is a cosmic ray if it stands more than ``sigma`` times its noise above
+a median model of its surroundings. The model is what keeps real features
+from being flagged:
+
++ between the orders it is a ``FILTER_SIZE`` square median;
++ within the orders, found from their traces, it is the larger of a median
+  along the dispersion (x) and a median along the slit (y). Orders are
+  smooth along the dispersion and sky or arc lines fill the slit, so either
+  one or the other follows them, while a cosmic ray is sharp in both
+  directions.
+
+Pixels next to a cosmic ray are flagged too if they are more than
+``grow_sigma`` times their noise above the model.
+
+The model, which is most of the work, is computed in tiles of ``tile_size``
+pixels on a pool of threads. Each tile is read with a margin of ``HALO``
+pixels, and the thresholds are applied to the whole frame, so the result does
+not depend on the tiling. All the work is done by NumPy and ``scipy.ndimage``,
+which release the GIL.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import ndimage
+
+from .orders import trace_centers
+
+# Length of the median filters, in pixels. Lines at the edge of an order
+# still fill most of a slit-direction median of this length.
+FILTER_SIZE = 5
+
+# Margin read around each tile: enough for the median filters.
+HALO = FILTER_SIZE
+
+# Margin added around the extraction half-width of the orders, so that the
+# wings of the orders are treated as part of them.
+ORDER_MARGIN = 2
+
+# Noise scale of a median absolute deviation.
+MAD_TO_SIGMA = 1.4826
+
+
+def order_footprint(shape, coefficients, half_width):
+    """Return a mask of the pixels within ``half_width`` of an order trace."""
+    ny, nx = shape
+    footprint = np.zeros(shape, dtype=bool)
+
+    if coefficients is None or not len(coefficients):
+        return footprint
+
+    centers = np.rint(trace_centers(coefficients, nx)).astype(int)
+    rows = centers[:, :, np.newaxis] + np.arange(-half_width, half_width + 1)
+    columns = np.broadcast_to(np.arange(nx)[np.newaxis, :, np.newaxis], rows.shape)
+    inside = (rows >= 0) & (rows < ny)
+
+    footprint[rows[inside], columns[inside]] = True
+
+    return footprint
+
+
+def _model(data, footprint):
+    """Median model of the frame that follows orders and lines."""
+    square = ndimage.median_filter(data, size=FILTER_SIZE)
+
+    if not footprint.any():
+        return square
+
+    along_orders = ndimage.median_filter(data, size=(1, FILTER_SIZE))
+    along_slit = ndimage.median_filter(data, size=(FILTER_SIZE, 1))
+
+    return np.where(footprint, np.maximum(along_orders, along_slit), square)
+
+
+def _flag(residual, noise, sigma, grow_sigma):
+    with np.errstate(invalid="ignore"):
+        candidates = residual > sigma * noise
+        neighbours = residual > grow_sigma * noise
+
+    return candidates | (ndimage.binary_dilation(candidates) & neighbours)
+
+
+def _tiles(shape, tile_size):
+    """Yield ``(core, padded)`` slices covering the frame."""
+    ny, nx = shape
+
+    for y0 in range(0, ny, tile_size):
+        for x0 in range(0, nx, tile_size):
+            y1, x1 = min(y0 + tile_size, ny), min(x0 + tile_size, nx)
+            core = (slice(y0, y1), slice(x0, x1))
+            padded = (
+                slice(max(y0 - HALO, 0), min(y1 + HALO, ny)),
+                slice(max(x0 - HALO, 0), min(x1 + HALO, nx)),
+            )
+
+            yield core, padded
+
+
+def find_cosmic_rays(
+    data,
+    variance=None,
+    mask=None,
+    coefficients=None,
+    half_width=5,
+    sigma=5.0,
+    grow_sigma=2.5,
+    tile_size=512,
+    n_threads=None,
+):
+    """Find the cosmic rays in a frame.
+
+    Parameters
+    ----------
+    data : ndarray
+        2D frame, dispersed along x.
+    variance : ndarray, optional
+        Variance plane. Without it, the noise is taken to be uniform over
+        the frame and estimated from the residuals.
+    mask : ndarray, optional
+        DQ plane; pixels already flagged are not flagged again.
+    coefficients : ndarray, optional
+        Order traces from ``orders.trace_orders``. Without them, lines are
+        not protected.
+    half_width : int
+        Extraction half-width of the orders.
+    sigma : float
+        Detection threshold, in units of the noise.
+    grow_sigma : float
+        Threshold for the neighbours of cosmic rays, in units of the noise.
+    tile_size : int
+        Side of the tiles processed by each thread.
+    n_threads : int, optional
+        Number of threads; one per CPU by default.
+
+    Returns
+    -------
+    ndarray of bool
+        True where a cosmic ray was found.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    footprint = order_footprint(data.shape, coefficients, half_width + ORDER_MARGIN)
+    residual = np.empty(data.shape, dtype=np.float32)
+
+    def process(tile):
+        core, padded = tile
+        tile_residual = data[padded] - _model(data[padded], footprint[padded])
+
+        offset = tuple(c.start - p.start for c, p in zip(core, padded))
+        residual[core] = tile_residual[
+            offset[0] : offset[0] + core[0].stop - core[0].start,
+            offset[1] : offset[1] + core[1].stop - core[1].start,
+        ]
+
+    with ThreadPoolExecutor(max_workers=n_threads or os.cpu_count()) as pool:
+        list(pool.map(process, _tiles(data.shape, tile_size)))
+
+    if variance is None:
+        noise = MAD_TO_SIGMA * np.median(np.abs(residual))
+
+    else:
+        noise = np.sqrt(np.maximum(variance, 0))
+
+    flags = _flag(residual, noise, sigma, grow_sigma)
+
+    if mask is not None:
+        flags &= mask == 0
+
+    return flags
@@ -0,0 +1,24 @@
+# Index of the static calibration files shipped in lookups/BPM and
+# lookups/MDF. static_masks.py resolves frames against these lists, so adding
+# a file only requires a new entry here.
+#
+# Dates are inclusive "YYYY-MM-DD" strings giving the range over which a file
+# is valid; None leaves that end of the range open. When several entries
+# match, the first one listed wins.
+#
+# Masks stored without BZERO/BSCALE scaling (for example as uint8 or int16)
+# are shared between processes through the page cache. Scaled ones, like
+# uint16 planes written by astropy, are read into memory once per process.
+
+# (x binning, y binning, read mode, first date, last date, filename)
+bpm_index = [
+    # EDIT AS NEEDED (example entries)
+    # (1, 1, "default", "2024-01-01", None, "bpm_1x1_default_v1.fits"),
+    # (2, 2, "default", "2024-01-01", None, "bpm_2x2_default_v1.fits"),
+]
+
+# (focal plane mask, first date, last date, filename)
+mdf_index = [
+    # EDIT AS NEEDED (example entries)
+    # ("0.5arcsec", "2024-01-01", None, "0.5arcsec_mdf.fits"),
+]
@@ -0,0 +1,175 @@
+"""Cached, memory-mapped access to the files in lookups/BPM and lookups/MDF.
+
+Frames are matched to a static bad pixel mask by binning, read mode and date,
+and to a mask definition file by focal plane mask and date, through the
+indices in maskdb.py.
+
+Files are memory-mapped read-only, so the operating system shares their pages
+between every process of a node, and the mapped arrays are kept in a
+process-wide LRU cache. Reducing many frames therefore reads each mask from
+disk once instead of once per frame. The arrays are not writeable: copy them
+before modifying them.
+"""
+
+import datetime
+import functools
+import os
+
+import numpy as np
+from astropy.io import fits
+from astropy.table import Table
+
+import astrodata
+
+from . import maskdb
+
+BPM_DIR = os.path.join(os.path.dirname(__file__), "BPM")
+MDF_DIR = os.path.join(os.path.dirname(__file__), "MDF")
+
+# Number of files kept mapped by load().
+MASK_CACHE_SIZE = 16
+
+
+def _date(value, default):
+    if value is None:
+        return default
+
+    return datetime.date.fromisoformat(value)
+
+
+def _build_index(entries, n_keys):
+    """Group index entries by their matching key, in the order listed."""
+    index = {}
+
+    for entry in entries:
+        key = tuple(entry[:n_keys])
+        start, end, filename = entry[n_keys:]
+
+        index.setdefault(key, []).append(
+            (_date(start, datetime.date.min), _date(end, datetime.date.max), filename)
+        )
+
+    return index
+
+
+_BPM_INDEX = _build_index(maskdb.bpm_index, 3)
+_MDF_INDEX = _build_index(maskdb.mdf_index, 1)
+
+
+def _select(index, key, date):
+    """Return the first filename for ``key`` valid on ``date``, if any.
+
+    Without a date, the most recent entry for the key is used.
+    """
+    candidates = index.get(key, [])
+
+    if date is None:
+        return max(candidates, key=lambda entry: entry[1])[2] if candidates else None
+
+    for start, end, filename in candidates:
+        if start <= date <= end:
+            return filename
+
+    return None
+
+
+def bpm_filename(ad):
+    """Return the path of the static BPM for ``ad``, or None."""
+    key = (ad.detector_x_bin(), ad.detector_y_bin(), ad.read_mode())
+    filename = _select(_BPM_INDEX, key, ad.ut_date())
+
+    return None if filename is None else os.path.join(BPM_DIR, filename)
+
+
+def mdf_filename(ad):
+    """Return the path of the MDF for ``ad``, or None."""
+    filename = _select(_MDF_INDEX, (ad.focal_plane_mask(),), ad.ut_date())
+
+    return None if filename is None else os.path.join(MDF_DIR, filename)
+
+
+def load(path):
+    """Return the headers and data of every HDU of a FITS file.
+
+    Returns
+    -------
+    tuple of (Header, ndarray)
+        One pair per HDU, primary first. Image data are read-only arrays
+        backed by the file; tables are read-only FITS records. The result
+        is cached until the file changes.
+    """
+    stat = os.stat(path)
+
+    return _load(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=MASK_CACHE_SIZE)
+def _load(path, mtime_ns, size):
+    with fits.open(
+        path, mode="denywrite", memmap=True, do_not_scale_image_data=True
+    ) as hdulist:
+        return tuple(_read_only(hdu) for hdu in hdulist)
+
+
+def _read_only(hdu):
+    """Return the header and a read-only array for one HDU."""
+    header = hdu.header.copy()
+    data = hdu.data
+
+    if data is None or isinstance(hdu, fits.BinTableHDU):
+        return header, data
+
+    bzero = header.pop("BZERO", 0)
+    bscale = header.pop("BSCALE", 1)
+
+    if data.dtype.kind == "i" and bscale == 1 and bzero == 2 ** (8 * data.itemsize - 1):
+        # Unsigned integers stored with an offset; flipping the sign bit
+        # removes it, but needs a copy.
+        unsigned = np.dtype(f"u{data.itemsize}")
+        data = (data.view(unsigned.newbyteorder(">")) ^ bzero).astype(unsigned)
+
+    elif bzero != 0 or bscale != 1:
+        data = data * bscale + bzero
+
+    data.flags.writeable = False
+
+    return header, data
+
+
+def clear_cache():
+    """Unmap every cached file."""
+    _load.cache_clear()
+
+
+def get_bpm(ad):
+    """Return the static BPM for ``ad`` as an AstroData object, or None.
+
+    The AstroData object is new on every call, but its extensions share the
+    cached read-only arrays.
+    """
+    path = bpm_filename(ad)
+
+    if path is None:
+        return None
+
+    (phu, _), *extensions = load(path)
+
+    bpm = astrodata.create(
+        fits.PrimaryHDU(header=phu),
+        [fits.ImageHDU(data, header=header) for header, data in extensions],
+    )
+    bpm.filename = os.path.basename(path)
+
+    return bpm
+
+
+def get_mdf(ad):
+    """Return the MDF for ``ad`` as a Table, or None."""
+    path = mdf_filename(ad)
+
+    if path is None:
+        return None
+
+    _, (header, data) = load(path)[:2]
+
+    return Table(data, meta=dict(header), copy=False)
@@ -3,4 +3,10 @@ timestamp_keys = {
     # writing a timestamp keyword to the header once the user level function
     # has completed.  (ie. when a primitive runs, add a timestamp in header.)
     "myNewPrimitive": "NEWPRIM",
+    "stackDarksChunked": "STCKDARK",
+    "ADUToElectronsAndVAR": "ADUELVAR",
+    "traceOrders": "TRACEORD",
+    "rejectCosmicRays": "CRREJECT",
+    "extractOrders": "EXTRORD",
+    "correctBlaze": "BLAZCORR",
 }
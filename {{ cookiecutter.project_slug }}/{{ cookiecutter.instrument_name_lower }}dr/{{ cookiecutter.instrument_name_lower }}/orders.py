@@ -0,0 +1,362 @@
+"""Echelle order tracing, extraction and blaze correction for {{ cookiecutter.instrument_name }}.
+
+Frames are assumed to have the dispersion direction along the x axis (columns)
+and the orders stacked along y. Every function works on all orders at once:
+the only Python loops are over sample positions or polynomial coefficients,
+never over pixels or orders.
+
+Traces are polynomials in x giving the y centre of each order, stored as an
+``(n_orders, degree + 1)`` array with the highest power first, as used by
+``numpy.polyval``.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from astropy.table import Table
+
+# Number of trace solutions kept by cached_trace.
+TRACE_CACHE_SIZE = 32
+
+_trace_cache = OrderedDict()
+
+
+def trace_orders(
+    data,
+    mask=None,
+    n_orders=None,
+    threshold=0.1,
+    half_width=5,
+    degree=3,
+    n_samples=32,
+    band_width=16,
+):
+    """Find the orders in a frame and fit a polynomial to each.
+
+    Parameters
+    ----------
+    data : ndarray
+        2D frame, ideally a flat, with the orders along x.
+    mask : ndarray, optional
+        DQ plane; non-zero pixels are ignored.
+    n_orders : int, optional
+        Keep only the ``n_orders`` brightest orders. All orders above
+        ``threshold`` are kept if None.
+    threshold : float
+        Minimum peak height, as a fraction of the brightest order.
+    half_width : int
+        Half-width of the window used to centroid each order.
+    degree : int
+        Degree of the trace polynomials.
+    n_samples : int
+        Number of positions along x where the orders are centroided.
+    band_width : int
+        Number of columns median-combined at each sample position.
+
+    Returns
+    -------
+    ndarray
+        Trace coefficients, shape ``(n_orders, degree + 1)``, sorted by
+        increasing y.
+    """
+    ny, nx = data.shape
+    band_width = min(band_width, nx)
+
+    starts = np.linspace(0, nx - band_width, n_samples).astype(int)
+    x_samples = starts + (band_width - 1) / 2
+    columns = starts[:, np.newaxis] + np.arange(band_width)
+
+    # Cross-dispersion profiles at every sample position, (n_samples, ny).
+    bands = data[:, columns].astype(np.float64)
+
+    if mask is None:
+        profiles = np.median(bands, axis=2).T
+
+    else:
+        bands[mask[:, columns] != 0] = np.nan
+        profiles = np.nan_to_num(np.nanmedian(bands, axis=2).T)
+
+    middle = n_samples // 2
+    peaks = _find_peaks(profiles[middle], threshold, n_orders)
+
+    if not len(peaks):
+        raise ValueError("No orders found above the threshold")
+
+    positions = np.empty((n_samples, len(peaks)))
+    positions[middle] = _centroid(profiles[middle], peaks, half_width)
+
+    # Follow each order outwards from the middle of the frame.
+    for sample in range(middle + 1, n_samples):
+        positions[sample] = _centroid(
+            profiles[sample], positions[sample - 1], half_width
+        )
+
+    for sample in range(middle - 1, -1, -1):
+        positions[sample] = _centroid(
+            profiles[sample], positions[sample + 1], half_width
+        )
+
+    degree = min(degree, n_samples - 1)
+
+    return np.polyfit(x_samples, positions, degree).T
+
+
+def _find_peaks(profile, threshold, n_orders):
+    """Return the local maxima of a profile above a relative threshold."""
+    inner = profile[1:-1]
+    is_peak = (inner > profile[:-2]) & (inner >= profile[2:])
+    is_peak &= inner > threshold * profile.max()
+
+    peaks = np.flatnonzero(is_peak) + 1
+
+    if n_orders is not None and len(peaks) > n_orders:
+        brightest = np.argsort(profile[peaks])[::-1][:n_orders]
+        peaks = np.sort(peaks[brightest])
+
+    return peaks
+
+
+def _centroid(profile, guesses, half_width):
+    """Centroid every order around its guessed position in one go."""
+    offsets = np.arange(-half_width, half_width + 1)
+    rows = np.rint(guesses).astype(int)[:, np.newaxis] + offsets
+    rows = np.clip(rows, 0, len(profile) - 1)
+
+    values = profile[rows]
+    weights = np.clip(values - values.min(axis=1, keepdims=True), 0, None)
+    total = weights.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centers = (weights * rows).sum(axis=1) / total
+
+    # Keep the previous position where there is no signal to centroid on.
+    return np.where(total > 0, centers, guesses)
+
+
+def trace_centers(coefficients, nx):
+    """Evaluate every trace at every column, returning ``(n_orders, nx)``."""
+    x = np.arange(nx, dtype=np.float64)
+    centers = np.zeros((len(coefficients), nx))
+
+    for coefficient in coefficients.T:
+        centers = centers * x + coefficient[:, np.newaxis]
+
+    return centers
+
+
+def cached_trace(key, data, **kwargs):
+    """Return ``trace_orders(data, **kwargs)``, reusing earlier traces.
+
+    Traces are kept per ``key``, which should identify the detector
+    configuration (BPM, MDF, binning, ...) and the tracing parameters. The
+    first frame seen for a configuration is the one that gets traced.
+    """
+    if key in _trace_cache:
+        _trace_cache.move_to_end(key)
+        return _trace_cache[key]
+
+    coefficients = trace_orders(data, **kwargs)
+    _trace_cache[key] = coefficients
+
+    if len(_trace_cache) > TRACE_CACHE_SIZE:
+        _trace_cache.popitem(last=False)
+
+    return coefficients
+
+
+def clear_trace_cache():
+    """Forget all cached traces."""
+    _trace_cache.clear()
+
+
+def trace_table(coefficients, half_width):
+    """Store trace coefficients as a Table, one row per order."""
+    table = Table()
+    table["order"] = np.arange(1, len(coefficients) + 1)
+    table["half_width"] = np.full(len(coefficients), half_width)
+
+    for power in range(coefficients.shape[1]):
+        table[f"c{power}"] = coefficients[:, -1 - power]
+
+    return table
+
+
+def coefficients_from_table(table):
+    """Inverse of :func:`trace_table`; returns ``(coefficients, half_width)``."""
+    n_coefficients = sum(name.startswith("c") for name in table.colnames)
+    coefficients = np.column_stack(
+        [table[f"c{power}"] for power in reversed(range(n_coefficients))]
+    )
+
+    return coefficients, int(table["half_width"][0])
+
+
+def extract_orders(
+    data,
+    coefficients,
+    half_width,
+    variance=None,
+    mask=None,
+    method="optimal",
+    profile_window=64,
+):
+    """Extract one spectrum per order.
+
+    Parameters
+    ----------
+    data : ndarray
+        2D frame.
+    coefficients : ndarray
+        Trace coefficients from :func:`trace_orders`.
+    half_width : int
+        Pixels on each side of the trace included in the extraction.
+    variance : ndarray, optional
+        Variance plane. Without it all pixels are weighted equally.
+    mask : ndarray, optional
+        DQ plane; non-zero pixels are left out.
+    method : {"optimal", "box"}
+        Optimal (Horne 1986) or plain sum extraction.
+    profile_window : int
+        Number of columns the spatial profile is averaged over for the
+        optimal extraction.
+
+    Returns
+    -------
+    flux, variance, no_data : ndarray
+        Each of shape ``(n_orders, nx)``; ``no_data`` is True where no
+        good pixel contributed.
+    """
+    if method not in ("optimal", "box"):
+        raise ValueError(f"Unknown extraction method: {method}")
+
+    ny, nx = data.shape
+    centers = trace_centers(coefficients, nx)
+
+    # (n_orders, nx, 2 * half_width + 1) pixel indices around each trace.
+    base_rows = np.rint(centers).astype(int)
+    rows = base_rows[:, :, np.newaxis] + np.arange(-half_width, half_width + 1)
+    columns = np.arange(nx)[np.newaxis, :, np.newaxis]
+
+    good = (rows >= 0) & (rows < ny)
+    rows = np.clip(rows, 0, ny - 1)
+
+    pixels = data[rows, columns].astype(np.float64)
+    good &= np.isfinite(pixels)
+
+    if variance is None:
+        pixel_var = np.ones_like(pixels)
+
+    else:
+        pixel_var = variance[rows, columns].astype(np.float64)
+        good &= pixel_var > 0
+
+    if mask is not None:
+        good &= mask[rows, columns] == 0
+
+    pixels = np.where(good, pixels, 0)
+    pixel_var = np.where(good, pixel_var, 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "box":
+            flux = pixels.sum(axis=2)
+            flux_var = np.where(good, pixel_var, 0).sum(axis=2)
+
+        else:
+            profile = _spatial_profile(pixels, good, base_rows, profile_window)
+            weights = good * profile / pixel_var
+            norm = (weights * profile).sum(axis=2)
+
+            flux = (weights * pixels).sum(axis=2) / norm
+            flux_var = (good * profile).sum(axis=2) / norm
+
+    no_data = ~good.any(axis=2) | ~np.isfinite(flux)
+
+    flux[no_data] = 0
+    flux_var[no_data] = 0
+
+    return flux, flux_var, no_data
+
+
+def _spatial_profile(pixels, good, base_rows, window):
+    """Normalized spatial profile of every order, smoothed along x.
+
+    The extraction window jumps by a pixel wherever the rounded trace centre
+    changes, so the profile is only averaged over columns sharing the same
+    ``base_rows`` value, with a window kept symmetric so a slowly drifting
+    trace does not bias it.
+    """
+    n_orders, nx = base_rows.shape
+    x = np.arange(nx)
+
+    starts = np.ones((n_orders, nx), dtype=bool)
+    starts[:, 1:] = base_rows[:, 1:] != base_rows[:, :-1]
+    ends = np.ones((n_orders, nx), dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+
+    segment_start = np.maximum.accumulate(np.where(starts, x, 0), axis=1)
+    reversed_ends = np.where(ends, x, nx - 1)[:, ::-1]
+    segment_end = np.minimum.accumulate(reversed_ends, axis=1)[:, ::-1]
+
+    half = np.minimum(window // 2, np.minimum(x - segment_start, segment_end - x))
+    lower = (x - half)[:, :, np.newaxis]
+    upper = (x + half + 1)[:, :, np.newaxis]
+
+    positive = np.where(good, np.clip(pixels, 0, None), 0)
+    cumsum = np.cumsum(positive, axis=1)
+    cumsum = np.concatenate([np.zeros_like(cumsum[:, :1]), cumsum], axis=1)
+
+    profile = np.take_along_axis(cumsum, upper, axis=1)
+    profile -= np.take_along_axis(cumsum, lower, axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profile /= profile.sum(axis=2, keepdims=True)
+
+    return np.nan_to_num(profile)
+
+
+def smooth_along_x(values, window):
+    """Moving average of ``values`` over ``window`` columns (the last axis),
+    edges shrunk.
+    """
+    nx = values.shape[-1]
+    half = window // 2
+
+    cumsum = np.cumsum(values, axis=-1)
+    cumsum = np.concatenate([np.zeros_like(cumsum[..., :1]), cumsum], axis=-1)
+
+    upper = np.minimum(np.arange(nx) + half + 1, nx)
+    lower = np.maximum(np.arange(nx) - half, 0)
+
+    return (cumsum[..., upper] - cumsum[..., lower]) / (upper - lower)
+
+
+def blaze_from_flat(flat_flux, window=101):
+    """Blaze function from extracted flat spectra, normalized to 1 per order.
+
+    ``flat_flux`` is one order, or a 2D array of orders of the same length.
+    """
+    smoothed = smooth_along_x(np.asarray(flat_flux, dtype=np.float64), window)
+    peak = smoothed.max(axis=-1, keepdims=True)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(peak > 0, smoothed / peak, 0)
+
+
+def correct_blaze(flux, variance, blaze, min_blaze=0.05):
+    """Divide spectra by the blaze function.
+
+    Returns
+    -------
+    flux, variance, low_blaze : ndarray
+        Corrected spectra and variance, and a mask of the pixels where the
+        blaze is below ``min_blaze`` (those are set to zero).
+    """
+    low_blaze = blaze < min_blaze
+    safe_blaze = np.where(low_blaze, 1, blaze)
+
+    flux = np.where(low_blaze, 0, flux / safe_blaze)
+
+    if variance is not None:
+        variance = np.where(low_blaze, 0, variance / safe_blaze**2)
+
+    return flux, variance, low_blaze
@@ -2,6 +2,21 @@
 # define in the primitives_{{ cookiecutter.instrument_name_lower }}.py file
 
 from gempy.library import config
+from geminidr.core import parameters_bookkeeping, parameters_calibdb
+
+
+class planeModeConfig(config.Config):
+    plane_mode = config.ChoiceField(
+        "How the input planes are reused",
+        str,
+        allowed={
+            "inplace": "modify the inputs",
+            "view": "copy-on-write views of the input planes",
+            "copy": "full copies of the inputs",
+        },
+        default="inplace",
+        optional=False,
+    )
 
 
 class somePrimitiveConfig(config.Config):
@@ -10,5 +25,73 @@ class somePrimitiveConfig(config.Config):
     param2 = config.Field("do param2?", bool, False)
 
 
-class someStuffConfig(config.Config):
+class someStuffConfig(planeModeConfig):
     suffix = config.Field("Output suffix", str, "_somestuff")
+    n_workers = config.RangeField("Number of worker processes", int, 1, min=1)
+    prefetch = config.RangeField("Inputs read ahead (serial only)", int, 0, min=0)
+
+
+class ADUToElectronsAndVARConfig(planeModeConfig):
+    suffix = config.Field("Filename suffix", str, "_varAdded")
+    read_noise = config.Field("Add read noise?", bool, True)
+    poisson_noise = config.Field("Add Poisson noise?", bool, True)
+
+
+class stackDarksChunkedConfig(config.Config):
+    suffix = config.Field("Filename suffix", str, "_stack")
+    operation = config.ChoiceField(
+        "Averaging operation",
+        str,
+        allowed={"mean": "arithmetic mean", "median": "median"},
+        default="median",
+        optional=False,
+    )
+    reject_method = config.ChoiceField(
+        "Pixel rejection method",
+        str,
+        allowed={"none": "no rejection", "sigclip": "sigma clipping"},
+        default="sigclip",
+        optional=False,
+    )
+    lsigma = config.RangeField("Low rejection threshold (sigma)", float, 3.0, min=0)
+    hsigma = config.RangeField("High rejection threshold (sigma)", float, 3.0, min=0)
+    max_iters = config.RangeField(
+        "Maximum number of clipping iterations", int, None, min=1, optional=True
+    )
+    memory_limit = config.RangeField(
+        "Memory available for stacking (GB)", float, 1.0, min=0.01
+    )
+
+
+class compressionConfig(config.Config):
+    compression = config.ChoiceField(
+        "Tile compression of the output",
+        str,
+        allowed={
+            "none": "uncompressed",
+            "lossless": "lossless (GZIP_2 floats, RICE_1 integers)",
+            "quantized": "quantized floats (RICE_1), lossless integers",
+        },
+        default="none",
+        optional=False,
+    )
+    quantize_level = config.RangeField(
+        "Float quantization, in fractions of the noise", float, 16.0, min=1
+    )
+    n_threads = config.RangeField(
+        "Number of compression threads (all CPUs if None)",
+        int,
+        None,
+        min=1,
+        optional=True,
+    )
+
+
+class writeOutputsConfig(parameters_bookkeeping.writeOutputsConfig, compressionConfig):
+    pass
+
+
+class storeProcessedDarkConfig(
+    parameters_calibdb.storeProcessedDarkConfig, compressionConfig
+):
+    pass
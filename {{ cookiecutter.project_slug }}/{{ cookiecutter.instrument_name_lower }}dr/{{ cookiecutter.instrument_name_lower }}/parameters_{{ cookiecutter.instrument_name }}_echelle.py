@@ -1,10 +1,73 @@
 # This parameter file contains the parameters related to the primitives
 # define in the primitives_{{ cookiecutter.instrument_name_lower }}_echelle.py file
 
+from astrodata import AstroData
 from gempy.library import config
 
+from .parameters_{{ cookiecutter.instrument_name_lower }} import planeModeConfig
 
-class myNewPrimitiveConfig(config.Config):
+
+class myNewPrimitiveConfig(planeModeConfig):
     suffix = config.Field("Filename suffix", str, "_suffix")
     param1 = config.Field("Param1", str, "default")
     param2 = config.Field("do param2?", bool, False)
+    n_workers = config.RangeField("Number of worker processes", int, 1, min=1)
+    prefetch = config.RangeField("Inputs read ahead (serial only)", int, 0, min=0)
+
+
+class traceOrdersConfig(config.Config):
+    suffix = config.Field("Filename suffix", str, "_ordersTraced")
+    n_orders = config.RangeField(
+        "Number of orders to trace (all if None)", int, None, min=1, optional=True
+    )
+    threshold = config.RangeField(
+        "Minimum order peak, relative to the brightest", float, 0.1, min=0, max=1
+    )
+    half_width = config.RangeField("Half-width of the orders (pixels)", int, 5, min=1)
+    degree = config.RangeField("Polynomial degree of the traces", int, 3, min=1)
+    n_samples = config.RangeField(
+        "Number of positions along the dispersion to trace at", int, 32, min=4
+    )
+    reuse_traces = config.Field(
+        "Reuse traces between frames of the same configuration?", bool, False
+    )
+
+
+class rejectCosmicRaysConfig(planeModeConfig):
+    suffix = config.Field("Filename suffix", str, "_CRMasked")
+    sigma = config.RangeField("Detection threshold (sigma)", float, 5.0, min=0)
+    grow_sigma = config.RangeField(
+        "Threshold for neighbours of cosmic rays (sigma)", float, 2.5, min=0
+    )
+    tile_size = config.RangeField("Side of the tiles (pixels)", int, 512, min=32)
+    n_threads = config.RangeField(
+        "Number of threads (all CPUs if None)", int, None, min=1, optional=True
+    )
+
+
+class extractOrdersConfig(config.Config):
+    suffix = config.Field("Filename suffix", str, "_extracted")
+    method = config.ChoiceField(
+        "Extraction method",
+        str,
+        allowed={"optimal": "optimal extraction", "box": "sum over the order"},
+        default="optimal",
+        optional=False,
+    )
+    profile_window = config.RangeField(
+        "Columns averaged for the spatial profile", int, 64, min=1
+    )
+
+
+class correctBlazeConfig(config.Config):
+    suffix = config.Field("Filename suffix", str, "_blazeCorrected")
+    flat = config.Field(
+        "Extracted flat to measure the blaze from",
+        (str, AstroData),
+        None,
+        optional=True,
+    )
+    smoothing = config.RangeField("Blaze smoothing window (pixels)", int, 101, min=1)
+    min_blaze = config.RangeField(
+        "Minimum relative blaze to keep", float, 0.05, min=0, max=1
+    )
@@ -0,0 +1,141 @@
+"""Control over when primitives copy the pixel planes of their inputs.
+
+Primitives that take a ``plane_mode`` parameter get their output with
+:func:`output`, one of:
+
+``"inplace"``
+    The input itself. Nothing is copied; the input is modified.
+``"view"``
+    A new AstroData object whose SCI, VAR and DQ planes are read-only views
+    of the input's. Headers and tables are copied. A plane is only copied
+    when the primitive asks to write to it through :func:`writable`, so the
+    input is left untouched while the planes that do not change are shared
+    (copy-on-write).
+``"copy"``
+    A full copy of the input, planes included.
+
+Primitives then modify planes in place through :func:`writable`::
+
+    ad_out = planes.output(ad, params["plane_mode"])
+
+    for ext in ad_out:
+        planes.writable(ext, "mask")[...] |= flags
+
+and :func:`assert_no_copies` checks, with ``np.shares_memory``, that the
+planes a primitive did not mean to copy still share their memory with the
+input.
+"""
+
+from copy import deepcopy
+
+import numpy as np
+
+import astrodata
+from astrodata.nddata import ADVarianceUncertainty, NDAstroData
+
+PLANE_MODES = ("inplace", "view", "copy")
+
+PLANES = ("data", "mask", "variance")
+
+
+def _read_only(array):
+    if array is None:
+        return None
+
+    view = array.view()
+    view.flags.writeable = False
+
+    return view
+
+
+def view(ad):
+    """Return a copy of ``ad`` whose pixel planes are read-only views."""
+    ad_out = astrodata.create(deepcopy(ad.phu))
+
+    for ext in ad:
+        variance = _read_only(ext.variance)
+        ad_out.append(
+            NDAstroData(
+                _read_only(ext.data),
+                uncertainty=(
+                    None
+                    if variance is None
+                    else ADVarianceUncertainty(variance, copy=False)
+                ),
+                mask=_read_only(ext.mask),
+                wcs=deepcopy(ext.nddata.wcs),
+                meta=deepcopy(ext.nddata.meta),
+                unit=ext.nddata.unit,
+            )
+        )
+
+    for name in ad.tables:
+        setattr(ad_out, name, deepcopy(getattr(ad, name)))
+
+    ad_out.orig_filename = ad.orig_filename
+    ad_out.filename = ad.filename
+
+    return ad_out
+
+
+def output(ad, mode="inplace"):
+    """Return the object a primitive should write its results to.
+
+    See the module docstring for the meaning of ``mode``.
+    """
+    if mode == "inplace":
+        return ad
+
+    if mode == "view":
+        return view(ad)
+
+    if mode == "copy":
+        return deepcopy(ad)
+
+    raise ValueError(f"Unknown plane mode: {mode}")
+
+
+def writable(ext, plane):
+    """Return a plane of ``ext`` that can be modified in place.
+
+    Read-only planes, as made by :func:`view`, are copied first and the copy
+    attached to ``ext``; others are returned as they are. Returns None if
+    the extension has no such plane.
+    """
+    array = getattr(ext, plane)
+
+    if array is not None and not array.flags.writeable:
+        array = array.copy()
+        setattr(ext, plane, array)
+
+    return array
+
+
+def assert_no_copies(ad_out, ad, allowed=()):
+    """Check that the planes of ``ad_out`` share their memory with ``ad``.
+
+    Parameters
+    ----------
+    ad_out, ad : AstroData
+        A primitive's output and the input it was made from.
+    allowed : iterable of str
+        Planes the primitive is expected to have copied or replaced.
+
+    Raises
+    ------
+    AssertionError
+        Listing every plane, other than ``allowed`` ones, present in both
+        and not sharing memory.
+    """
+    copied = [
+        f"extension {index} {plane}"
+        for index, (ext_out, ext) in enumerate(zip(ad_out, ad))
+        for plane in PLANES
+        if plane not in allowed
+        and getattr(ext_out, plane) is not None
+        and getattr(ext, plane) is not None
+        and not np.shares_memory(getattr(ext_out, plane), getattr(ext, plane))
+    ]
+
+    if copied:
+        raise AssertionError(f"{ad.filename}: copied {', '.join(copied)}")
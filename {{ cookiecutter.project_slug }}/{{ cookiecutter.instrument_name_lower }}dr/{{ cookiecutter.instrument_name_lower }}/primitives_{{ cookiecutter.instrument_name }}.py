@@ -4,12 +4,29 @@
 #                                                         primitives_{{ cookiecutter.instrument_name_lower }}.py
 # ------------------------------------------------------------------------------
 
+import os
+import tempfile
+
+import numpy as np
+from astropy.io import fits
+
+import astrodata
+
 from gempy.gemini import gemini_tools as gt
 
 from geminidr.gemini.primitives_gemini import Gemini
 
+from .. import profiling
+from .. import result_cache
+from ..parallel import per_ad_primitive
+from . import calibration_cache
+from . import compression
+from . import noise
 from . import parameters_{{ cookiecutter.instrument_name_lower }}
+from . import planes
+from . import stacking
 
+from .lookups import static_masks
 from .lookups import timestamp_keywords as {{ cookiecutter.instrument_name_lower }}_stamps
 
 from recipe_system.utils.decorators import parameter_override
@@ -30,31 +47,432 @@ class {{ cookiecutter.instrument_name_title }}(Gemini):
         self._param_update(parameters_{{ cookiecutter.instrument_name_lower }})
         # Add {{ cookiecutter.instrument_name }} specific timestamp keywords
         self.timestamp_keys.update({{ cookiecutter.instrument_name_lower }}_stamps.timestamp_keys)
+        calibration_cache.attach(self)
+        result_cache.attach(self)
+        profiling.attach(self)
+
+    def addDQ(self, adinputs=None, **params):
+        """
+        Add a DQ plane to each input, starting from the static BPM.
+
+        With the default ``static_bpm``, the BPM of each frame is resolved
+        through lookups/maskdb.py and read from the process-wide cache of
+        memory-mapped masks (see lookups/static_masks.py), so each BPM is
+        read from disk once rather than once per frame. Frames the local
+        index has no BPM for keep the generic "default" lookup, and everything
+        else is left to the generic addDQ.
+        """
+        if params.get("static_bpm") != "default":
+            return super().addDQ(adinputs, **params)
+
+        bpms = [static_masks.get_bpm(ad) for ad in adinputs]
+        adoutputs = list(adinputs)
+
+        for found in (True, False):
+            indices = [i for i, bpm in enumerate(bpms) if (bpm is not None) == found]
+
+            if not indices:
+                continue
+
+            if found:
+                params["static_bpm"] = [bpms[i] for i in indices]
+
+            else:
+                params["static_bpm"] = "default"
+
+            outputs = super().addDQ([adinputs[i] for i in indices], **params)
+
+            for i, ad in zip(indices, outputs):
+                adoutputs[i] = ad
+
+        return adoutputs
 
-    def someStuff(self, adinputs=None, **params):
+    def subtractDark(self, adinputs=None, **params):
+        """
+        Subtract the processed darks, found through the calibration cache.
+
+        Without a ``dark``, the darks are matched through the calibration
+        databases, with the local index of calibration_cache.py in front,
+        and read through its in-memory cache, so a dark used for many frames
+        is read once. Everything else is left to the generic subtractDark.
+        """
+        if params.get("dark") is None and isinstance(
+            self.caldb, calibration_cache.CachedCalDB
+        ):
+            darks = self.caldb.get_processed_dark(adinputs, procmode=self.mode)
+
+            if all(darks.files):
+                params["dark"] = [calibration_cache.load(path) for path in darks.files]
+
+        return super().subtractDark(adinputs, **params)
+
+    @per_ad_primitive
+    def someStuff(self, ad, **params):
         """
         Write message to screen.  Test primitive.
 
+        Each input is handled on its own (see parallel.per_ad_primitive), so
+        setting ``n_workers`` runs them in parallel. Otherwise, ``prefetch``
+        reads that many inputs ahead while the current one is processed.
+
         Parameters
         ----------
-        adinputs
+        ad
         params
+            ``plane_mode`` chooses whether the output is the input itself, a
+            copy-on-write view of it or a copy (see planes.py).
 
         Returns
         -------
 
+        """
+        log = self.log
+        log.status("I see " + ad.filename)
+
+        ad_out = planes.output(ad, params["plane_mode"])
+
+        gt.mark_history(ad_out, primname=self.myself(), keyword="TEST")
+        ad_out.update_filename(suffix=params["suffix"], strip=True)
+
+        return ad_out
+
+    def ADUToElectronsAndVAR(self, adinputs=None, **params):
+        """
+        Convert the data from ADU to electrons and add the read and Poisson
+        noise to the variance, in a single pass over each extension.
+
+        The result is identical to running
+        ``addVAR(read_noise=True)``, ``ADUToElectrons()`` and
+        ``addVAR(poisson_noise=True)`` in turn, using the per-amplifier gain
+        and read noise from lookup.array_properties, but reads and writes
+        the data and variance planes once instead of three times.
+
+        Parameters
+        ----------
+        suffix: str
+            suffix to be added to output files
+        read_noise: bool
+            add the read noise to the variance?
+        poisson_noise: bool
+            add the Poisson noise to the variance?
+        plane_mode: str
+            "inplace" to convert the inputs themselves, "view" to leave them
+            untouched and copy only the planes that change, or "copy" (see
+            planes.py)
+
+        Returns
+        -------
+        list of AstroData
+            The inputs, in electrons and with variance.
         """
         log = self.log
         log.debug(gt.log_message("primitive", self.myself(), "starting"))
+        timestamp_key = self.timestamp_keys[self.myself()]
+        electrons_key = self.timestamp_keys["ADUToElectrons"]
+
+        adoutputs = []
 
         for ad in adinputs:
-            log.status("I see " + ad.filename)
+            if ad.phu.get(electrons_key) or ad.phu.get(timestamp_key):
+                log.warning(
+                    f"No changes will be made to {ad.filename}, since it has "
+                    "already been converted to electrons"
+                )
+                adoutputs.append(ad)
+                continue
+
+            ad = planes.output(ad, params["plane_mode"])
+
+            coadds = 1 if ad.is_coadds_summed() else ad.coadds()
+            log.status(
+                f"Converting {ad.filename} from ADU to electrons and adding "
+                "the variance"
+            )
+
+            for ext, gain, read_noise in zip(ad, ad.gain(), ad.read_noise()):
+                if gain is None:
+                    raise ValueError(
+                        f"No gain for {ad.filename} extension {ext.id}; "
+                        "check lookup.array_properties"
+                    )
+
+                if params["read_noise"] and read_noise is None:
+                    log.warning(
+                        f"Read noise for {ad.filename} extension {ext.id} is "
+                        "unknown; not adding it to the variance"
+                    )
+
+                if ext.data.dtype.kind != "f":
+                    ext.data = ext.data.astype(np.float32)
+
+                _, ext.variance = noise.electrons_and_variance(
+                    planes.writable(ext, "data"),
+                    planes.writable(ext, "variance"),
+                    gain,
+                    read_noise=read_noise if params["read_noise"] else None,
+                    poisson_noise=params["poisson_noise"],
+                    coadds=coadds,
+                )
+
+            ad.hdr.set("BUNIT", "electron", self.keyword_comments["BUNIT"])
+
+            for key in (timestamp_key, electrons_key, self.timestamp_keys["addVAR"]):
+                gt.mark_history(ad, primname=self.myself(), keyword=key)
 
-            gt.mark_history(ad, primname=self.myself(), keyword="TEST")
             ad.update_filename(suffix=params["suffix"], strip=True)
+            adoutputs.append(ad)
+
+        return adoutputs
+
+    def stackDarksChunked(self, adinputs=None, **params):
+        """
+        Combine dark frames into a single dark without holding the whole
+        stack in memory.
+
+        Each input is written to a temporary file and its pixels are dropped
+        from memory as soon as it is on disk, leaving the input AstroData
+        objects with no extensions. The files are then read back through
+        memory maps, one band of rows from every input at a time, so the
+        combination uses no more than ``memory_limit`` on top of the output.
+        The result is identical to combining everything in memory.
+
+        Parameters
+        ----------
+        suffix: str
+            suffix to be added to output files
+        operation: str
+            "median" or "mean"
+        reject_method: str
+            "sigclip" or "none"
+        lsigma, hsigma: float
+            rejection thresholds in standard deviations
+        max_iters: int/None
+            maximum number of clipping iterations
+        memory_limit: float
+            memory available for the combination, in GB
+
+        Returns
+        -------
+        list of AstroData
+            The stacked dark, as the only element of the list.
+        """
+        log = self.log
+        log.debug(gt.log_message("primitive", self.myself(), "starting"))
+        timestamp_key = self.timestamp_keys[self.myself()]
+
+        if len(adinputs) <= 1:
+            log.stdinfo(
+                "No stacking will be performed, since at least two "
+                "input AstroData objects are required for stackDarksChunked"
+            )
+            return adinputs
+
+        if len({len(ad) for ad in adinputs}) > 1:
+            raise ValueError("Not all inputs have the same number of extensions")
+
+        if len({ad.exposure_time() for ad in adinputs}) > 1:
+            raise ValueError("Darks are not of equal exposure time")
+
+        combine_params = {
+            key: params[key]
+            for key in ("operation", "reject_method", "lsigma", "hsigma", "max_iters")
+        }
+        memory_limit = params["memory_limit"] * 1e9
+
+        ad_out = astrodata.create(adinputs[0].phu)
+        ad_out.orig_filename = adinputs[0].orig_filename
+        ad_out.filename = adinputs[0].filename
+
+        # spill() empties the inputs, keep the headers the output needs.
+        headers = [ext.hdr.copy() for ext in adinputs[0]]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = stacking.spill(adinputs, tmp_dir)
+
+            hdulists = [
+                fits.open(path, memmap=True, do_not_scale_image_data=True)
+                for path in paths
+            ]
+
+            try:
+                for index, header in enumerate(headers):
+                    stack_planes = {}
+
+                    for extname in ("SCI", "VAR", "DQ"):
+                        try:
+                            stack_planes[extname] = [
+                                stacking.FitsRows(hdulist[(extname, index + 1)])
+                                for hdulist in hdulists
+                            ]
+
+                        except KeyError:
+                            stack_planes[extname] = None
+
+                    data, mask, variance = stacking.chunked_combine(
+                        stack_planes["SCI"],
+                        mask=stack_planes["DQ"],
+                        variance=stack_planes["VAR"],
+                        memory_limit=memory_limit,
+                        **combine_params,
+                    )
+
+                    ad_out.append(data, header=header)
+                    ad_out[-1].mask = mask
+                    ad_out[-1].variance = variance
+
+            finally:
+                for hdulist in hdulists:
+                    hdulist.close()
+
+        log.stdinfo(f"Combined {len(adinputs)} darks into {ad_out.filename}")
+
+        ad_out.phu.set("NCOMBINE", len(adinputs), "Number of images combined")
+        gt.mark_history(ad_out, primname=self.myself(), keyword=timestamp_key)
+        ad_out.update_filename(suffix=params["suffix"], strip=True)
+
+        return [ad_out]
+
+    def writeOutputs(self, adinputs=None, **params):
+        """
+        Write the inputs to disk, tile-compressed if ``compression`` says so.
+
+        With compression, the files are written by compression.py, the image
+        planes being compressed in ``n_threads`` threads, and the compression
+        ratio and write throughput of each file are logged. Without, this is
+        the generic writeOutputs.
+
+        Parameters
+        ----------
+        prefix, suffix: str
+            prefix and suffix to be added to output files
+        strip: bool
+            strip the existing prefix and suffix first?
+        outfilename: str
+            name of the output, if there is only one
+        overwrite: bool
+            overwrite existing files?
+        compression: str
+            "none", "lossless" or "quantized"
+        quantize_level: float
+            float quantization, in fractions of the noise, if "quantized"
+        n_threads: int/None
+            number of compression threads
+
+        Returns
+        -------
+        list of AstroData
+            The inputs, with their new names.
+        """
+        if params["compression"] == "none":
+            return super().writeOutputs(adinputs, **params)
+
+        log = self.log
+        log.debug(gt.log_message("primitive", self.myself(), "starting"))
+
+        for ad in adinputs:
+            if params["prefix"] or params["suffix"]:
+                ad.update_filename(
+                    prefix=params["prefix"],
+                    suffix=params["suffix"],
+                    strip=params["strip"],
+                )
+
+            if params["outfilename"] and len(adinputs) == 1:
+                ad.filename = params["outfilename"]
+
+            self._write_compressed(ad, ad.filename, params)
+
+        return adinputs
+
+    def storeProcessedDark(self, adinputs=None, **params):
+        """
+        Store processed darks in the calibration directory and database,
+        tile-compressed if ``compression`` says so (see writeOutputs).
+
+        With compression, each dark is compressed before it is stored, so
+        that the calibration databases, which keep the checksum and size of
+        the file and may upload it, see the file as it stays on disk.
+        Without, this is the generic storeProcessedDark.
+
+        Parameters
+        ----------
+        suffix: str
+            suffix to be added to output files
+        force: bool
+            store the inputs even if they are not darks?
+        compression: str
+            "none", "lossless" or "quantized"
+        quantize_level: float
+            float quantization, in fractions of the noise, if "quantized"
+        n_threads: int/None
+            number of compression threads
+
+        Returns
+        -------
+        list of AstroData
+            The processed darks.
+        """
+        if params["compression"] == "none":
+            # Call the generic primitive directly, with its own parameters
+            # only: through the config wrapper, it would also be passed the
+            # compression parameters of this primitive's config.
+            store = super().storeProcessedDark.__wrapped__
+
+            return store(
+                self,
+                adinputs,
+                **{
+                    key: value
+                    for key, value in params.items()
+                    if key not in compression.COMPRESSION_PARAMS
+                },
+            )
+
+        log = self.log
+        log.debug(gt.log_message("primitive", self.myself(), "starting"))
+
+        # As the generic storeProcessedDark does, up to storing the files.
+        if params["force"]:
+            adinputs = gt.convert_to_cal_header(
+                adinput=adinputs,
+                caltype="dark",
+                keyword_comments=self.keyword_comments,
+            )
+
+        adinputs = self._markAsCalibration(
+            adinputs,
+            suffix=params["suffix"],
+            primname=self.myself(),
+            keyword="PROCDARK",
+        )
+
+        directory = os.path.join(self.cachedict["calibrations"], "processed_dark")
+        os.makedirs(directory, exist_ok=True)
+
+        for ad in adinputs:
+            path = os.path.join(directory, os.path.basename(ad.filename))
+            self._write_compressed(ad, path, params)
+
+            # Given a path, the databases store the file as it is.
+            self.caldb.store_calibration(path, caltype="processed_dark")
 
         return adinputs
 
+    def _write_compressed(self, ad, filename, params):
+        """Write one output with compression, logging how well it went."""
+        stats = compression.write_compressed(
+            ad,
+            filename,
+            mode=params["compression"],
+            quantize_level=params["quantize_level"],
+            n_threads=params["n_threads"],
+            overwrite=params.get("overwrite", True),
+        )
+        self.log.stdinfo(
+            f"Wrote {filename}: {stats['raw_bytes'] / 1e6:.1f} MB compressed "
+            f"{stats['ratio']:.2f}x at {stats['throughput']:.0f} MB/s"
+        )
+
     @staticmethod
     def _has_valid_extensions(ad):
         """Check that the AD has a valid number of extensions."""
@@ -4,11 +4,24 @@
 #                                                   primitives_{{ cookiecutter.instrument_name_lower }}_echelle.py
 # ------------------------------------------------------------------------------
 
+import hashlib
+
+import numpy as np
+
+import astrodata
+
 from gempy.gemini import gemini_tools as gt
 
 from geminidr.core.primitives_spect import Spect
+from geminidr.gemini.lookups import DQ_definitions as DQ
 from .primitives_{{ cookiecutter.instrument_name_lower }} import {{ cookiecutter.instrument_name_title }}
+from . import cosmic_rays
+from . import orders
 from . import parameters_{{ cookiecutter.instrument_name_lower }}_echelle
+from . import planes
+from .. import profiling
+from .. import result_cache
+from ..parallel import per_ad_primitive
 
 from recipe_system.utils.decorators import parameter_override
 # ------------------------------------------------------------------------------
@@ -26,51 +39,393 @@ class {{ cookiecutter.instrument_name_title }}Echelle({{ cookiecutter.instrument
         super({{ cookiecutter.instrument_name_title }}Echelle, self).__init__(adinputs, **kwargs)
         self.inst_lookups = "{{ cookiecutter.instrument_name_lower }}dr.{{ cookiecutter.instrument_name_lower }}.lookups"
         self._param_update(parameters_{{ cookiecutter.instrument_name_lower }}_echelle)
+        result_cache.attach(self)
+        profiling.attach(self)
 
-    def myNewPrimitive(self, adinputs=None, **params):
+    @per_ad_primitive
+    def myNewPrimitive(self, ad, **params):
         """
         Description...
 
+        Each input is handled on its own (see parallel.per_ad_primitive), so
+        setting ``n_workers`` runs them in parallel. Otherwise, ``prefetch``
+        reads that many inputs ahead while the current one is processed.
+
         Parameters
         ----------
         suffix: str
             suffix to be added to output files
         param2: blah
             blah, blah
+        plane_mode: str
+            whether ad_out is the input itself, a copy-on-write view of it
+            or a full copy (see planes.py)
 
         Returns
         -------
         """
 
         log = self.log
-        log.debug(gt.log_message("primitive", self.myself(), "starting"))
         timestamp_key = self.timestamp_keys[self.myself()]
 
         # Get params out
         param2 = params["param2"]  # noqa: F841
 
-        # Initialize the list of output AstroData objects
-        # It is also possible to modify adinputs in place.
+        # Do whatever checks on the input are necessary, for example:
+        # Check whether this primitive as been run already.
+        if ad.phu.get(timestamp_key):
+            log.warning(
+                "No changes will be made to {}, since it has"
+                "already been processed by myNewPrimitive".format(ad.filename)
+            )
+            return ad
+
+        # The astrodata output object
+        ad_out = planes.output(ad, params["plane_mode"])
+
+        # -----------------------
+        # DR algorithm goes here
+        # -----------------------
+        # Modify the planes of ad_out in place through planes.writable(), so
+        # that in "view" mode only the planes that change are copied. It is
+        # also possible to build and return a new AstroData object, or to
+        # return None to drop this input from the outputs.
+
+        # Timestamp
+        gt.mark_history(ad_out, primname=self.myself(), keyword=timestamp_key)
+
+        return ad_out
+
+    def traceOrders(self, adinputs=None, **params):
+        """
+        Find the echelle orders and fit a polynomial trace to each of them.
+
+        The traces are attached to every extension as an ``ORDERS`` table.
+        Every extension is traced, unless ``reuse_traces`` is set: traces are
+        then cached per extension and detector configuration (static BPM, MDF,
+        binning, shape and tracing parameters), and within a process only the
+        first frame of each configuration is actually traced. Only use it when
+        the orders do not move between frames.
+
+        Parameters
+        ----------
+        suffix: str
+            suffix to be added to output files
+        n_orders: int/None
+            number of orders to keep (all above threshold if None)
+        threshold: float
+            minimum order peak, relative to the brightest order
+        half_width: int
+            half-width of the orders, in pixels
+        degree: int
+            polynomial degree of the traces
+        n_samples: int
+            number of positions along the dispersion to centroid at
+        reuse_traces: bool
+            reuse the trace of an earlier frame with the same configuration
+
+        Returns
+        -------
+        list of AstroData
+            The inputs, with ORDERS tables attached.
+        """
+        log = self.log
+        log.debug(gt.log_message("primitive", self.myself(), "starting"))
+        timestamp_key = self.timestamp_keys[self.myself()]
+
+        trace_params = {
+            key: params[key]
+            for key in ("n_orders", "threshold", "half_width", "degree", "n_samples")
+        }
+
+        for ad in adinputs:
+            for ext in ad:
+                if params["reuse_traces"]:
+                    key = self._trace_key(ad, ext, trace_params)
+                    coefficients = orders.cached_trace(
+                        key, ext.data, mask=ext.mask, **trace_params
+                    )
+
+                else:
+                    coefficients = orders.trace_orders(
+                        ext.data, mask=ext.mask, **trace_params
+                    )
+
+                ext.ORDERS = orders.trace_table(coefficients, params["half_width"])
+                log.stdinfo(
+                    f"{ad.filename} extension {ext.id}: "
+                    f"traced {len(coefficients)} orders"
+                )
+
+            gt.mark_history(ad, primname=self.myself(), keyword=timestamp_key)
+            ad.update_filename(suffix=params["suffix"], strip=True)
+
+        return adinputs
+
+    def rejectCosmicRays(self, adinputs=None, **params):
+        """
+        Flag cosmic rays in the DQ plane.
+
+        Each pixel is compared with a median model of its surroundings (see
+        cosmic_rays.py). Within the orders traced by traceOrders, the model
+        follows both the orders and the sky or arc lines across them, so
+        lines are not mistaken for cosmic rays; run traceOrders first. The
+        frame is processed in tiles on a pool of threads.
+
+        Parameters
+        ----------
+        suffix: str
+            suffix to be added to output files
+        sigma: float
+            detection threshold, in units of the noise
+        grow_sigma: float
+            threshold for the neighbours of cosmic rays
+        tile_size: int
+            side of the tiles processed by each thread
+        n_threads: int/None
+            number of threads (one per CPU if None)
+        plane_mode: str
+            "inplace" to flag the inputs themselves, "view" to share their
+            SCI and VAR planes and copy only DQ, or "copy" (see planes.py)
+
+        Returns
+        -------
+        list of AstroData
+            The inputs, with cosmic rays flagged.
+        """
+        log = self.log
+        log.debug(gt.log_message("primitive", self.myself(), "starting"))
+        timestamp_key = self.timestamp_keys[self.myself()]
+
         adoutputs = []
 
         for ad in adinputs:
-            # Do whatever checks on the input are necessary, for example:
-            # Check whether this primitive as been run already.
             if ad.phu.get(timestamp_key):
                 log.warning(
-                    "No changes will be made to {}, since it has"
-                    "already been processed by myNewPrimitive".format(ad.filename)
+                    f"No changes will be made to {ad.filename}, since it has "
+                    "already been processed by rejectCosmicRays"
                 )
+                adoutputs.append(ad)
                 continue
 
-            # -----------------------
-            # DR algorithm goes here
-            # -----------------------
-            ad_out = None  # The astrodata output object
+            ad = planes.output(ad, params["plane_mode"])
+
+            for ext in ad:
+                try:
+                    coefficients, half_width = orders.coefficients_from_table(
+                        ext.ORDERS
+                    )
+
+                except AttributeError:
+                    log.warning(
+                        f"{ad.filename} extension {ext.id} has no ORDERS table, "
+                        "so lines are not protected; run traceOrders first"
+                    )
+                    coefficients, half_width = None, 0
+
+                flags = cosmic_rays.find_cosmic_rays(
+                    ext.data,
+                    variance=ext.variance,
+                    mask=ext.mask,
+                    coefficients=coefficients,
+                    half_width=half_width,
+                    sigma=params["sigma"],
+                    grow_sigma=params["grow_sigma"],
+                    tile_size=params["tile_size"],
+                    n_threads=params["n_threads"],
+                )
+
+                if ext.mask is None:
+                    ext.mask = np.zeros(ext.shape, dtype=DQ.datatype)
+
+                planes.writable(ext, "mask")[flags] |= DQ.cosmic_ray
+                log.stdinfo(
+                    f"{ad.filename} extension {ext.id}: "
+                    f"flagged {flags.sum()} cosmic-ray pixels"
+                )
 
-            # Timestamp
             gt.mark_history(ad, primname=self.myself(), keyword=timestamp_key)
+            ad.update_filename(suffix=params["suffix"], strip=True)
+            adoutputs.append(ad)
 
+        return adoutputs
+
+    def extractOrders(self, adinputs=None, **params):
+        """
+        Extract one spectrum per echelle order, using the traces in the
+        ``ORDERS`` table from traceOrders.
+
+        All orders are extracted together by array operations. Each output
+        has one 1D extension per order, with an ``ORDER`` header keyword.
+
+        Parameters
+        ----------
+        suffix: str
+            suffix to be added to output files
+        method: str
+            "optimal" (Horne 1986) or "box"
+        profile_window: int
+            number of columns the spatial profile is averaged over
+
+        Returns
+        -------
+        list of AstroData
+            The extracted spectra.
+        """
+        log = self.log
+        log.debug(gt.log_message("primitive", self.myself(), "starting"))
+        timestamp_key = self.timestamp_keys[self.myself()]
+
+        adoutputs = []
+
+        for ad in adinputs:
+            if ad.phu.get(timestamp_key):
+                log.warning(
+                    f"No changes will be made to {ad.filename}, since it has "
+                    "already been processed by extractOrders"
+                )
+                adoutputs.append(ad)
+                continue
+
+            ad_out = astrodata.create(ad.phu)
+            ad_out.orig_filename = ad.orig_filename
+            ad_out.filename = ad.filename
+
+            for ext in ad:
+                try:
+                    coefficients, half_width = orders.coefficients_from_table(
+                        ext.ORDERS
+                    )
+
+                except AttributeError:
+                    raise ValueError(
+                        f"{ad.filename} extension {ext.id} has no ORDERS table; "
+                        "run traceOrders first"
+                    )
+
+                flux, variance, no_data = orders.extract_orders(
+                    ext.data,
+                    coefficients,
+                    half_width,
+                    variance=ext.variance,
+                    mask=ext.mask,
+                    method=params["method"],
+                    profile_window=params["profile_window"],
+                )
+
+                for order, order_flux, order_var, order_no_data in zip(
+                    ext.ORDERS["order"], flux, variance, no_data
+                ):
+                    ad_out.append(order_flux.astype(np.float32))
+                    ad_out[-1].hdr["ORDER"] = (int(order), "Echelle order")
+                    ad_out[-1].variance = order_var.astype(np.float32)
+                    ad_out[-1].mask = np.where(order_no_data, DQ.no_data, 0).astype(
+                        DQ.datatype
+                    )
+
+            log.stdinfo(f"{ad.filename}: extracted {len(ad_out)} orders")
+
+            gt.mark_history(ad_out, primname=self.myself(), keyword=timestamp_key)
+            ad_out.update_filename(suffix=params["suffix"], strip=True)
             adoutputs.append(ad_out)
 
         return adoutputs
+
+    def correctBlaze(self, adinputs=None, **params):
+        """
+        Divide extracted echelle orders by the blaze function.
+
+        The blaze is measured from an extracted flat if one is given, and
+        otherwise estimated from each input's own smoothed continuum.
+        Pixels where the blaze falls below ``min_blaze`` are flagged as
+        no_data.
+
+        Parameters
+        ----------
+        suffix: str
+            suffix to be added to output files
+        flat: str/AstroData/None
+            extracted flat to measure the blaze from
+        smoothing: int
+            blaze smoothing window, in pixels
+        min_blaze: float
+            minimum relative blaze to keep
+
+        Returns
+        -------
+        list of AstroData
+            The blaze-corrected spectra.
+        """
+        log = self.log
+        log.debug(gt.log_message("primitive", self.myself(), "starting"))
+        timestamp_key = self.timestamp_keys[self.myself()]
+
+        flat = params["flat"]
+        flat_blazes = None
+
+        if flat is not None:
+            if not isinstance(flat, astrodata.AstroData):
+                flat = astrodata.open(flat)
+
+            # Orders can have different lengths, so each is measured alone.
+            flat_blazes = [
+                orders.blaze_from_flat(ext.data, params["smoothing"]) for ext in flat
+            ]
+            log.stdinfo(f"Measuring the blaze from {flat.filename}")
+
+        for ad in adinputs:
+            if ad.phu.get(timestamp_key):
+                log.warning(
+                    f"No changes will be made to {ad.filename}, since it has "
+                    "already been processed by correctBlaze"
+                )
+                continue
+
+            shapes = [ext.data.shape for ext in ad]
+
+            if flat_blazes is not None and shapes != [b.shape for b in flat_blazes]:
+                raise ValueError(
+                    f"{ad.filename} and {flat.filename} have different orders"
+                )
+
+            for index, ext in enumerate(ad):
+                if flat_blazes is None:
+                    blaze = orders.blaze_from_flat(ext.data, params["smoothing"])
+
+                else:
+                    blaze = flat_blazes[index]
+
+                flux, variance, low_blaze = orders.correct_blaze(
+                    ext.data, ext.variance, blaze, min_blaze=params["min_blaze"]
+                )
+                ext.data = flux.astype(ext.data.dtype)
+
+                if variance is not None:
+                    ext.variance = variance.astype(ext.data.dtype)
+
+                mask = np.where(low_blaze, DQ.no_data, 0).astype(DQ.datatype)
+                ext.mask = mask if ext.mask is None else ext.mask | mask
+
+            gt.mark_history(ad, primname=self.myself(), keyword=timestamp_key)
+            ad.update_filename(suffix=params["suffix"], strip=True)
+
+        return adinputs
+
+    @staticmethod
+    def _trace_key(ad, ext, trace_params):
+        """Identify the extension and configuration a trace is valid for."""
+        try:
+            mdf = hashlib.sha1(ad.MDF.as_array().tobytes()).hexdigest()
+
+        except AttributeError:
+            mdf = None
+
+        return (
+            ad.phu.get("BPMASK"),
+            mdf,
+            ad.detector_x_bin(),
+            ad.detector_y_bin(),
+            ext.id,
+            ext.shape,
+            tuple(sorted(trace_params.items())),
+        )
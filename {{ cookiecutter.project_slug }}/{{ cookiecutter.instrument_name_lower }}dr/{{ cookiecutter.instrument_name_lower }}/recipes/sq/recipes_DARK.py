@@ -3,6 +3,8 @@ Recipes available to data with tags ['{{ cookiecutter.instrument_name }}', 'CAL'
 Default is "makeProcessedDark"
 """
 
+from {{ cookiecutter.instrument_name_lower }}dr import incremental, streaming
+
 recipe_tags = {"{{ cookiecutter.instrument_name }}", "CAL", "DARK"}
 
 
@@ -24,8 +26,34 @@ def makeProcessedDark(p):
     p.addDQ()
     p.addVAR(read_noise=True)
     # ....
+    p.stackDarksChunked()
     p.storeProcessedDark()
     return
 
 
+def makeProcessedDarkIncremental(p):
+    """
+    Version of makeProcessedDark that reuses the products of earlier runs
+    (see {{ cookiecutter.instrument_name_lower }}dr/incremental.py). Adding darks to a set that was
+    already reduced only prepares the new ones before stacking them all.
+
+    Parameters
+    ----------
+    p : PrimitivesCORE object
+        A primitive set matching the recipe_tags.
+    """
+
+    incremental.run(
+        p,
+        [
+            streaming.Step("prepare"),
+            streaming.Step("addDQ"),
+            streaming.Step("addVAR", read_noise=True),
+            streaming.Barrier("stackDarksChunked"),
+            streaming.Step("storeProcessedDark"),
+        ],
+    )
+    return
+
+
 _default = makeProcessedDark
@@ -3,6 +3,8 @@ Recipes available to data with tags ['{{ cookiecutter.instrument_name }}', 'ECHE
 Default is "reduce".
 """
 
+from {{ cookiecutter.instrument_name_lower }}dr import incremental, streaming
+
 recipe_tags = {"{{ cookiecutter.instrument_name }}", "ECHELLE"}
 
 
@@ -18,11 +20,70 @@ def reduce(p):
 
     p.prepare()
     p.addDQ()
-    p.addVAR(read_noise=True)
-    p.ADUToElectrons()
-    p.addVAR(poisson_noise=True)
+    p.ADUToElectronsAndVAR()
     # ....
     # ....
+    p.traceOrders()
+    p.rejectCosmicRays()
+    p.extractOrders()
+    p.correctBlaze()
+    return
+
+
+def reduceStreaming(p):
+    """
+    Quick-look version of reduce. Each frame goes through all the steps on
+    its own and is written out as soon as it is done, so only one frame is
+    in memory at a time and the first output does not wait for the others.
+
+    Parameters
+    ----------
+    p : PrimitivesCORE object
+        A primitive set matching the recipe_tags.
+    """
+
+    streaming.stream(
+        p,
+        [
+            streaming.Step("prepare"),
+            streaming.Step("addDQ"),
+            streaming.Step("ADUToElectronsAndVAR"),
+            streaming.Step("traceOrders"),
+            streaming.Step("rejectCosmicRays"),
+            streaming.Step("extractOrders"),
+            streaming.Step("correctBlaze"),
+            streaming.Step("writeOutputs"),
+        ],
+        keep=False,
+    )
+    return
+
+
+def reduceIncremental(p):
+    """
+    Version of reduce that reuses the products of earlier runs. Stages that
+    were already run on an input with the same parameters are read back from
+    disk instead of being run again (see {{ cookiecutter.instrument_name_lower }}dr/incremental.py), so
+    re-reducing a night after adding frames only processes the new ones.
+
+    Parameters
+    ----------
+    p : PrimitivesCORE object
+        A primitive set matching the recipe_tags.
+    """
+
+    incremental.run(
+        p,
+        [
+            streaming.Step("prepare"),
+            streaming.Step("addDQ"),
+            streaming.Step("ADUToElectronsAndVAR"),
+            streaming.Step("traceOrders"),
+            streaming.Step("rejectCosmicRays"),
+            streaming.Step("extractOrders"),
+            streaming.Step("correctBlaze"),
+        ],
+    )
     return
 
 
@@ -0,0 +1,256 @@
+"""Out-of-core frame combination for {{ cookiecutter.instrument_name }}.
+
+:func:`combine` stacks a set of frames held in memory. :func:`chunked_combine`
+produces exactly the same result while only ever holding a band of rows from
+every input, read from memory-mapped data, so peak memory is bounded by
+``memory_limit`` instead of growing with the number of inputs.
+
+Every operation in :func:`combine` is computed independently for each pixel
+along the stacking axis, which is what makes the chunked result bit-identical
+to the in-memory one.
+
+Frames that are already in memory are handed to :func:`chunked_combine` by
+writing them out with :func:`spill`, which drops each frame's pixels once it is
+on disk.
+"""
+
+import os
+import warnings
+
+import numpy as np
+
+# Rough number of bytes needed per stacked input pixel while combining: the
+# data, variance and DQ planes plus the working copies made by the masked
+# statistics.
+BYTES_PER_STACKED_PIXEL = 32
+
+
+def combine(
+    data,
+    mask=None,
+    variance=None,
+    operation="median",
+    reject_method="sigclip",
+    lsigma=3.0,
+    hsigma=3.0,
+    max_iters=None,
+):
+    """Combine a stack of frames along the first axis.
+
+    Parameters
+    ----------
+    data : ndarray
+        Stack of frames, shape ``(n_inputs, ...)``.
+    mask : ndarray of int, optional
+        DQ planes matching ``data``. Pixels with a non-zero DQ are excluded,
+        unless every input is flagged at that position.
+    variance : ndarray, optional
+        Variance planes matching ``data``.
+    operation : {"median", "mean"}
+        How the surviving pixels are combined.
+    reject_method : {"sigclip", "none"}
+        Whether to iteratively sigma-clip around the median first.
+    lsigma, hsigma : float
+        Lower and upper clipping thresholds, in standard deviations.
+    max_iters : int, optional
+        Maximum number of clipping iterations; unlimited if None.
+
+    Returns
+    -------
+    out_data, out_mask, out_variance : ndarray
+        Combined frame, its DQ (the bitwise AND of the input DQs) and its
+        variance (None if no variance was given).
+    """
+    if operation not in ("median", "mean"):
+        raise ValueError(f"Unknown operation: {operation}")
+
+    if reject_method not in ("sigclip", "none"):
+        raise ValueError(f"Unknown rejection method: {reject_method}")
+
+    data = np.asarray(data)
+    good = np.isfinite(data)
+
+    if mask is not None:
+        mask = np.asarray(mask)
+        unflagged = mask == 0
+        # Where every input is flagged, fall back to combining all of them.
+        unflagged |= ~unflagged.any(axis=0)
+        good &= unflagged
+
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        if reject_method == "sigclip":
+            good = _sigma_clip(data, good, lsigma, hsigma, max_iters)
+
+        values = np.where(good, data, np.nan)
+
+        if operation == "median":
+            out_data = np.nanmedian(values, axis=0)
+
+        else:
+            out_data = np.nanmean(values, axis=0)
+
+        out_variance = None
+
+        if variance is not None:
+            n_used = good.sum(axis=0)
+            out_variance = np.where(good, variance, 0).sum(axis=0) / n_used**2
+
+            # The median is noisier than the mean by roughly pi/2.
+            if operation == "median":
+                out_variance *= np.pi / 2
+
+            out_variance = out_variance.astype(data.dtype, copy=False)
+
+    out_data = out_data.astype(data.dtype, copy=False)
+
+    if mask is not None:
+        out_mask = np.bitwise_and.reduce(mask, axis=0)
+
+    else:
+        out_mask = np.zeros(data.shape[1:], dtype=np.uint16)
+
+    return out_data, out_mask, out_variance
+
+
+def _sigma_clip(data, good, lsigma, hsigma, max_iters):
+    """Iteratively reject outliers from the median; returns the new mask."""
+    iteration = 0
+
+    while max_iters is None or iteration < max_iters:
+        values = np.where(good, data, np.nan)
+        center = np.nanmedian(values, axis=0)
+        std = np.nanstd(values, axis=0)
+
+        clipped = good & (data >= center - lsigma * std)
+        clipped &= data <= center + hsigma * std
+
+        if np.array_equal(clipped, good):
+            break
+
+        good = clipped
+        iteration += 1
+
+    return good
+
+
+def rows_per_chunk(shape, n_inputs, memory_limit):
+    """Number of rows of every input that fit in ``memory_limit`` bytes."""
+    row_pixels = int(np.prod(shape[1:], dtype=np.int64))
+    bytes_per_row = n_inputs * row_pixels * BYTES_PER_STACKED_PIXEL
+
+    return int(max(1, min(shape[0], memory_limit // bytes_per_row)))
+
+
+def chunked_combine(data, mask=None, variance=None, memory_limit=1e9, **kwargs):
+    """Combine frames that do not fit in memory, one band of rows at a time.
+
+    Parameters
+    ----------
+    data : list
+        One row-sliceable array per input (a ``numpy.memmap``, or a
+        :class:`FitsRows` wrapping an HDU opened with ``memmap=True``).
+    mask, variance : list, optional
+        DQ and variance planes, as for ``data``.
+    memory_limit : float
+        Approximate number of bytes the combination may use.
+    **kwargs
+        Passed on to :func:`combine`.
+
+    Returns
+    -------
+    out_data, out_mask, out_variance : ndarray
+        As for :func:`combine`.
+    """
+    shape = data[0].shape
+
+    if any(frame.shape != shape for frame in data):
+        raise ValueError("All inputs must have the same shape")
+
+    n_rows = rows_per_chunk(shape, len(data), memory_limit)
+    out_data = out_mask = out_variance = None
+
+    for start in range(0, shape[0], n_rows):
+        rows = slice(start, min(start + n_rows, shape[0]))
+
+        chunk = combine(
+            _stack_rows(data, rows),
+            mask=None if mask is None else _stack_rows(mask, rows),
+            variance=None if variance is None else _stack_rows(variance, rows),
+            **kwargs,
+        )
+
+        if out_data is None:
+            out_data, out_mask, out_variance = (
+                None if plane is None else np.empty(shape, dtype=plane.dtype)
+                for plane in chunk
+            )
+
+        for out, plane in zip((out_data, out_mask, out_variance), chunk):
+            if out is not None:
+                out[rows] = plane
+
+    return out_data, out_mask, out_variance
+
+
+def spill(adinputs, directory):
+    """Write every input to ``directory``, emptying each one once written.
+
+    All the extensions of an input are deleted as soon as it has been written,
+    so that, unless something else holds on to them, its pixels are released
+    before the next input is written and before the combination starts. The
+    inputs are left with no extensions.
+
+    Returns the paths written, in the order of ``adinputs``.
+    """
+    paths = []
+
+    for i, ad in enumerate(adinputs):
+        path = os.path.join(directory, f"stack_input_{i:04d}.fits")
+        ad.write(path)
+        paths.append(path)
+
+        while len(ad):
+            del ad[-1]
+
+    return paths
+
+
+def _stack_rows(frames, rows):
+    return np.stack([np.asarray(frame[rows]) for frame in frames])
+
+
+class FitsRows:
+    """Row-sliceable view of a memory-mapped FITS image HDU.
+
+    The HDU must come from a file opened with ``memmap=True`` and
+    ``do_not_scale_image_data=True``; astropy refuses to memory-map scaled
+    data, so ``BZERO``/``BSCALE`` are applied here, one slice at a time.
+    Slices are returned in native byte order.
+    """
+
+    def __init__(self, hdu):
+        self._data = hdu.data
+        self._bzero = hdu.header.get("BZERO", 0)
+        self._bscale = hdu.header.get("BSCALE", 1)
+        self.shape = self._data.shape
+
+    def __getitem__(self, item):
+        raw = self._data[item]
+
+        if self._bzero == 0 and self._bscale == 1:
+            return raw.astype(raw.dtype.newbyteorder("="))
+
+        # Unsigned integers are stored as signed ones offset by BZERO.
+        if (
+            raw.dtype.kind == "i"
+            and self._bscale == 1
+            and self._bzero == 2 ** (8 * raw.dtype.itemsize - 1)
+        ):
+            unsigned = raw.view(raw.dtype.str.replace("i", "u"))
+            sign_bit = unsigned.dtype.type(self._bzero)
+
+            return (unsigned ^ sign_bit).astype(unsigned.dtype.newbyteorder("="))
+
+        return raw * self._bscale + self._bzero